@@ -42,6 +42,13 @@ const int THRESHOLD_SEDANG = 300;
 const int THRESHOLD_BURUK = 700;
 const long PUBLISH_INTERVAL = 60000;
 
+// ================== Format Payload ==================
+// 0 = JSON, satu pembacaan per publish (format lama)
+// 1 = biner ringkas (payload_codec.py di logger), BATCH_SIZE pembacaan per publish;
+//     PUBLISH_INTERVAL menjadi interval sampling
+#define PAYLOAD_BINARY 0
+#define BATCH_SIZE 5
+
 // ================== NTP (Waktu Internet) ==================
 const char* ntpServer = "pool.ntp.org";
 const long gmtOffset_sec = 3600 * 7;
@@ -57,6 +64,17 @@ LiquidCrystal_I2C lcd(0x27, 16, 2);
 unsigned long lastMsg = 0;
 char lcd_line1_buffer[17];
 
+#if PAYLOAD_BINARY
+// Header: "NQ", versi, jumlah pembacaan, panjang id_alat, id_alat
+// Record (little-endian): timestamp epoch UTC u32, gas_ppm, kelembaban, suhu, tekanan (float32)
+const char* id_alat = "ALAT_01";
+const uint8_t PAYLOAD_VERSION = 1;
+const size_t HEADER_SIZE = 5;
+const size_t RECORD_SIZE = sizeof(uint32_t) + 4 * sizeof(float);
+uint8_t batchBuffer[HEADER_SIZE + 32 + BATCH_SIZE * RECORD_SIZE];
+uint8_t batchCount = 0;
+#endif
+
 // ================== Setup ==================
 void setup() {
   Serial.begin(115200);
@@ -143,6 +161,14 @@ void loop() {
       return;
     }
 
+#if PAYLOAD_BINARY
+    time_t epoch;
+    time(&epoch);
+    appendReading((uint32_t)epoch, ppm, kelembaban, suhu, tekanan);
+    if (batchCount >= BATCH_SIZE) {
+      publishBatch();
+    }
+#else
     char timeString[20];
     strftime(timeString, sizeof(timeString), "%Y-%m-%d %H:%M:%S", &timeinfo);
 
@@ -163,6 +189,7 @@ void loop() {
     mqttClient.beginMessage(mqtt_topic_publish);
     mqttClient.print(buffer);
     mqttClient.endMessage();
+#endif
 
     snprintf(lcd_line1_buffer, sizeof(lcd_line1_buffer), "S:%.1f H:%.1f", suhu, kelembaban);
     lcd.setCursor(0, 0); lcd.print(lcd_line1_buffer);
@@ -172,6 +199,42 @@ void loop() {
   }
 }
 
+#if PAYLOAD_BINARY
+// ================== Payload Biner ==================
+size_t idLength() {
+  size_t len = strlen(id_alat);
+  return len > 32 ? 32 : len;
+}
+
+void appendReading(uint32_t epoch, float gas_ppm, float kelembaban, float suhu, float tekanan) {
+  // ESP32 little-endian, jadi nilai cukup disalin apa adanya
+  uint8_t* record = batchBuffer + HEADER_SIZE + idLength() + batchCount * RECORD_SIZE;
+  float values[4] = {gas_ppm, kelembaban, suhu, tekanan};
+  memcpy(record, &epoch, sizeof(epoch));
+  memcpy(record + sizeof(epoch), values, sizeof(values));
+  batchCount++;
+}
+
+void publishBatch() {
+  size_t idLen = idLength();
+  batchBuffer[0] = 'N';
+  batchBuffer[1] = 'Q';
+  batchBuffer[2] = PAYLOAD_VERSION;
+  batchBuffer[3] = batchCount;
+  batchBuffer[4] = (uint8_t)idLen;
+  memcpy(batchBuffer + HEADER_SIZE, id_alat, idLen);
+  size_t len = HEADER_SIZE + idLen + batchCount * RECORD_SIZE;
+
+  Serial.print("[PUBLISH] biner "); Serial.print(batchCount);
+  Serial.print(" pembacaan, "); Serial.print(len); Serial.println(" byte");
+
+  mqttClient.beginMessage(mqtt_topic_publish, len, false, 0);
+  mqttClient.write(batchBuffer, len);
+  mqttClient.endMessage();
+  batchCount = 0;
+}
+#endif
+
 // ================== MQTT Message Handler ==================
 void onMqttMessage(int messageSize) {
   String topic = mqttClient.messageTopic();
@@ -0,0 +1,164 @@
+# anomaly_detector.py
+"""
+Deteksi anomali gas_ppm secara streaming, langsung di jalur ingest.
+
+Setiap pembacaan valid (setelah dedup/reorder) diberikan ke `AnomalyDetector.on_reading`.
+State per `id_alat` berukuran tetap (beberapa float di objek ber-__slots__), jadi memori
+tidak bertambah seiring waktu dan ribuan alat cukup beberapa ratus KB. Jalur normal
+(tidak ada kejadian) hanya memperbarui angka di state tersebut tanpa membuat list,
+dict, atau array baru per pesan.
+
+Pemeriksaan per pembacaan (jenis kejadian):
+- `ambang`  : gas_ppm >= ambang absolut.
+- `zscore`  : |gas_ppm - rata-rata EWMA| / simpangan baku EWMA >= batas z
+              (setelah masa pemanasan). Statistik diperbarui setelah penilaian.
+- `laju`    : laju perubahan terhadap pembacaan sebelumnya (ppm per menit) >= batas.
+- `residual`: selisih terhadap prediksi online terbaru untuk bucket 5 menit yang sama
+              (OnlinePredictor, jika ONLINE_PREDICTION aktif) >= batas.
+
+Kejadian ditulis sebagai line protocol ke measurement tersendiri (tag id_alat, jenis;
+field gas_ppm, skor, batas) dan dipublikasikan sebagai JSON ke topik alert MQTT.
+Kejadian jenis yang sama untuk alat yang sama tidak diulang selama masa cooldown.
+"""
+import json
+import logging
+import math
+import threading
+import metrics
+import payload_codec
+
+BUCKET_NS = 5 * 60 * 1_000_000_000
+KINDS = ("ambang", "zscore", "laju", "residual")
+_AMBANG, _ZSCORE, _LAJU, _RESIDUAL = range(len(KINDS))
+
+
+class _DeviceState:
+    __slots__ = ("n", "mean", "var", "last_value", "last_ts", "forecast", "forecast_bucket", "last_alert")
+
+    def __init__(self):
+        self.n = 0                    # jumlah pembacaan yang sudah masuk statistik
+        self.mean = 0.0               # rata-rata EWMA
+        self.var = 0.0                # varians EWMA
+        self.last_value = 0.0
+        self.last_ts = None           # timestamp pembacaan terakhir (ns)
+        self.forecast = 0.0           # prediksi online terbaru
+        self.forecast_bucket = None   # bucket 5 menit yang diprediksi
+        self.last_alert = [None] * len(KINDS)  # timestamp kejadian terakhir per jenis (untuk cooldown)
+
+
+class AnomalyDetector:
+    def __init__(self, write_line, publish=None, measurement="anomali_gas",
+                 alert_topic="iot/kualitas_udara/{id_alat}/alert", threshold=700.0, z_limit=4.0,
+                 alpha=0.05, warmup=30, roc_limit=200.0, residual_limit=150.0, cooldown=300.0):
+        self.write_line = write_line
+        # publish(topik, payload_bytes); diisi setelah koneksi MQTT dibuat (lihat logger_main.py)
+        self.publish = publish
+        self.alert_topic = alert_topic
+        self.threshold = threshold
+        self.z_limit = z_limit
+        self.alpha = alpha
+        self.warmup = max(1, warmup)
+        self.roc_limit = roc_limit
+        self.residual_limit = residual_limit
+        self.cooldown_ns = int(cooldown * 1_000_000_000)
+        self._prefix = measurement.encode("utf-8") + b",id_alat="
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def on_forecast(self, id_alat, forecast_ts, value):
+        """Listener OnlinePredictor: prediksi gas_ppm untuk bucket yang dimulai pada `forecast_ts`."""
+        with self._lock:
+            state = self._devices.get(id_alat)
+            if state is None:
+                state = self._devices[id_alat] = _DeviceState()
+            state.forecast = value
+            state.forecast_bucket = forecast_ts
+
+    def on_reading(self, data):
+        """Listener ingest: menilai satu pembacaan valid lalu memperbarui state alat."""
+        value = data.get("gas_ppm")
+        if value is None:
+            return
+        value = float(value)
+        if not math.isfinite(value):
+            return
+        ts = payload_codec.timestamp_ns(data.get("timestamp"))
+        id_alat = data.get("id_alat", payload_codec.DEFAULT_ID_ALAT)
+
+        events = None
+        with self._lock:
+            state = self._devices.get(id_alat)
+            if state is None:
+                state = self._devices[id_alat] = _DeviceState()
+
+            if self.threshold and value >= self.threshold:
+                events = self._flag(events, state, _AMBANG, ts, value, self.threshold)
+
+            # z-score terhadap statistik sebelum pembacaan ini ikut dihitung
+            if self.z_limit and state.n >= self.warmup and state.var > 0.0:
+                z = (value - state.mean) / math.sqrt(state.var)
+                if abs(z) >= self.z_limit:
+                    events = self._flag(events, state, _ZSCORE, ts, z, self.z_limit)
+
+            # Pembacaan terlambat (lebih lama dari pembacaan terakhir) tidak dipakai untuk laju
+            if state.last_ts is not None and ts > state.last_ts:
+                if self.roc_limit:
+                    rate = (value - state.last_value) * 60e9 / (ts - state.last_ts)
+                    if abs(rate) >= self.roc_limit:
+                        events = self._flag(events, state, _LAJU, ts, rate, self.roc_limit)
+                state.last_value = value
+                state.last_ts = ts
+            elif state.last_ts is None:
+                state.last_value = value
+                state.last_ts = ts
+
+            if self.residual_limit and state.forecast_bucket == ts - ts % BUCKET_NS:
+                residual = value - state.forecast
+                if abs(residual) >= self.residual_limit:
+                    events = self._flag(events, state, _RESIDUAL, ts, residual, self.residual_limit)
+
+            # EWMA mean/varians (bentuk inkremental, O(1)); pembacaan pertama menjadi titik awal
+            if state.n == 0:
+                state.mean = value
+            else:
+                diff = value - state.mean
+                incr = self.alpha * diff
+                state.mean += incr
+                state.var = (1.0 - self.alpha) * (state.var + diff * incr)
+            state.n += 1
+
+        if events is not None:
+            for kind, event_ts, score, limit in events:
+                self._emit(id_alat, KINDS[kind], event_ts, value, score, limit)
+
+    def _flag(self, events, state, kind, ts, score, limit):
+        last = state.last_alert[kind]
+        if last is not None and abs(ts - last) < self.cooldown_ns:
+            return events
+        state.last_alert[kind] = ts
+        if events is None:
+            events = []
+        events.append((kind, ts, score, limit))
+        return events
+
+    def _emit(self, id_alat, kind, ts, value, score, limit):
+        metrics.ANOMALIES_DETECTED.inc(jenis=kind)
+        line = b"".join((
+            self._prefix, payload_codec.escape_tag(id_alat).encode("utf-8"), b",jenis=", kind.encode("ascii"),
+            b" gas_ppm=%r,skor=%r,batas=%r %d" % (value, float(score), float(limit), ts),
+        ))
+        self.write_line(line)
+        logging.warning(f"🚨 Anomali '{kind}' pada id_alat '{id_alat}': gas_ppm={value:.1f}, skor={score:.2f} (batas {limit:g}).")
+        if self.publish is None:
+            return
+        payload = json.dumps({
+            "id_alat": id_alat, "timestamp": ts // 1_000_000_000, "jenis": kind,
+            "gas_ppm": value, "skor": round(float(score), 3), "batas": limit,
+        }).encode("utf-8")
+        try:
+            self.publish(self.alert_topic.format(id_alat=id_alat), payload)
+        except Exception as e:
+            logging.error(f"⚠️ Gagal mempublikasikan alert MQTT: {e}")
+
+    def device_count(self):
+        return len(self._devices)
@@ -0,0 +1,418 @@
+# async_ingest.py
+"""
+Mode ingest asyncio (INGEST_MODE=asyncio).
+
+Satu event loop menangani koneksi MQTT (aiomqtt), decode/validasi payload, dan
+penulisan ke InfluxDB lewat InfluxDBClientAsync:
+
+- Pesan valid diserialisasi ke line protocol dan dimasukkan ke antrean asyncio
+  berukuran terbatas. Jika antrean penuh, pembacaan MQTT ikut menunggu (backpressure).
+- Penulis mengumpulkan batch (INFLUX_BATCH_SIZE / INFLUX_FLUSH_INTERVAL_MS) dan
+  mengirim hingga ASYNC_MAX_IN_FLIGHT batch bersamaan di atas pool koneksi HTTP.
+- Batch yang gagal dicoba ulang dengan backoff eksponensial, lalu dipindah ke spool
+  disk (sama seperti mode thread) dan dikirim ulang oleh task replay.
+- Koneksi MQTT yang putus disambung ulang dengan backoff eksponensial + jitter.
+
+Dependensi opsional: pip install "aiomqtt>=2" "influxdb-client[async]"
+
+aiomqtt 2.x membutuhkan paho-mqtt>=2, sedangkan mode thread (mqtt_handler.py) memakai API
+paho-mqtt 1.x (paho-mqtt==1.6.1). Keduanya tidak bisa dipasang di environment yang sama:
+jalankan mode asyncio dari virtualenv tersendiri. Dependensi diperiksa saat startup dan
+service berhenti dengan RuntimeError yang jelas jika tidak terpenuhi.
+"""
+import asyncio
+import importlib.metadata
+import logging
+import os
+import random
+import signal
+import time
+import config
+import metrics
+import payload_codec
+from mqtt_handler import decode_readings, make_filter
+from spool import Spool, is_retryable_error
+
+_STOP = object()
+_REQUIREMENTS = 'Mode asyncio membutuhkan environment tersendiri: pip install "aiomqtt>=2" "influxdb-client[async]"'
+
+
+def _check_dependencies():
+    """Memastikan aiomqtt 2.x (dan paho-mqtt 2.x di bawahnya) serta klien InfluxDB async tersedia."""
+    try:
+        from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync  # noqa: F401
+        import aiomqtt  # noqa: F401  aiomqtt 2.x gagal diimpor jika paho-mqtt masih 1.x
+    except ImportError as e:
+        raise RuntimeError(f"{_REQUIREMENTS} ({e})") from e
+    version = importlib.metadata.version("aiomqtt")
+    if int(version.split(".")[0]) < 2:
+        raise RuntimeError(f"{_REQUIREMENTS} (terpasang aiomqtt {version})")
+
+
+class AsyncIngestService:
+    def __init__(self, listeners=None):
+        # Konsumen tambahan (misal prediksi online) yang menerima setiap pembacaan valid
+        self.listeners = list(listeners or [])
+        # Dipanggil (di thread) setelah MQTT berhenti dan sebelum antrean ditulis habis,
+        # agar data terakhir dari listener (misal rollup) ikut terkirim
+        self.on_drain = []
+        self.batch_size = max(1, config.INFLUX_BATCH_SIZE)
+        self.flush_interval = config.INFLUX_FLUSH_INTERVAL_MS / 1000.0
+        self.max_in_flight = max(1, config.ASYNC_MAX_IN_FLIGHT)
+        self.retries = max(0, config.ASYNC_WRITE_RETRIES)
+        # Dedup/reorder berjalan di thread event loop, jadi tidak ada perebutan lock
+        self.filter = make_filter()
+
+        self.spool = None
+        if config.INFLUX_SPOOL_DIR:
+            self.spool = Spool(
+                config.INFLUX_SPOOL_DIR,
+                segment_bytes=config.INFLUX_SPOOL_SEGMENT_MB * 1024 * 1024,
+                max_bytes=config.INFLUX_SPOOL_MAX_MB * 1024 * 1024,
+            )
+            metrics.SPOOL_BYTES.set_function(self.spool.size_bytes)
+
+        self._loop = None
+        self._queue = None
+        self._stopping = None
+        self._write_api = None
+        self._mqtt = None
+        # Referensi task latar (publish MQTT, tulis spool) agar tidak dibersihkan GC sebelum selesai
+        self._background = set()
+
+    # --- API untuk thread lain (misal mesin inferensi) ---
+
+    def write_line(self, line):
+        """Memasukkan satu baris line protocol dari thread mana pun. Mengembalikan False jika tidak tertampung."""
+        loop = self._loop
+        try:
+            loop.call_soon_threadsafe(self._enqueue_nowait, line)
+        except (AttributeError, RuntimeError):
+            # Event loop belum berjalan atau sudah ditutup
+            return self._spool_now([line])
+        return True
+
+    def publish(self, topic, payload):
+        """Mempublikasikan pesan MQTT (misal alert anomali) dari thread mana pun; diabaikan jika belum terhubung."""
+        loop = self._loop
+        try:
+            loop.call_soon_threadsafe(self._publish_nowait, topic, payload)
+        except (AttributeError, RuntimeError):
+            logging.warning(f"⚠️ MQTT belum terhubung, pesan ke '{topic}' tidak dikirim.")
+
+    def _publish_nowait(self, topic, payload):
+        if self._mqtt is None:
+            logging.warning(f"⚠️ MQTT belum terhubung, pesan ke '{topic}' tidak dikirim.")
+            return
+        task = self._loop.create_task(self._mqtt.publish(topic, payload, qos=config.MQTT_ALERT_QOS))
+        self._background.add(task)
+        task.add_done_callback(self._publish_done)
+
+    def _publish_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"⚠️ Gagal mempublikasikan pesan MQTT: {task.exception()}")
+
+    def _enqueue_nowait(self, line, data=None):
+        """Memasukkan `line` tanpa menunggu; jika antrean penuh, ke spool. `data` diteruskan ke listener jika tertampung."""
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            # Spool melakukan fsync, jadi dijalankan di thread agar event loop tidak tertahan
+            task = self._loop.create_task(self._spool_overflow([line], data))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return
+        if data is not None:
+            self._notify(data)
+
+    async def _spool_overflow(self, records, data=None):
+        if not await asyncio.to_thread(self._spool_now, records):
+            metrics.MESSAGES_DROPPED.inc(len(records), reason="influx_queue_full")
+            return
+        if data is not None:
+            self._notify(data)
+
+    def _spool_now(self, records):
+        if self.spool is None:
+            return False
+        try:
+            self.spool.append(records)
+        except OSError as e:
+            logging.error(f"❌ Gagal menyimpan {len(records)} data point ke spool. Detail: {e}")
+            return False
+        metrics.POINTS_SPOOLED.inc(len(records))
+        logging.warning(f"💾 {len(records)} data point disimpan ke spool untuk dikirim ulang.")
+        return True
+
+    # --- Siklus hidup ---
+
+    def run(self):
+        """Menjalankan service hingga dihentikan (Ctrl+C atau SIGTERM)."""
+        asyncio.run(self._main())
+
+    def stop(self):
+        """Meminta service berhenti dari thread lain; sisa antrean tetap ditulis."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _main(self):
+        _check_dependencies()
+        from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=config.INFLUX_QUEUE_MAXSIZE)
+        self._stopping = asyncio.Event()
+        metrics.QUEUE_DEPTH.set_function(self._queue.qsize, queue="async_ingest")
+        try:
+            self._loop.add_signal_handler(signal.SIGTERM, self._stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows / bukan thread utama
+
+        async with InfluxDBClientAsync(
+            url=config.INFLUX_URL,
+            token=config.INFLUX_TOKEN,
+            org=config.INFLUX_ORG,
+            timeout=10_000,
+            connection_pool_maxsize=self.max_in_flight,
+        ) as client:
+            self._write_api = client.write_api()
+            writer = asyncio.create_task(self._writer_loop(), name="influx-writer")
+            mqtt = asyncio.create_task(self._mqtt_loop(), name="mqtt-reader")
+            replay = asyncio.create_task(self._replay_loop(), name="spool-replay") if self.spool else None
+            reorder = None
+            if self.filter is not None and self.filter.tolerance > 0:
+                reorder = asyncio.create_task(self._reorder_loop(), name="reorder-flush")
+            stop_wait = asyncio.create_task(self._stopping.wait(), name="stop-wait")
+            workers = {task for task in (writer, mqtt, replay, reorder) if task is not None}
+            logging.info(f"🚀 Ingest asyncio berjalan (batch={self.batch_size}, in-flight={self.max_in_flight}).")
+            failure = None
+            try:
+                # Semua task latar berjalan tanpa batas; jika salah satu selesai, itu kegagalan.
+                # Service dihentikan (lalu keluar dengan error) agar systemd/launcher menjalankannya ulang.
+                done, _ = await asyncio.wait(workers | {stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+                for task in done - {stop_wait}:
+                    error = None if task.cancelled() else task.exception()
+                    failure = f"task '{task.get_name()}' berhenti tak terduga: {error!r}"
+                    logging.critical(f"🔥 Ingest asyncio: {failure}", exc_info=error)
+            except asyncio.CancelledError:
+                logging.info("Service dihentikan oleh pengguna.")
+            finally:
+                stop_wait.cancel()
+                self._stopping.set()
+                # Berhenti membaca MQTT, lalu tulis semua yang sudah ada di antrean
+                mqtt.cancel()
+                await asyncio.gather(mqtt, return_exceptions=True)
+                self._mqtt = None
+                if reorder is not None:
+                    await asyncio.gather(reorder, return_exceptions=True)
+                if self.filter is not None:
+                    # Jika writer sudah mati, antrean tidak akan berkurang: jangan menunggu tempat kosong
+                    for data in self.filter.flush_due(force=True):
+                        await self._emit(data, block=not writer.done())
+                for callback in self.on_drain:
+                    try:
+                        await asyncio.to_thread(callback)
+                    except Exception as e:
+                        logging.error(f"⚠️ Error saat menutup listener: {e}", exc_info=True)
+                if self._background:
+                    await asyncio.gather(*self._background, return_exceptions=True)
+                if writer.done():
+                    # Writer mati: sisa antrean tidak bisa ditulis, simpan ke spool agar tidak hilang
+                    remaining = []
+                    while not self._queue.empty():
+                        remaining.append(self._queue.get_nowait())
+                    if remaining and not await asyncio.to_thread(self._spool_now, remaining):
+                        metrics.MESSAGES_DROPPED.inc(len(remaining), reason="writer_failed")
+                else:
+                    logging.info(f"⏳ Menulis sisa {self._queue.qsize()} data point di antrean...")
+                    await self._queue.put(_STOP)
+                    await writer
+                if replay is not None:
+                    replay.cancel()
+                    await asyncio.gather(replay, return_exceptions=True)
+                if self.spool is not None:
+                    self.spool.close()
+        self._loop = None
+        logging.info("🔌 Ingest asyncio berhenti.")
+        if failure is not None:
+            raise RuntimeError(failure)
+
+    # --- MQTT ---
+
+    async def _mqtt_loop(self):
+        import aiomqtt
+
+        protocols = {"3.1.1": aiomqtt.ProtocolVersion.V311, "5": aiomqtt.ProtocolVersion.V5}
+        if config.MQTT_PROTOCOL not in protocols:
+            raise ValueError(f"MQTT_PROTOCOL tidak dikenal: '{config.MQTT_PROTOCOL}' (pilihan: {', '.join(protocols)}).")
+        protocol = protocols[config.MQTT_PROTOCOL]
+        backoff = config.MQTT_RECONNECT_MIN
+        while True:
+            try:
+                logging.info(f"🚀 Menghubungkan ke MQTT broker {config.MQTT_BROKER}:{config.MQTT_PORT}...")
+                async with aiomqtt.Client(
+                    hostname=config.MQTT_BROKER,
+                    port=config.MQTT_PORT,
+                    identifier=config.MQTT_CLIENT_ID_LOGGER,
+                    protocol=protocol,
+                    username=os.getenv("MQTT_USER") or None,
+                    password=os.getenv("MQTT_PASS") or None,
+                    keepalive=60,
+                ) as client:
+                    self._mqtt = client
+                    await client.subscribe(config.MQTT_SUBSCRIBE_TOPIC)
+                    logging.info(f"📡 Berhasil subscribe ke topik: {config.MQTT_SUBSCRIBE_TOPIC}")
+                    backoff = config.MQTT_RECONNECT_MIN
+                    async for message in client.messages:
+                        metrics.MESSAGES_RECEIVED.inc()
+                        try:
+                            await self._handle(message.payload)
+                        except Exception as e:
+                            logging.error(f"⚠️ Error saat proses pesan MQTT: {e}", exc_info=True)
+            except aiomqtt.MqttError as e:
+                self._mqtt = None
+                delay = random.uniform(backoff / 2, backoff)
+                logging.warning(f"🔌 Koneksi MQTT terputus ({e}), mencoba lagi dalam {delay:.1f} detik...")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, config.MQTT_RECONNECT_MAX)
+
+    async def _handle(self, raw_payload):
+        for data in decode_readings(raw_payload):
+            if self.filter is None:
+                await self._emit(data)
+                continue
+            try:
+                ready = self.filter.push(data)
+            except (TypeError, ValueError) as e:
+                metrics.MESSAGES_INVALID.inc()
+                logging.error(f"❌ Timestamp tidak valid: {e}")
+                continue
+            for item in ready:
+                await self._emit(item)
+
+    async def _reorder_loop(self):
+        # Berhenti lewat flag (bukan cancel) agar pembacaan yang sudah dilepas tidak hilang di tengah jalan
+        interval = min(max(self.filter.tolerance / 4, 0.05), 1.0)
+        while not self._stopping.is_set():
+            await asyncio.sleep(interval)
+            for data in self.filter.flush_due():
+                await self._emit(data)
+
+    async def _emit(self, data, block=True):
+        try:
+            line = payload_codec.encode_line(data)
+        except (TypeError, ValueError) as e:
+            metrics.MESSAGES_INVALID.inc()
+            logging.error(f"❌ Nilai tidak valid: {e}")
+            return
+        if block:
+            await self._queue.put(line)
+            self._notify(data)
+        else:
+            self._enqueue_nowait(line, data)
+
+    def _notify(self, data):
+        """
+        Meneruskan pembacaan ke listener hanya jika line-nya masuk antrean penulis atau spool
+        (sama seperti write_data di mode thread); pembacaan yang dibuang tidak diteruskan.
+        """
+        for listener in self.listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logging.error(f"⚠️ Error di listener pembacaan: {e}", exc_info=True)
+
+    # --- InfluxDB ---
+
+    async def _next_batch(self):
+        """Mengambil satu batch dari antrean. Mengembalikan (batch, berhenti)."""
+        batch = []
+        deadline = self._loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _writer_loop(self):
+        slots = asyncio.Semaphore(self.max_in_flight)
+        in_flight = set()
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if not batch:
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(self._write_batch(batch))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _write_batch(self, batch):
+        metrics.BATCH_SIZE.observe(len(batch))
+        delay = 0.5
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                await self._write_api.write(bucket=config.INFLUX_BUCKET, org=config.INFLUX_ORG, record=batch)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    metrics.POINTS_FAILED.inc(len(batch))
+                    logging.error(f"❌ Batch {len(batch)} data point ditolak InfluxDB dan dibuang. Detail: {e}")
+                    return
+                if attempt == self.retries:
+                    metrics.POINTS_FAILED.inc(len(batch))
+                    logging.error(f"❌ Gagal menulis batch {len(batch)} data point ke InfluxDB. Detail: {e}")
+                    await asyncio.to_thread(self._spool_now, batch)
+                    return
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                delay *= 2
+                continue
+            metrics.WRITE_LATENCY.observe(time.perf_counter() - start, mode="async")
+            metrics.POINTS_WRITTEN.inc(len(batch))
+            logging.debug("✅ Batch %d data point ditulis ke InfluxDB.", len(batch))
+            return
+
+    async def _replay_loop(self):
+        """Padanan SpoolReplayer untuk event loop: kirim ulang isi spool dengan backoff."""
+        interval = config.INFLUX_SPOOL_REPLAY_INTERVAL
+        backoff = interval
+        while True:
+            if await asyncio.to_thread(self.spool.is_empty):
+                await asyncio.sleep(interval)
+                continue
+            records, position = await asyncio.to_thread(self.spool.read_batch, config.INFLUX_SPOOL_REPLAY_BATCH)
+            if not records:
+                # Tidak ada record utuh yang bisa dibaca, cukup majukan offset
+                await asyncio.to_thread(self.spool.commit, position)
+                await asyncio.sleep(interval)
+                continue
+            start = time.perf_counter()
+            try:
+                await self._write_api.write(bucket=config.INFLUX_BUCKET, org=config.INFLUX_ORG, record=records)
+            except Exception as e:
+                if is_retryable_error(e):
+                    logging.warning(f"⚠️ Replay spool gagal, dicoba lagi dalam {backoff:.0f} detik. Detail: {e}")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 300.0)
+                    continue
+                logging.error(f"❌ Batch spool ({len(records)} record) ditolak InfluxDB dan dibuang. Detail: {e}")
+            else:
+                metrics.WRITE_LATENCY.observe(time.perf_counter() - start, mode="replay")
+                metrics.POINTS_REPLAYED.inc(len(records))
+                logging.info(f"♻️ {len(records)} data point dari spool berhasil ditulis ulang ke InfluxDB.")
+            backoff = interval
+            await asyncio.to_thread(self.spool.commit, position)
@@ -0,0 +1,118 @@
+# bench_anomaly.py
+"""
+Benchmark biaya AnomalyDetector per pesan di jalur ingest.
+
+Pembacaan sintetis untuk `--devices` alat (satu pembacaan per menit per alat, urut waktu,
+dengan sedikit lonjakan agar jalur kejadian ikut teruji) diberikan ke `on_reading`
+seperti yang dilakukan listener ingest. Yang diukur:
+- waktu per pesan (termasuk parsing timestamp dan lock),
+- alokasi memori per pesan pada kondisi stabil (tracemalloc, setelah semua alat punya state),
+- memori state per alat,
+- sebagai acuan: z-score jendela geser (deque 60 pembacaan + statistics per pesan).
+
+Contoh:
+    python bench_anomaly.py --devices 5000 --minutes 60
+"""
+import argparse
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+from collections import deque
+from anomaly_detector import AnomalyDetector
+
+START_EPOCH = 1_735_689_600  # 2025-01-01T00:00:00Z
+
+
+def make_readings(n_devices, minutes, spike_rate, seed=1):
+    rng = random.Random(seed)
+    readings = []
+    for minute in range(minutes):
+        ts = START_EPOCH + minute * 60
+        for d in range(n_devices):
+            value = 300.0 + 40.0 * rng.random()
+            if rng.random() < spike_rate:
+                value += 600.0
+            readings.append({"timestamp": ts, "gas_ppm": value, "id_alat": f"alat{d:05d}"})
+    return readings
+
+
+class WindowZScore:
+    """Acuan: z-score terhadap 60 pembacaan terakhir per alat (memori O(jendela) per alat)."""
+
+    def __init__(self, window=60, z_limit=4.0):
+        self.window = window
+        self.z_limit = z_limit
+        self.history = {}
+        self.events = 0
+
+    def on_reading(self, data):
+        values = self.history.get(data["id_alat"])
+        if values is None:
+            values = self.history[data["id_alat"]] = deque(maxlen=self.window)
+        value = data["gas_ppm"]
+        if len(values) >= 2:
+            stdev = statistics.pstdev(values)
+            if stdev > 0 and abs(value - statistics.fmean(values)) / stdev >= self.z_limit:
+                self.events += 1
+        values.append(value)
+
+
+def run(listener, readings):
+    start = time.perf_counter()
+    for data in readings:
+        listener(data)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--devices", type=int, default=5000, help="jumlah alat")
+    ap.add_argument("--minutes", type=int, default=60, help="jumlah pembacaan per alat")
+    ap.add_argument("--spike-rate", type=float, default=0.001, help="peluang lonjakan per pembacaan")
+    args = ap.parse_args()
+
+    readings = make_readings(args.devices, args.minutes, args.spike_rate)
+    warmup, steady = readings[:args.devices], readings[args.devices:]
+    n = len(steady)
+    print(f"{args.devices} alat x {args.minutes} pembacaan ({len(readings):,} pesan)")
+
+    lines = []
+    logging.disable(logging.WARNING)  # Log per kejadian tidak ikut diukur
+    detector = AnomalyDetector(lines.append, publish=lambda topic, payload: None, warmup=10)
+    # Pembacaan pertama setiap alat membuat state; diukur terpisah dari kondisi stabil
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run(detector.on_reading, warmup)
+    per_device = (tracemalloc.get_traced_memory()[0] - before) / args.devices
+    tracemalloc.stop()
+
+    elapsed = run(detector.on_reading, steady)
+    print(f"AnomalyDetector       : {elapsed / n * 1e6:.2f} µs per pesan ({n / elapsed:,.0f} pesan/detik), "
+          f"{len(lines)} kejadian")
+
+    # Pertumbuhan memori pada kondisi stabil (tanpa kejadian). Dua putaran di bawah tracemalloc:
+    # objek yang diganti di putaran kedua (timestamp, float) dialokasikan saat pelacakan aktif,
+    # jadi pembebasannya ikut terhitung dan yang tersisa hanya pertumbuhan sebenarnya.
+    def quiet_pass(minute):
+        ts = START_EPOCH + minute * 60
+        return [{"timestamp": ts, "gas_ppm": 320.0, "id_alat": r["id_alat"]} for r in warmup]
+
+    first, second = quiet_pass(args.minutes), quiet_pass(args.minutes + 1)
+    tracemalloc.start()
+    run(detector.on_reading, first)
+    before = tracemalloc.get_traced_memory()[0]
+    run(detector.on_reading, second)
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"State per alat        : {per_device:.0f} byte; pertumbuhan memori stabil {growth / len(second):.2f} byte per pesan")
+
+    baseline = WindowZScore()
+    elapsed_base = run(baseline.on_reading, readings)
+    print(f"Jendela geser (acuan) : {elapsed_base / len(readings) * 1e6:.2f} µs per pesan "
+          f"({elapsed_base / len(readings) / (elapsed / n):.1f}x lebih lambat)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench_features.py
+"""
+Benchmark feature engineering: implementasi lama (pandas float64 asfreq + interpolate
++ np.sin/np.cos per baris) dibandingkan feature_pipeline.py (float32, interpolasi di
+tempat, tabel lookup fitur waktu) pada rentang 30 hari dan 1 tahun bucket 5 menit.
+
+Data sintetis meniru hasil InfluxStreamReader.read_frame: hanya bucket yang berisi
+data (sebagian bucket hilang), float32, dengan sebagian kecil nilai NaN.
+
+Contoh:
+    python bench_features.py --missing 0.05 --repeat 5
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import feature_pipeline
+from feature_pipeline import FEATURES, RAW_FEATURES, TIME_FEATURES
+
+RANGES = {"30d": 30, "1y": 365}
+
+
+def legacy_prepare(df):
+    """Salinan preprocess_data sebelum feature_pipeline.py (acuan)."""
+    df = df.astype(np.float64).asfreq('5min')
+    df.interpolate(method='time', inplace=True)
+    df.dropna(inplace=True)
+    df['jam_sin'] = np.sin(2 * np.pi * df.index.hour / 24.0)
+    df['jam_cos'] = np.cos(2 * np.pi * df.index.hour / 24.0)
+    df['hari_minggu_sin'] = np.sin(2 * np.pi * df.index.dayofweek / 7.0)
+    df['hari_minggu_cos'] = np.cos(2 * np.pi * df.index.dayofweek / 7.0)
+    return df
+
+
+def legacy_time_features(bucket_ns):
+    """Salinan online_predictor.time_features sebelum tabel lookup (acuan)."""
+    seconds = bucket_ns // 1_000_000_000
+    hour = (seconds // 3600) % 24
+    dayofweek = (seconds // 86400 + 3) % 7
+    return {
+        'jam_sin': np.sin(2 * np.pi * hour / 24.0),
+        'jam_cos': np.cos(2 * np.pi * hour / 24.0),
+        'hari_minggu_sin': np.sin(2 * np.pi * dayofweek / 7.0),
+        'hari_minggu_cos': np.cos(2 * np.pi * dayofweek / 7.0),
+    }
+
+
+def make_frame(days, missing, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=days * 288, freq="5min", tz="UTC", name="_time")
+    t = np.arange(len(index))
+    values = np.column_stack([
+        25 + 5 * np.sin(t / 288 * 2 * np.pi) + rng.normal(0, 0.3, len(t)),
+        60 + 10 * rng.random(len(t)),
+        1008 + rng.normal(0, 1, len(t)),
+        300 + 150 * np.sin(t / 50) + rng.normal(0, 5, len(t)),
+    ]).astype(np.float32)
+    values[rng.random(values.shape) < missing / 5] = np.nan
+    keep = rng.random(len(t)) >= missing
+    return pd.DataFrame(values[keep], index=index[keep], columns=list(RAW_FEATURES))
+
+
+def measure(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(df)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--missing", type=float, default=0.05, help="fraksi bucket tanpa data")
+    ap.add_argument("--repeat", type=int, default=5, help="jumlah pengulangan (diambil yang tercepat)")
+    ap.add_argument("--online-calls", type=int, default=100_000, help="jumlah bucket untuk benchmark fitur waktu online")
+    args = ap.parse_args()
+
+    print(f"{'Rentang':<8} {'Baris':>8} {'Implementasi':<18} {'Waktu (ms)':>11} {'Puncak (MB)':>12} {'Hasil':>10}")
+    for name, days in RANGES.items():
+        df = make_frame(days, args.missing)
+        old, old_s, old_peak = measure(legacy_prepare, df, args.repeat)
+        new, new_s, new_peak = measure(feature_pipeline.prepare_frame, df, args.repeat)
+        assert old.index.equals(new.index), "index berbeda"
+        diff = np.max(np.abs(old[list(FEATURES)].to_numpy() - new.to_numpy(dtype=np.float64)))
+        print(f"{name:<8} {len(old):>8} {'lama (float64)':<18} {old_s * 1000:>11.2f} {old_peak / 2**20:>12.2f} {old.to_numpy().nbytes / 2**20:>8.2f}MB")
+        print(f"{'':<8} {len(new):>8} {'feature_pipeline':<18} {new_s * 1000:>11.2f} {new_peak / 2**20:>12.2f} {new.to_numpy().nbytes / 2**20:>8.2f}MB")
+        print(f"{'':<8} {'':>8} {'percepatan':<18} {old_s / new_s:>10.1f}x {'selisih maks':>12} {diff:>10.2e}")
+
+    buckets = np.arange(args.online_calls, dtype=np.int64) * feature_pipeline.BUCKET_NS + 1_735_689_600 * 10**9
+    start = time.perf_counter()
+    for b in buckets:
+        cyclic = legacy_time_features(int(b))
+        [cyclic[n] for n in TIME_FEATURES]
+    old_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for b in buckets:
+        feature_pipeline.calendar_row(int(b))
+    new_s = time.perf_counter() - start
+    print(f"\nFitur waktu online per bucket: lama {old_s / len(buckets) * 1e6:.2f} us, "
+          f"tabel lookup {new_s / len(buckets) * 1e6:.2f} us ({old_s / new_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench_inference.py
+"""
+Benchmark inferensi LSTM untuk banyak alat sekaligus.
+
+Membandingkan jalur lama (satu model.predict per window, seperti predicts.py) dengan
+satu panggilan batch per tick untuk semua alat pada backend keras, tflite, dan numpy.
+Model acak dengan arsitektur train_model.py dipakai (bobot tidak memengaruhi waktu).
+Jalankan: python bench_inference.py [jumlah_alat] [jumlah_tick]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+N_STEPS = 12
+N_FEATURES = 8
+
+
+def build_model():
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Input, LSTM, Dense, Dropout
+    model = Sequential([
+        Input(shape=(N_STEPS, N_FEATURES)),
+        LSTM(50, activation='tanh', return_sequences=True),
+        Dropout(0.2),
+        LSTM(50, activation='tanh'),
+        Dropout(0.2),
+        Dense(1)
+    ])
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def report(name, latencies, n_devices, load_seconds):
+    latencies = np.asarray(latencies) * 1000
+    rate = n_devices / (latencies.mean() / 1000)
+    print(f"{name:<16} load {load_seconds:6.2f} s  p50 {np.percentile(latencies, 50):8.2f} ms  "
+          f"p99 {np.percentile(latencies, 99):8.2f} ms  {rate:>10,.0f} window/detik")
+    return rate
+
+
+def bench_per_window(model, windows, n_ticks):
+    """Jalur lama: satu model.predict per alat."""
+    latencies = []
+    for _ in range(n_ticks):
+        start = time.perf_counter()
+        for window in windows:
+            model.predict(window[np.newaxis], verbose=0)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_backend(backend, windows, n_ticks):
+    """Satu panggilan backend untuk semua window per tick (InferenceEngine.tick)."""
+    backend.predict(windows)  # pemanasan (alokasi tensor/trace)
+    latencies = []
+    for _ in range(n_ticks):
+        start = time.perf_counter()
+        backend.predict(windows)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    n_devices = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    from inference_engine import export_numpy_weights, export_tflite, load_backend
+
+    rng = np.random.default_rng(0)
+    windows = rng.random((n_devices, N_STEPS, N_FEATURES), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {
+            "keras": os.path.join(tmp, "model.keras"),
+            "tflite": os.path.join(tmp, "model.tflite"),
+            "numpy": os.path.join(tmp, "model_weights.npz"),
+        }
+        model = build_model()
+        model.save(paths["keras"])
+        export_tflite(model, paths["tflite"])
+        export_numpy_weights(model, paths["numpy"])
+
+        print(f"{n_devices} alat, {n_ticks} tick, window ({N_STEPS}, {N_FEATURES})")
+        # Jalur lama hanya beberapa tick karena sangat lambat untuk banyak alat
+        legacy = report("per-window", bench_per_window(model, windows, min(n_ticks, 3)), n_devices, 0.0)
+
+        reference = None
+        for kind in ("keras", "tflite", "numpy"):
+            start = time.perf_counter()
+            backend = load_backend(kind, paths[kind])
+            load_seconds = time.perf_counter() - start
+            predictions = backend.predict(windows)
+            if reference is None:
+                reference = predictions
+            else:
+                # Semua backend harus menghasilkan prediksi yang sama (toleransi float32)
+                max_diff = float(np.max(np.abs(predictions - reference)))
+                assert max_diff < 1e-4, (kind, max_diff)
+            rate = report(f"batch {kind}", bench_backend(backend, windows, n_ticks), n_devices, load_seconds)
+            print(f"{'':<16} speedup vs per-window: {rate / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
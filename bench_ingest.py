@@ -0,0 +1,251 @@
+# bench_ingest.py
+"""
+Benchmark throughput dan latensi ingest logger_main (MQTT -> InfluxDB) tanpa broker dan server sungguhan.
+
+- Broker MQTT diganti generator lokal yang memanggil MQTTHandler._on_message langsung
+  dengan payload berformat sama seperti Nultra_esp32.ino.
+- InfluxDB diganti server HTTP lokal yang menerima /api/v2/write dan mencatat waktu
+  kedatangan setiap baris line protocol.
+
+Contoh:
+    python bench_ingest.py --devices 500 --rate 2000 --duration 20 --mode batch --workers 4
+"""
+import argparse
+import gzip
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeInfluxDB:
+    """Server HTTP lokal yang meniru endpoint tulis InfluxDB v2."""
+
+    def __init__(self):
+        self.arrivals = {}  # (id_alat, timestamp_ns) -> waktu diterima (perf_counter)
+        self.lines = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                now = time.perf_counter()
+                fake._record(body, now)
+                self.send_response(204)
+                self.end_headers()
+
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _record(self, body, now):
+        with self._lock:
+            self.requests += 1
+            for line in body.split(b"\n"):
+                if not line:
+                    continue
+                head, _, ts = line.rpartition(b" ")
+                tag = head.split(b" ", 1)[0].split(b"id_alat=", 1)[1]
+                self.arrivals[(tag.decode(), int(ts))] = now
+                self.lines += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class FakeMessage:
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class StageTimer:
+    """Membungkus satu fungsi untuk mencatat durasi wall dan CPU thread setiap panggilan."""
+
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+        self.durations = []
+        self.cpu = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        try:
+            return self.fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            cpu = time.thread_time() - cpu_start
+            with self._lock:
+                self.durations.append(elapsed)
+                self.cpu += cpu
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_payload(id_alat, ts):
+    return (
+        '{"timestamp":"%s","suhu":%.1f,"kelembaban":%.1f,"tekanan":%.2f,"mq2_raw":%d,"gas_ppm":%.6f,"id_alat":"%s"}'
+        % (ts.strftime("%Y-%m-%d %H:%M:%S"), random.uniform(24, 34), random.uniform(50, 90),
+           random.uniform(1000, 1015), random.randint(200, 4000), random.uniform(50, 900), id_alat)
+    ).encode("utf-8")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--devices", type=int, default=100, help="jumlah alat (id_alat unik)")
+    ap.add_argument("--rate", type=float, default=1000, help="total pesan/detik (0 = secepat mungkin)")
+    ap.add_argument("--duration", type=float, default=10, help="lama replay trafik (detik)")
+    ap.add_argument("--mode", choices=("sync", "batch"), default="sync", help="INFLUX_WRITE_MODE")
+    ap.add_argument("--workers", type=int, default=4, help="INGEST_WORKERS (0 = proses di thread callback)")
+    ap.add_argument("--policy", choices=("block", "drop_oldest", "spill"), default="block", help="INGEST_OVERFLOW_POLICY")
+    ap.add_argument("--dup-rate", type=float, default=0.0, help="fraksi pesan yang dikirim ulang (simulasi QoS/reconnect)")
+    ap.add_argument("--reorder-rate", type=float, default=0.0, help="fraksi pesan yang tertukar urutan dengan pesan berikutnya alat yang sama")
+    ap.add_argument("--log-level", default="INFO", help="level logging service (output dibuang ke /dev/null)")
+    args = ap.parse_args()
+
+    fake = FakeInfluxDB()
+    fake.start()
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+
+    # Konfigurasi dibaca saat config.py diimpor, jadi environment di-set lebih dulu
+    os.environ.update({
+        "INFLUX_URL": fake.url, "INFLUX_TOKEN": "bench", "INFLUX_ORG": "bench", "INFLUX_BUCKET": "bench",
+        "MQTT_BROKER": "localhost", "MQTT_TOPIC_DATA": "iot/kualitas_udara/+/data",
+        "INGEST_OVERFLOW_POLICY": args.policy,
+        "INGEST_SPILL_PATH": os.path.join(workdir, "ingest_spill.bin"),
+        "INFLUX_SPOOL_DIR": os.path.join(workdir, "spool"),
+    })
+    import config
+    import metrics
+    from influx_handler import InfluxDBHandler
+    from mqtt_handler import MQTTHandler
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(logging.FileHandler(os.devnull))
+    root.setLevel(args.log_level.upper())
+
+    influx_db = InfluxDBHandler(write_mode=args.mode)
+    mqtt_service = MQTTHandler(influx_handler=influx_db, ingest_workers=args.workers)
+
+    on_message = StageTimer("_on_message", mqtt_service._on_message)
+    write_data = StageTimer("write_data", influx_db.write_data)
+    influx_db.write_data = write_data
+    if mqtt_service.pipeline is not None:
+        mqtt_service.pipeline.start()
+    if mqtt_service.filter is not None:
+        mqtt_service.filter.start(mqtt_service._emit)
+
+    devices = [f"alat{i:04d}" for i in range(args.devices)]
+    topics = [f"iot/kualitas_udara/{d}/data" for d in devices]
+    published = {}
+    held_back = {}  # id_alat -> pesan yang ditunda agar tiba setelah pesan berikutnya
+    base = datetime(2025, 1, 1, 0, 0, 0)
+
+    import payload_codec
+    rss_start = current_rss_mb()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    seq = 0
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        idx = seq % len(devices)
+        ts = base + timedelta(seconds=seq // len(devices))
+        payload = make_payload(devices[idx], ts)
+        published[(devices[idx], payload_codec.timestamp_ns(ts.strftime("%Y-%m-%d %H:%M:%S")))] = time.perf_counter()
+        message = FakeMessage(topics[idx], payload)
+        if args.reorder_rate and devices[idx] not in held_back and random.random() < args.reorder_rate:
+            held_back[devices[idx]] = message
+        else:
+            on_message(None, None, message)
+            late = held_back.pop(devices[idx], None)
+            if late is not None:
+                on_message(None, None, late)
+        if args.dup_rate and random.random() < args.dup_rate:
+            on_message(None, None, message)
+        seq += 1
+        if interval:
+            sleep_for = start + seq * interval - time.perf_counter()
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+    for message in held_back.values():
+        on_message(None, None, message)
+    publish_end = time.perf_counter()
+
+    # Kosongkan antrean ingest & batch, lalu tunggu semua baris tiba di server palsu
+    mqtt_service.stop()
+    influx_db.close()
+    wait_until = time.perf_counter() + 10
+    while fake.lines < len(published) and time.perf_counter() < wait_until:
+        time.sleep(0.05)
+    end = time.perf_counter()
+    cpu_total = time.process_time() - cpu_start
+    rss_end = current_rss_mb()
+    fake.stop()
+
+    latencies = [fake.arrivals[k] - t for k, t in published.items() if k in fake.arrivals]
+    elapsed = end - start
+    print(f"\n=== bench_ingest: {args.devices} alat, target {args.rate:g} pesan/detik, mode={args.mode}, workers={args.workers} ===")
+    print(f"Dipublikasikan       : {seq} pesan dalam {publish_end - start:.2f} s ({seq / (publish_end - start):,.0f} pesan/detik)")
+    print(f"Tertulis ke InfluxDB : {fake.lines} baris, {fake.requests} HTTP request ({fake.lines / elapsed:,.0f} baris/detik)")
+    print(f"Hilang               : {seq - len(latencies)}")
+    if args.dup_rate or args.reorder_rate:
+        print(f"Duplikat dibuang     : {metrics.DUPLICATES_DROPPED.value():.0f}, diurutkan ulang: "
+              f"{metrics.POINTS_REORDERED.value():.0f}, terlambat: {metrics.POINTS_LATE.value():.0f}")
+    print(f"Latensi end-to-end   : p50 {percentile(latencies, 50) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"{'Tahap':<12} {'panggilan':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'CPU (s)':>9}")
+    for stage in (on_message, write_data):
+        print(f"{stage.name:<12} {len(stage.durations):>10} {percentile(stage.durations, 50) * 1000:>10.3f} "
+              f"{percentile(stage.durations, 99) * 1000:>10.3f} {stage.cpu:>9.3f}")
+    print(f"CPU proses total     : {cpu_total:.2f} s ({cpu_total / elapsed * 100:.0f}% dari satu core)")
+    print(f"RSS                  : {rss_start:.1f} MB -> {rss_end:.1f} MB (puncak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB)")
+    return 0 if len(latencies) == seq else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
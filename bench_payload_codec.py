@@ -0,0 +1,148 @@
+# bench_payload_codec.py
+"""
+Microbenchmark decode + serialisasi payload ESP32.
+
+Membandingkan jalur lama (json.loads + dateutil + Point builder) dengan
+payload_codec (json.loads bytes + datetime.fromisoformat + line protocol langsung),
+lalu membandingkan payload JSON (satu pembacaan per publish) dengan payload biner
+(N pembacaan per publish): byte di jaringan dan biaya decode per pembacaan.
+Jalankan: python bench_payload_codec.py [jumlah_pesan] [jumlah_alat]
+"""
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from dateutil import parser
+from influxdb_client import Point
+import payload_codec
+
+
+def make_payloads(n_messages, n_devices):
+    """Membuat payload JSON sintetis dengan format yang sama seperti Nultra_esp32.ino."""
+    start = datetime(2025, 1, 1, 0, 0, 0)
+    payloads = []
+    for i in range(n_messages):
+        ts = start + timedelta(seconds=60 * (i // n_devices))
+        doc = {
+            "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "suhu": round(random.uniform(24, 34), 1),
+            "kelembaban": round(random.uniform(50, 90), 1),
+            "tekanan": round(random.uniform(1000, 1015), 2),
+            "mq2_raw": random.randint(200, 4000),
+            "gas_ppm": random.uniform(50, 900),
+            "id_alat": f"alat{i % n_devices:04d}",
+        }
+        payloads.append(json.dumps(doc).encode("utf-8"))
+    return payloads
+
+
+def legacy_path(raw):
+    """Jalur sebelum payload_codec: decode, dateutil, Point builder, lalu serialisasi."""
+    data = json.loads(raw.decode("utf-8"))
+    raw_timestamp = data.get("timestamp")
+    if isinstance(raw_timestamp, str):
+        device_timestamp = parser.parse(raw_timestamp).astimezone(timezone.utc)
+    else:
+        device_timestamp = datetime.fromtimestamp(int(raw_timestamp), tz=timezone.utc)
+    point = Point("pengukuran_udara") \
+        .tag("id_alat", data.get("id_alat", "ALAT_01")) \
+        .field("suhu", float(data.get("suhu", 0.0))) \
+        .field("kelembaban", float(data.get("kelembaban", 0.0))) \
+        .field("tekanan", float(data.get("tekanan", 0.0))) \
+        .field("gas_ppm", float(data.get("gas_ppm", 0.0))) \
+        .time(device_timestamp)
+    return point.to_line_protocol().encode("utf-8")
+
+
+def fast_path(raw):
+    return payload_codec.encode_line(payload_codec.decode_payload(raw))
+
+
+def run(name, fn, payloads):
+    payload_codec._tag_prefix.cache_clear()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for raw in payloads:
+        fn(raw)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    rate = len(payloads) / cpu if cpu else float("inf")
+    print(f"{name:<14} {len(payloads):>8} pesan  {wall:7.3f} s wall  {cpu:7.3f} s CPU  {rate:>10,.0f} pesan/detik/core")
+    return rate
+
+
+# Header fixed MQTT PUBLISH QoS 0 (2 byte) + panjang topik (2 byte) + topik Nultra_esp32.ino
+MQTT_OVERHEAD = 4 + len("iot/kualitas_udara/alat01/data")
+BATCH_SIZES = (1, 5, 10, 30, 60)
+
+
+def decode_json_reading(raw):
+    data = payload_codec.decode_payload(raw)
+    payload_codec.timestamp_ns(data["timestamp"])
+    return 1
+
+
+def decode_binary_readings(raw):
+    readings = payload_codec.decode_readings(raw)
+    for data in readings:
+        payload_codec.timestamp_ns(data["timestamp"])
+    return len(readings)
+
+
+def time_per_reading(fn, payloads, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        readings = sum(fn(raw) for raw in payloads)
+        best = min(best, (time.perf_counter() - start) / readings)
+    return best
+
+
+def compare_formats(n_readings):
+    """Byte per pembacaan (payload + overhead MQTT per publish) dan waktu decode per pembacaan."""
+    json_payloads = make_payloads(n_readings, 1)
+    readings = []
+    for raw in json_payloads:
+        data = json.loads(raw)
+        data["timestamp"] = payload_codec.timestamp_ns(data["timestamp"]) // 1_000_000_000
+        readings.append(data)
+
+    # Payload biner harus menghasilkan nilai yang sama (dibulatkan ke float32)
+    decoded = payload_codec.decode_readings(payload_codec.encode_binary(readings[:10], "ALAT_01"))
+    for data, got in zip(readings, decoded):
+        assert got["timestamp"] == data["timestamp"] and got["id_alat"] == "ALAT_01"
+        assert all(math.isclose(got[f], data[f], rel_tol=1e-6) for f in payload_codec.FIELDS)
+
+    json_bytes = sum(len(raw) + MQTT_OVERHEAD for raw in json_payloads) / len(json_payloads)
+    json_cost = time_per_reading(decode_json_reading, json_payloads)
+    print(f"\n{'Format':<14} {'Per publish':>11} {'Byte/pembacaan':>15} {'Decode/pembacaan':>17}")
+    print(f"{'JSON':<14} {1:>11} {json_bytes:>15.1f} {json_cost * 1e6:>14.2f} us")
+    for batch in BATCH_SIZES:
+        payloads = [payload_codec.encode_binary(readings[i:i + batch], "ALAT_01")
+                    for i in range(0, len(readings) - batch + 1, batch)]
+        wire = sum(len(raw) + MQTT_OVERHEAD for raw in payloads) / (len(payloads) * batch)
+        cost = time_per_reading(decode_binary_readings, payloads)
+        print(f"{'biner':<14} {batch:>11} {wire:>15.1f} {cost * 1e6:>14.2f} us"
+              f"  ({json_bytes / wire:.1f}x lebih kecil, decode {json_cost / cost:.1f}x)")
+
+
+def main():
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_devices = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    payloads = make_payloads(n_messages, n_devices)
+
+    # Pastikan kedua jalur menghasilkan line protocol yang identik
+    for raw in payloads[:1000]:
+        assert legacy_path(raw) == fast_path(raw), (legacy_path(raw), fast_path(raw))
+
+    legacy = run("legacy", legacy_path, payloads)
+    fast = run("payload_codec", fast_path, payloads)
+    print(f"Speedup: {fast / legacy:.1f}x")
+
+    compare_formats(min(n_messages, 60_000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench_report.py
+"""
+Benchmark laporan prediksi rentang panjang: plot lama (semua titik 5 menit dengan
+marker '.', satu per satu lewat pyplot) dibandingkan report.py (decimation LTTB/minmax,
+galat harian tervektorisasi, render paralel per alat di process pool).
+
+Data sintetis: `--devices` alat x `--days` hari bucket 5 menit, prediksi = aktual + derau.
+Prediksi model tidak ikut diukur (sama untuk kedua jalur).
+
+Contoh:
+    python bench_report.py --devices 8 --days 365 --workers 4
+"""
+import matplotlib
+matplotlib.use("Agg")
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import report
+
+
+def make_series(days, seed):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=days * 288, freq="5min", tz="UTC", name="_time")
+    t = np.arange(len(index))
+    actual = (300 + 150 * np.sin(t / 288 * 2 * np.pi) + 80 * np.sin(t / 2016 * 2 * np.pi)
+              + rng.normal(0, 20, len(t))).astype(np.float32)
+    predicted = (actual + rng.normal(0, 15, len(t))).astype(np.float32)
+    return index, actual, predicted
+
+
+def legacy_plot(timestamps, actual, predicted, path):
+    """Salinan plot predict_and_plot sebelum report.py (tanpa plt.show)."""
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    fig, ax = plt.subplots(figsize=(15, 7))
+    ax.plot(timestamps, actual, label='Data Aktual (PPM)', color='darkorange', marker='.', linestyle='-')
+    ax.plot(timestamps, predicted, label='Prediksi Model (PPM)', color='dodgerblue', linestyle='--')
+    ax.set_title('Perbandingan Data Gas PPM Aktual vs Prediksi Model', fontsize=16)
+    ax.legend(fontsize=10)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d %b %H:%M'))
+    fig.autofmt_xdate()
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close(fig)
+
+
+def legacy_daily(timestamps, actual, predicted):
+    """Galat harian dengan groupby pandas per hari (acuan)."""
+    df = pd.DataFrame({"error": predicted.astype(np.float64) - actual}, index=timestamps.tz_convert("Asia/Jakarta"))
+    grouped = df["error"].groupby(df.index.date)
+    return grouped.apply(lambda e: e.abs().mean()), grouped.apply(lambda e: np.sqrt((e * e).mean()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--devices", type=int, default=4, help="jumlah alat")
+    ap.add_argument("--days", type=int, default=365, help="panjang rentang (hari)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="proses render paralel")
+    ap.add_argument("--max-points", type=int, default=3000, help="titik maksimum per deret")
+    ap.add_argument("--method", choices=("lttb", "minmax"), default="lttb")
+    ap.add_argument("--skip-legacy", action="store_true", help="lewati jalur lama (lambat untuk rentang panjang)")
+    args = ap.parse_args()
+
+    series = [make_series(args.days, seed) for seed in range(args.devices)]
+    out_dir = tempfile.mkdtemp(prefix="bench_report_")
+    print(f"{args.devices} alat x {args.days} hari ({len(series[0][1]):,} titik per alat), output di {out_dir}")
+
+    # Galat harian: groupby pandas vs reduceat
+    index, actual, predicted = series[0]
+    start = time.perf_counter()
+    old_mae, old_rmse = legacy_daily(index, actual, predicted)
+    old_daily = time.perf_counter() - start
+    start = time.perf_counter()
+    _, mae, rmse, _ = report.daily_errors(index.as_unit("ns").asi8, actual, predicted, 7)
+    new_daily = time.perf_counter() - start
+    assert np.allclose(old_mae.to_numpy(), mae) and np.allclose(old_rmse.to_numpy(), rmse), "galat harian berbeda"
+    print(f"Galat harian per alat : groupby {old_daily * 1000:.1f} ms, reduceat {new_daily * 1000:.2f} ms "
+          f"({old_daily / new_daily:.0f}x)")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        for i, (index, actual, predicted) in enumerate(series):
+            legacy_plot(index, actual, predicted, os.path.join(out_dir, f"lama_{i}.png"))
+        old_s = time.perf_counter() - start
+        print(f"Plot lama             : {old_s:.2f} s ({old_s / args.devices:.2f} s per alat, berurutan)")
+
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    with pool:
+        futures = []
+        for i, (index, actual, predicted) in enumerate(series):
+            times_ns = index.as_unit("ns").asi8
+            daily = report.daily_errors(times_ns, actual, predicted)
+            futures.append(pool.submit(report.render_device, f"alat{i:02d}", times_ns, actual, predicted, daily,
+                                       os.path.join(out_dir, f"alat{i:02d}.png"), args.max_points, args.method))
+        render = [f.result()[2] for f in futures]
+    new_s = time.perf_counter() - start
+    print(f"report.py             : {new_s:.2f} s total dengan {args.workers} worker "
+          f"(render {np.mean(render):.2f} s per alat, termasuk start proses)")
+    if not args.skip_legacy:
+        print(f"Percepatan            : {old_s / new_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# bulk_import.py
+"""
+Impor massal pembacaan historis (data yang ditahan alat saat offline, atau ekspor
+dari bucket lain) langsung ke InfluxDB tanpa lewat MQTT.
+
+- File CSV (baris header, kolom `timestamp` atau `_time`) dan JSONL (satu object JSON
+  per baris, format sama seperti payload ESP32) dibaca secara streaming; file `.gz`
+  didekompresi on-the-fly. Baris diubah ke line protocol dengan pemetaan field yang
+  sama seperti InfluxDBHandler.write_data (payload_codec.encode_line).
+- Baris dikumpulkan per batch besar (--batch-size) lalu ditulis oleh beberapa thread
+  penulis sekaligus (--writers) dengan body HTTP terkompresi gzip. Antrean batch
+  berukuran terbatas, jadi pembacaan file ikut melambat jika server lambat.
+- Posisi file yang semua batch sebelumnya sudah tertulis disimpan di file checkpoint
+  (ditulis atomik). Jika impor terputus, jalankan ulang perintah yang sama dan impor
+  dilanjutkan dari posisi tersebut. Batch yang sempat tertulis dua kali tidak menjadi
+  duplikat karena InfluxDB menimpa titik dengan seri dan timestamp yang sama.
+
+Timestamp berupa ISO-8601 atau epoch detik. Timestamp tanpa zona waktu dianggap
+waktu lokal mesin, sama seperti jalur MQTT.
+
+Rollup 5 menit tidak dibuat oleh impor ini; setelah selesai jalankan
+`python rollup.py --backfill <rentang>` agar training dan prediksi ikut melihat data baru.
+
+Contoh:
+    python bulk_import.py alat01_offline.jsonl ekspor_2024.csv.gz --writers 4 --batch-size 5000
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import payload_codec
+from spool import is_retryable_error
+
+# Nama kolom alternatif -> nama field payload ESP32 (ekspor CSV dari InfluxDB memakai `_time`)
+COLUMN_ALIASES = {"_time": "timestamp"}
+DEFAULT_CHECKPOINT = "bulk_import.checkpoint.json"
+
+
+def open_binary(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def _normalize_timestamp(value):
+    # Epoch detik dari CSV masih berupa string; ISO-8601 diteruskan apa adanya
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+class RowReader:
+    """
+    Membaca satu file baris per baris dari posisi byte tertentu.
+    `lines` menghasilkan (posisi_setelah_baris, baris mentah); `parse` mengubahnya menjadi dict.
+    """
+
+    def __init__(self, path, fmt, default_id_alat=None):
+        self.path = path
+        self.fmt = fmt
+        self.default_id_alat = default_id_alat
+        self.header = None
+
+    def lines(self, offset=0):
+        with open_binary(self.path) as f:
+            if self.fmt == "csv":
+                line = f.readline()
+                self.header = [COLUMN_ALIASES.get(name, name) for name in self._split(line)]
+                offset = max(offset, f.tell())
+            # GzipFile.seek maju dengan mendekompresi; file biasa langsung lompat
+            f.seek(offset)
+            pos = offset
+            for line in f:
+                pos += len(line)
+                if not line.strip() or line.startswith(b"#"):
+                    continue
+                yield pos, line
+
+    @staticmethod
+    def _split(line):
+        text = line.decode("utf-8").rstrip("\r\n")
+        # Jalur cepat untuk baris tanpa tanda kutip (log sensor pada umumnya)
+        return text.split(",") if '"' not in text else next(csv.reader(io.StringIO(text)))
+
+    def parse(self, line):
+        if self.fmt == "jsonl":
+            data = payload_codec.decode_payload(line)
+        else:
+            data = {name: value for name, value in zip(self.header, self._split(line)) if value != ""}
+        if "timestamp" in data:
+            data["timestamp"] = _normalize_timestamp(data["timestamp"])
+        if self.default_id_alat and "id_alat" not in data:
+            data["id_alat"] = self.default_id_alat
+        return data
+
+
+class Checkpoint:
+    """
+    Posisi impor per file. Batch bisa selesai tidak berurutan (beberapa penulis), jadi
+    posisi hanya dimajukan sampai batch terakhir yang semua batch sebelumnya sudah tertulis.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self._pending = {}   # seq -> (file, posisi, baris, akhir_file)
+        self._next_seq = 0   # batch berikutnya yang ditunggu untuk memajukan posisi
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f).get("files", {})
+
+    def state(self, path):
+        return self.files.get(os.path.abspath(path), {"offset": 0, "rows": 0, "done": False})
+
+    def completed(self, seq, path, offset, rows, last):
+        with self._lock:
+            self._pending[seq] = (os.path.abspath(path), offset, rows, last)
+            while self._next_seq in self._pending:
+                key, offset, rows, last = self._pending.pop(self._next_seq)
+                state = self.files.setdefault(key, {"offset": 0, "rows": 0, "done": False})
+                state["offset"] = offset
+                state["rows"] += rows
+                state["done"] = last
+                self._next_seq += 1
+            if time.monotonic() - self._saved_at >= 1.0:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+
+class BulkWriter:
+    """Thread penulis paralel: setiap batch ditulis dalam satu request HTTP (gzip), dicoba ulang dengan backoff."""
+
+    _STOP = object()
+
+    def __init__(self, write_api, bucket, org, checkpoint, writers=4, retries=5):
+        self.write_api = write_api
+        self.bucket = bucket
+        self.org = org
+        self.checkpoint = checkpoint
+        self.retries = retries
+        self.rows_written = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=writers * 2)
+        self._threads = [threading.Thread(target=self._run, name=f"bulk-writer-{i}", daemon=True) for i in range(writers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, seq, path, offset, lines, last):
+        """Mengantrekan satu batch; menunggu jika semua penulis sibuk. False jika impor harus berhenti."""
+        while self.error is None:
+            try:
+                self._queue.put((seq, path, offset, lines, last), timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            if self.error is not None:
+                continue  # Impor dihentikan; sisa antrean tidak ditulis agar checkpoint tetap benar
+            seq, path, offset, lines, last = item
+            try:
+                self._write(lines)
+            except Exception as e:
+                self.error = e
+                logging.error(f"❌ Gagal menulis batch {len(lines)} baris dari '{path}'. Detail: {e}")
+                continue
+            with self._lock:
+                self.rows_written += len(lines)
+            self.checkpoint.completed(seq, path, offset, len(lines), last)
+
+    def _write(self, lines):
+        if self.write_api is None or not lines:
+            return  # --dry-run, atau batch penanda akhir file
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            try:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=b"\n".join(lines))
+                return
+            except Exception as e:
+                if attempt == self.retries or not is_retryable_error(e):
+                    raise
+                logging.warning(f"⚠️ Tulis batch gagal ({e}), mencoba lagi dalam {delay:.0f} detik...")
+                time.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, 60.0)
+
+
+class Progress:
+    def __init__(self, writer, interval=5.0):
+        self.writer = writer
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def maybe_report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self.start
+        rows = self.writer.rows_written
+        logging.info(f"📈 {rows:,} baris tertulis dalam {elapsed:.1f} detik ({rows / elapsed if elapsed else 0:,.0f} baris/detik).")
+
+
+def import_files(paths, writer, checkpoint, fmt="auto", batch_size=5000, default_id_alat=None):
+    """Membaca semua file dan mengirim batch ke `writer`. Mengembalikan (baris dibaca, baris tidak valid)."""
+    progress = Progress(writer)
+    seq = 0
+    rows_read = invalid = 0
+    for path in paths:
+        state = checkpoint.state(path)
+        if state["done"]:
+            logging.info(f"⏭️ '{path}' sudah diimpor sebelumnya ({state['rows']:,} baris), dilewati.")
+            continue
+        if state["offset"]:
+            logging.info(f"⏩ Melanjutkan '{path}' dari byte {state['offset']:,} ({state['rows']:,} baris sudah tertulis).")
+        reader = RowReader(path, detect_format(path) if fmt == "auto" else fmt, default_id_alat)
+        batch = []
+        pos = state["offset"]
+        for pos, line in reader.lines(state["offset"]):
+            rows_read += 1
+            try:
+                batch.append(payload_codec.encode_line(reader.parse(line)))
+            except (KeyError, TypeError, ValueError, UnicodeDecodeError) as e:
+                invalid += 1
+                log = logging.warning if invalid <= 10 else logging.debug
+                log(f"⚠️ Baris tidak valid di '{path}' (byte {pos:,}) dilewati: {e}")
+                continue
+            if len(batch) >= batch_size:
+                if not writer.submit(seq, path, pos, batch, False):
+                    return rows_read, invalid
+                seq += 1
+                batch = []
+                progress.maybe_report()
+        # Batch terakhir (boleh kosong) menandai file selesai di checkpoint
+        if not writer.submit(seq, path, pos, batch, True):
+            return rows_read, invalid
+        seq += 1
+    return rows_read, invalid
+
+
+def main():
+    from dotenv import load_dotenv
+    from influxdb_client import InfluxDBClient
+    from influxdb_client.client.write_api import SYNCHRONOUS
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Impor massal file CSV/JSONL pembacaan sensor ke InfluxDB.")
+    parser.add_argument("files", nargs="+", help="File .csv / .jsonl (boleh .gz)")
+    parser.add_argument("--format", choices=("auto", "csv", "jsonl"), default="auto", help="Format file (default: dari ekstensi)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Jumlah baris per request tulis")
+    parser.add_argument("--writers", type=int, default=4, help="Jumlah request tulis paralel")
+    parser.add_argument("--retries", type=int, default=5, help="Percobaan ulang per batch untuk error sementara")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="File checkpoint untuk melanjutkan impor")
+    parser.add_argument("--id-alat", help="id_alat untuk baris yang tidak memiliki kolom id_alat")
+    parser.add_argument("--bucket", default=os.getenv("INFLUX_BUCKET"), help="Bucket tujuan (default: INFLUX_BUCKET)")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya baca dan encode, tanpa menulis ke InfluxDB")
+    args = parser.parse_args()
+
+    for path in args.files:
+        if not os.path.isfile(path):
+            parser.error(f"file tidak ditemukan: {path}")
+
+    org = os.getenv("INFLUX_ORG")
+    checkpoint = Checkpoint(None if args.dry_run else args.checkpoint)
+    client = None
+    write_api = None
+    if not args.dry_run:
+        client = InfluxDBClient(url=os.getenv("INFLUX_URL"), token=os.getenv("INFLUX_TOKEN"), org=org,
+                                timeout=120_000, enable_gzip=True,
+                                connection_pool_maxsize=max(args.writers, 1))
+        write_api = client.write_api(write_options=SYNCHRONOUS)
+
+    writer = BulkWriter(write_api, args.bucket, org, checkpoint, writers=max(args.writers, 1), retries=args.retries)
+    start = time.perf_counter()
+    try:
+        rows_read, invalid = import_files(args.files, writer, checkpoint, args.format,
+                                          max(args.batch_size, 1), args.id_alat)
+    except KeyboardInterrupt:
+        logging.warning("⏹️ Impor dihentikan; batch yang sudah dikirim diselesaikan lebih dulu.")
+        rows_read = invalid = None
+    finally:
+        writer.close()
+        checkpoint.save()
+        if client is not None:
+            client.close()
+    elapsed = time.perf_counter() - start
+
+    rows = writer.rows_written
+    logging.info(f"📊 {rows:,} baris tertulis dalam {elapsed:.1f} detik ({rows / elapsed if elapsed else 0:,.0f} baris/detik).")
+    if invalid:
+        logging.warning(f"⚠️ {invalid:,} dari {rows_read:,} baris tidak valid dan dilewati.")
+    if writer.error is not None or rows_read is None:
+        logging.error(f"❌ Impor belum selesai. Jalankan ulang perintah yang sama untuk melanjutkan dari '{args.checkpoint}'.")
+        return 1
+    if not args.dry_run:
+        logging.info("✅ Impor selesai. Perbarui rollup 5 menit dengan: python rollup.py --backfill <rentang>")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,6 +2,7 @@
 
 import os
 import logging
+import socket
 from dotenv import load_dotenv
 
 # Muat variabel dari file .env di direktori yang sama
@@ -9,9 +10,11 @@ load_dotenv()
 
 # --- Konfigurasi Logging ---
 # Konfigurasi ini akan diaplikasikan saat modul ini diimpor pertama kali.
+# Nomor worker diisi oleh ingest_launcher.py; kosong jika logger dijalankan sebagai satu proses.
+INGEST_WORKER_ID = os.getenv("INGEST_WORKER_ID", "")
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(levelname)s - ' + (f'[w{INGEST_WORKER_ID}] ' if INGEST_WORKER_ID else '') + '%(message)s'
 )
 
 # --- Konfigurasi InfluxDB ---
@@ -32,7 +35,131 @@ MQTT_PORT = int(os.getenv("MQTT_PORT", 443))
 MQTT_WS_PATH = os.getenv("MQTT_WS_PATH", "/mqtt") 
 
 MQTT_TOPIC_DATA = os.getenv("MQTT_TOPIC_DATA")
-MQTT_CLIENT_ID_LOGGER = "python-logger-kualitas-udara-final"
+# Client ID harus unik per koneksi; broker memutus client lama jika ID yang sama tersambung lagi.
+# Worker launcher memakai nomor worker (stabil saat restart), proses tunggal memakai PID.
+MQTT_CLIENT_ID_PREFIX = os.getenv("MQTT_CLIENT_ID_PREFIX", "python-logger-kualitas-udara")
+MQTT_CLIENT_ID_LOGGER = f"{MQTT_CLIENT_ID_PREFIX}-{socket.gethostname()}-" + (
+    f"w{INGEST_WORKER_ID}" if INGEST_WORKER_ID else str(os.getpid()))
+# Shared subscription: semua instance dengan grup yang sama berbagi pesan dari MQTT_TOPIC_DATA
+# (setiap pesan dikirim ke satu instance saja), sehingga ingest bisa diskalakan ke banyak proses/mesin.
+MQTT_SHARE_GROUP = os.getenv("MQTT_SHARE_GROUP", "")
+MQTT_SUBSCRIBE_TOPIC = f"$share/{MQTT_SHARE_GROUP}/{MQTT_TOPIC_DATA}" if MQTT_SHARE_GROUP else MQTT_TOPIC_DATA
+# Versi protokol MQTT: "5" atau "3.1.1". Default MQTTv5 jika shared subscription dipakai.
+MQTT_PROTOCOL = os.getenv("MQTT_PROTOCOL", "5" if MQTT_SHARE_GROUP else "3.1.1")
+
+# --- Konfigurasi Penulisan InfluxDB ---
+# "sync"  : setiap pesan langsung ditulis (satu HTTP request per data point).
+# "batch" : data point dikumpulkan di antrean dan ditulis per batch oleh thread terpisah.
+INFLUX_WRITE_MODE = os.getenv("INFLUX_WRITE_MODE", "sync").lower()
+INFLUX_BATCH_SIZE = int(os.getenv("INFLUX_BATCH_SIZE", 500))
+INFLUX_FLUSH_INTERVAL_MS = int(os.getenv("INFLUX_FLUSH_INTERVAL_MS", 1000))
+# Jitter acak (0..N ms) ditambahkan ke interval flush agar banyak instance tidak menulis bersamaan.
+INFLUX_JITTER_MS = int(os.getenv("INFLUX_JITTER_MS", 0))
+# Batas antrean di memori. Jika penuh, pemanggil menunggu maksimal INFLUX_QUEUE_PUT_TIMEOUT detik (backpressure).
+INFLUX_QUEUE_MAXSIZE = int(os.getenv("INFLUX_QUEUE_MAXSIZE", 10000))
+INFLUX_QUEUE_PUT_TIMEOUT = float(os.getenv("INFLUX_QUEUE_PUT_TIMEOUT", 5.0))
+
+# --- Konfigurasi Spool Disk ---
+# Data yang gagal ditulis (InfluxDB tidak bisa dihubungi) atau tidak muat di antrean batch
+# disimpan di direktori ini dan dikirim ulang otomatis. Kosongkan untuk menonaktifkan.
+INFLUX_SPOOL_DIR = os.getenv("INFLUX_SPOOL_DIR", "spool")
+INFLUX_SPOOL_SEGMENT_MB = int(os.getenv("INFLUX_SPOOL_SEGMENT_MB", 16))
+INFLUX_SPOOL_MAX_MB = int(os.getenv("INFLUX_SPOOL_MAX_MB", 1024))
+INFLUX_SPOOL_REPLAY_BATCH = int(os.getenv("INFLUX_SPOOL_REPLAY_BATCH", 5000))
+INFLUX_SPOOL_REPLAY_INTERVAL = float(os.getenv("INFLUX_SPOOL_REPLAY_INTERVAL", 5.0))
+
+# --- Konfigurasi Metrik ---
+# Endpoint Prometheus di http://METRICS_ADDR:METRICS_PORT/metrics. Set port ke 0 untuk menonaktifkan.
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+# Jumlah maksimum id_alat berbeda di metrik nultra_device_last_seen_timestamp_seconds; alat setelahnya
+# digabung ke label id_alat="other" agar publisher yang salah/berbahaya tidak membuat seri tanpa batas.
+METRICS_MAX_DEVICES = int(os.getenv("METRICS_MAX_DEVICES", 1000))
+
+# --- Konfigurasi Prediksi Online ---
+# Jika aktif, logger menjalankan model per alat setiap bucket 5 menit baru dan menulis
+# hasilnya ke measurement PREDICTION_MEASUREMENT.
+ONLINE_PREDICTION = os.getenv("ONLINE_PREDICTION", "0").lower() in ("1", "true", "yes")
+# Backend inferensi: "keras", "tflite", atau "numpy" (tanpa TensorFlow).
+PREDICT_BACKEND = os.getenv("PREDICT_BACKEND", "keras").lower()
+# Direktori kerja train_model.py (berisi models/_global/LATEST dan models/<id_alat>/LATEST, lihat model_registry.py)
+PREDICT_MODEL_DIR = os.getenv("PREDICT_MODEL_DIR", ".")
+# Interval (detik) pengecekan versi model baru untuk hot reload
+PREDICT_RELOAD_INTERVAL = float(os.getenv("PREDICT_RELOAD_INTERVAL", 60))
+# Interval (detik) pengumpulan window dari semua alat sebelum diprediksi dalam satu batch
+PREDICT_BATCH_INTERVAL = float(os.getenv("PREDICT_BATCH_INTERVAL", 1.0))
+PREDICTION_MEASUREMENT = os.getenv("PREDICTION_MEASUREMENT", "prediksi_gas")
+
+# --- Konfigurasi Ingest Pipeline ---
+# Jumlah worker yang mem-parse, memvalidasi, dan menulis pesan MQTT. Pesan dibagi per id_alat,
+# jadi pembacaan satu alat selalu diproses satu worker secara berurutan.
+# Set ke 0 untuk memproses pesan langsung di thread callback paho (perilaku lama).
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+INGEST_QUEUE_MAXSIZE = int(os.getenv("INGEST_QUEUE_MAXSIZE", 10000))
+# Kebijakan saat antrean penuh: "block", "drop_oldest", atau "spill". "block" menahan thread
+# jaringan paho hingga INGEST_PUT_TIMEOUT detik (tidak ada pesan dibaca, keepalive tertunda);
+# pakai "spill" atau "drop_oldest" jika broker memutus koneksi saat beban puncak.
+INGEST_OVERFLOW_POLICY = os.getenv("INGEST_OVERFLOW_POLICY", "block").lower()
+INGEST_PUT_TIMEOUT = float(os.getenv("INGEST_PUT_TIMEOUT", 5.0))
+INGEST_SPILL_PATH = os.getenv("INGEST_SPILL_PATH", "ingest_spill.bin")
+
+# --- Konfigurasi Mode Ingest ---
+# "thread" : paho loop_forever + worker pool + InfluxDBHandler (default).
+# "asyncio": satu event loop (aiomqtt + InfluxDBClientAsync) untuk ribuan alat tanpa
+#            perebutan thread. Butuh: pip install "aiomqtt>=2" "influxdb-client[async]".
+#            aiomqtt 2.x memerlukan paho-mqtt>=2, mode thread memerlukan paho-mqtt 1.x, jadi
+#            mode asyncio dijalankan dari virtualenv tersendiri (lihat async_ingest.py).
+INGEST_MODE = os.getenv("INGEST_MODE", "thread").lower()
+# Jumlah batch yang boleh sedang dikirim ke InfluxDB bersamaan (juga ukuran pool koneksi HTTP)
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", 4))
+# Percobaan ulang per batch (backoff eksponensial) sebelum batch dipindah ke spool
+ASYNC_WRITE_RETRIES = int(os.getenv("ASYNC_WRITE_RETRIES", 3))
+# Backoff reconnect MQTT (detik), berlipat dua setiap gagal hingga batas maksimum
+MQTT_RECONNECT_MIN = float(os.getenv("MQTT_RECONNECT_MIN", 1.0))
+MQTT_RECONNECT_MAX = float(os.getenv("MQTT_RECONNECT_MAX", 60.0))
+
+# --- Konfigurasi Dedup & Reorder ---
+# Pembacaan dengan id_alat + timestamp yang sama dalam DEDUP_WINDOW detik terakhir dibuang
+# (kirim ulang QoS/reconnect ESP32). Cache dibatasi DEDUP_MAX_PER_DEVICE entri per alat; 0 = nonaktif.
+DEDUP_WINDOW = float(os.getenv("DEDUP_WINDOW", 600))
+DEDUP_MAX_PER_DEVICE = int(os.getenv("DEDUP_MAX_PER_DEVICE", 1024))
+# Pembacaan ditahan hingga REORDER_TOLERANCE detik agar diteruskan berurutan waktu; 0 = nonaktif.
+REORDER_TOLERANCE = float(os.getenv("REORDER_TOLERANCE", 2.0))
+
+# --- Konfigurasi Rollup 5 Menit ---
+# Siapa yang menulis rata-rata 5 menit per alat ke measurement pengukuran_udara_5m (lihat rollup.py).
+# Hanya boleh satu penulis agar bucket tidak terhitung dua kali:
+#   "ingest" : logger menulis rollup di jalur ingest (ditolak saat startup jika task Flux aktif)
+#   "task"   : task Flux di server (python rollup.py --apply-task, hanya bisa dengan ROLLUP_MODE=task)
+#   "off"    : tidak ada rollup (default; aktifkan secara eksplisit)
+# ROLLUP_INGEST=1 (pengaturan lama) sama dengan ROLLUP_MODE=ingest.
+ROLLUP_MODE = os.getenv("ROLLUP_MODE", "ingest" if os.getenv("ROLLUP_INGEST", "0").lower() in ("1", "true", "yes") else "off").lower()
+ROLLUP_INGEST = ROLLUP_MODE == "ingest"
+# Bucket ditulis setelah berakhir + ROLLUP_GRACE detik; pembacaan terlambat hingga
+# ROLLUP_LATENESS detik menulis ulang bucket dengan total terbaru.
+ROLLUP_GRACE = float(os.getenv("ROLLUP_GRACE", 60))
+ROLLUP_LATENESS = float(os.getenv("ROLLUP_LATENESS", 3600))
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", 10))
+
+# --- Konfigurasi Deteksi Anomali ---
+# Detektor streaming per alat di jalur ingest (opsional, lihat anomaly_detector.py). Kejadian ditulis ke
+# ANOMALY_MEASUREMENT dan dipublikasikan ke MQTT_TOPIC_ALERT ({id_alat} diganti id alat).
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "0").lower() in ("1", "true", "yes")
+ANOMALY_MEASUREMENT = os.getenv("ANOMALY_MEASUREMENT", "anomali_gas")
+MQTT_TOPIC_ALERT = os.getenv("MQTT_TOPIC_ALERT", "iot/kualitas_udara/{id_alat}/alert")
+MQTT_ALERT_QOS = int(os.getenv("MQTT_ALERT_QOS", 1))
+# Ambang absolut gas_ppm (sama dengan THRESHOLD_BURUK di Nultra_esp32.ino); 0 = nonaktif
+ANOMALY_THRESHOLD_PPM = float(os.getenv("ANOMALY_THRESHOLD_PPM", 700))
+# z-score terhadap rata-rata/varians EWMA (bobot ANOMALY_EWMA_ALPHA), aktif setelah ANOMALY_WARMUP pembacaan
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", 4.0))
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", 0.05))
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", 30))
+# Laju perubahan maksimum (ppm per menit) antara dua pembacaan berurutan; 0 = nonaktif
+ANOMALY_ROC_PPM_PER_MIN = float(os.getenv("ANOMALY_ROC_PPM_PER_MIN", 200))
+# Selisih maksimum terhadap prediksi online untuk bucket yang sama (butuh ONLINE_PREDICTION); 0 = nonaktif
+ANOMALY_RESIDUAL_PPM = float(os.getenv("ANOMALY_RESIDUAL_PPM", 150))
+# Kejadian jenis yang sama untuk alat yang sama tidak diulang dalam ANOMALY_COOLDOWN detik
+ANOMALY_COOLDOWN = float(os.getenv("ANOMALY_COOLDOWN", 300))
 
 
 def validate_configs():
@@ -0,0 +1,72 @@
+# decimate.py
+"""
+Decimation deret waktu sebelum digambar, agar plot rentang panjang (berbulan-bulan
+data 5 menit) tetap cepat tanpa kehilangan bentuk kurva.
+
+- `lttb`  : Largest-Triangle-Three-Buckets; memilih satu titik per bucket yang paling
+            menjaga bentuk visual (puncak dan lembah tetap terlihat).
+- `minmax`: titik minimum dan maksimum per bucket (per piksel), sepenuhnya tervektorisasi;
+            cocok untuk deret yang sangat berisik.
+
+Keduanya mengembalikan indeks titik terpilih (terurut), jadi sumbu x apa pun
+(datetime64, epoch ns, posisi) bisa diambil dengan indeks yang sama.
+"""
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Indeks `n_out` titik hasil LTTB dari deret (x, y). Titik pertama dan terakhir selalu dipertahankan."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 bucket di antara titik pertama dan terakhir
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Rata-rata setiap bucket dihitung sekaligus lewat cumsum; bucket terakhir diikuti titik akhir
+    csx = np.concatenate(([0.0], np.cumsum(x)))
+    csy = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    avg_x = np.append((csx[edges[1:]] - csx[edges[:-1]]) / sizes, x[-1])
+    avg_y = np.append((csy[edges[1:]] - csy[edges[:-1]]) / sizes, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Luas segitiga (a, kandidat, rata-rata bucket berikutnya), tanpa faktor 1/2
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y, n_buckets):
+    """Indeks titik minimum dan maksimum di setiap bucket, plus titik pertama dan terakhir (terurut)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(size * n_buckets, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_buckets, size)
+    valid = ~np.isnan(blocks).all(axis=1)
+    offsets = np.arange(n_buckets)[valid] * size
+    lo = offsets + np.nanargmin(blocks[valid], axis=1)
+    hi = offsets + np.nanargmax(blocks[valid], axis=1)
+    return np.unique(np.concatenate(([0], lo, hi, [n - 1])))
+
+
+METHODS = ("lttb", "minmax")
+
+
+def decimate(x, y, max_points, method="lttb"):
+    """Indeks hingga `max_points` titik dari deret (x, y) dengan metode `method` ('lttb' atau 'minmax')."""
+    if method == "lttb":
+        return lttb(x, y, max_points)
+    if method == "minmax":
+        return minmax(y, max(1, max_points // 2))
+    raise ValueError(f"Metode decimation tidak dikenal: '{method}' (pilihan: lttb, minmax).")
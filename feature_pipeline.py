@@ -0,0 +1,146 @@
+# feature_pipeline.py
+"""
+Pipeline fitur bersama untuk training, prediksi batch, dan prediksi online.
+
+Input berupa bucket 5 menit yang berisi data (times int64 epoch ns UTC, values
+n x 4 dengan NaN untuk nilai kosong), seperti hasil influx_stream.py dan
+feature_store.py. Output berupa matriks rapat 5 menit float32 dengan kolom FEATURES:
+
+- Nilai mentah dicast ke float32 sekali saat disalin ke array output; bucket kosong
+  diisi interpolasi linear terhadap waktu langsung di array tersebut (setara
+  asfreq('5min') + interpolate(method='time') + dropna).
+- Fitur waktu siklikal diambil dari tabel lookup yang dihitung sekali saat import:
+  per jam dalam seminggu (168 baris) untuk timestamp sembarang, dan per bucket 5 menit
+  dalam seminggu (2016 baris) untuk grid rapat, sehingga satu baris cukup dengan satu
+  operasi modulo dan satu indeks tabel, tanpa np.sin/np.cos per baris.
+"""
+import numpy as np
+import pandas as pd
+
+RAW_FEATURES = ('suhu', 'kelembaban', 'tekanan', 'gas_ppm')
+TIME_FEATURES = ('jam_sin', 'jam_cos', 'hari_minggu_sin', 'hari_minggu_cos')
+FEATURES = RAW_FEATURES + TIME_FEATURES
+
+BUCKET_NS = 5 * 60 * 1_000_000_000
+_HOUR_NS = 3600 * 1_000_000_000
+_BUCKETS_PER_HOUR = _HOUR_NS // BUCKET_NS
+# 1970-01-01 adalah hari Kamis (dayofweek=3): geser agar indeks 0 jatuh pada Senin 00:00
+_EPOCH_HOUR_OF_WEEK = 3 * 24
+
+
+def _cyclic_table(period):
+    angle = 2 * np.pi * np.arange(period) / period
+    return np.stack([np.sin(angle), np.cos(angle)], axis=1)
+
+
+# Baris ke-i berisi (sin, cos) untuk jam ke-i / hari ke-i (Senin = 0, sama seperti dayofweek pandas)
+HOUR_TABLE = _cyclic_table(24)
+DOW_TABLE = _cyclic_table(7)
+# Baris ke-h berisi fitur TIME_FEATURES untuk jam ke-h dalam seminggu (Senin 00:00 = 0)
+_hours = np.arange(7 * 24)
+HOUR_OF_WEEK_TABLE = np.hstack([HOUR_TABLE[_hours % 24], DOW_TABLE[_hours // 24]])
+# Sama, per bucket 5 menit dalam seminggu (float32, langsung disalin ke matriks fitur)
+BUCKET_OF_WEEK_TABLE = np.repeat(HOUR_OF_WEEK_TABLE, _BUCKETS_PER_HOUR, axis=0).astype(np.float32)
+
+
+def index_ns(index):
+    """Epoch ns (UTC untuk index ber-zona waktu) dari DatetimeIndex, apa pun resolusinya (ns/us/s)."""
+    return index.as_unit('ns').asi8
+
+
+def calendar_features(times_ns, out=None, dtype=np.float32):
+    """Fitur waktu siklikal (n x 4, urutan TIME_FEATURES) untuk epoch ns UTC, diisi ke `out` jika diberikan."""
+    hour_of_week = (np.asarray(times_ns, dtype=np.int64) // _HOUR_NS + _EPOCH_HOUR_OF_WEEK) % len(HOUR_OF_WEEK_TABLE)
+    if out is None:
+        return HOUR_OF_WEEK_TABLE[hour_of_week].astype(dtype)
+    out[:] = HOUR_OF_WEEK_TABLE[hour_of_week]
+    return out
+
+
+def calendar_grid(start_ns, n, out=None, dtype=np.float32):
+    """
+    Fitur waktu siklikal untuk `n` bucket berurutan mulai `start_ns`. Grid seragam
+    berulang setiap minggu, jadi tabel per bucket disalin per blok tanpa indeks per baris.
+    """
+    if out is None:
+        out = np.empty((n, len(TIME_FEATURES)), dtype=dtype)
+    period = len(BUCKET_OF_WEEK_TABLE)
+    offset = (start_ns // BUCKET_NS + _EPOCH_HOUR_OF_WEEK * _BUCKETS_PER_HOUR) % period
+    pos = 0
+    while pos < n:
+        take = min(n - pos, period - offset)
+        out[pos:pos + take] = BUCKET_OF_WEEK_TABLE[offset:offset + take]
+        pos += take
+        offset = 0
+    return out
+
+
+def calendar_row(bucket_ns):
+    """Fitur waktu siklikal untuk satu bucket (dipakai prediksi online per bucket)."""
+    return HOUR_OF_WEEK_TABLE[(bucket_ns // _HOUR_NS + _EPOCH_HOUR_OF_WEEK) % len(HOUR_OF_WEEK_TABLE)]
+
+
+def dense_features(times, values, dtype=np.float32):
+    """
+    Dari bucket berisi data (terurut, unik) ke matriks rapat 5 menit.
+    Mengembalikan (awal_grid ns, matriks len(FEATURES) kolom). Setelah interpolasi
+    hanya baris di awal rentang yang bisa masih kosong; baris tersebut dilewati
+    (matriks hasil adalah view, tanpa salinan).
+    """
+    n_raw = len(RAW_FEATURES)
+    times = np.asarray(times, dtype=np.int64)
+    if len(times) == 0:
+        return 0, np.empty((0, len(FEATURES)), dtype=dtype)
+    start = int(times[0])
+    n = int((times[-1] - start) // BUCKET_NS) + 1
+    out = np.empty((n, len(FEATURES)), dtype=dtype)
+    if len(times) == n:
+        out[:, :n_raw] = values  # Tidak ada bucket kosong
+    else:
+        out[:, :n_raw] = np.nan
+        out[(times - start) // BUCKET_NS, :n_raw] = values
+
+    # Interpolasi per kolom di tempat; grid seragam sehingga posisi bucket sebanding dengan waktu
+    first_row = 0
+    for c in range(n_raw):
+        col = out[:, c]
+        missing = np.isnan(col)
+        if not missing.any():
+            continue
+        known = np.flatnonzero(~missing)
+        if len(known) == 0:
+            return start, out[:0]
+        # NaN sebelum nilai pertama tetap kosong (seperti interpolate pandas), lalu dilewati
+        gaps = np.flatnonzero(missing)
+        gaps = gaps[gaps > known[0]]
+        col[gaps] = np.interp(gaps, known, col[known])
+        first_row = max(first_row, int(known[0]))
+
+    calendar_grid(start, n, out=out[:, n_raw:])
+    return start + first_row * BUCKET_NS, out[first_row:]
+
+
+def build_frame(times, values, dtype=np.float32):
+    """DataFrame fitur siap pakai model (index `_time` UTC), atau None jika tidak ada baris."""
+    start, matrix = dense_features(times, values, dtype)
+    if len(matrix) == 0:
+        return None
+    # Grid seragam: index dibuat dari date_range (jauh lebih murah daripada konversi per elemen)
+    index = pd.date_range(pd.Timestamp(start, unit='ns', tz='UTC'), periods=len(matrix),
+                          freq=pd.Timedelta(BUCKET_NS, 'ns'), name='_time')
+    return pd.DataFrame(matrix, index=index, columns=list(FEATURES), copy=False)
+
+
+def prepare_frame(df, dtype=np.float32):
+    """Versi DataFrame: `df` berisi kolom RAW_FEATURES per bucket 5 menit (misal InfluxStreamReader.read_frame)."""
+    if df is None or df.empty:
+        return None
+    return build_frame(index_ns(df.index), df[list(RAW_FEATURES)].to_numpy(), dtype)
+
+
+def add_time_features(df):
+    """Menambahkan kolom fitur waktu siklikal ke `df` (index DatetimeIndex UTC) dari tabel lookup."""
+    cyclic = calendar_features(index_ns(df.index), dtype=np.float64)
+    for i, name in enumerate(TIME_FEATURES):
+        df[name] = cyclic[:, i]
+    return df
@@ -0,0 +1,147 @@
+# feature_store.py
+"""
+Cache lokal frame 5 menit per alat untuk training dan prediksi.
+
+Hasil resample 5 menit (rata-rata suhu, kelembaban, tekanan, gas_ppm) disimpan
+sebagai array NumPy yang dibaca dengan memory-map:
+
+    <cache_dir>/<kunci>/times.npy   int64, awal bucket (epoch ns, UTC)
+    <cache_dir>/<kunci>/values.npy  float32 (n_bucket x 4), NaN untuk bucket kosong
+    <cache_dir>/<kunci>/meta.json   rentang yang sudah di-cache
+
+<kunci> adalah id_alat jika hanya berisi [A-Za-z0-9_-], selain itu hash id_alat (id_alat
+berasal dari payload alat, jadi tidak boleh dipakai langsung sebagai path).
+
+Setiap pemanggilan hanya mengambil data sejak bucket terakhir di cache (bucket
+terakhir diambil ulang karena mungkin belum lengkap), lalu menambahkannya ke cache.
+Data diambil secara streaming per potongan waktu (lihat influx_stream.py).
+Bucket yang lebih lama dari rentang terpanjang yang pernah diminta (`horizon` di meta.json,
+misal DATA_RANGE training) dibuang saat cache diperbarui, jadi ukuran cache tetap terbatas.
+Interpolasi dan fitur waktu siklikal dihitung saat frame dimuat (lihat feature_pipeline.py).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import numpy as np
+import pandas as pd
+import feature_pipeline
+from influx_stream import NUMERIC_COLS, BUCKET, InfluxStreamReader
+
+ALL_DEVICES_KEY = "_semua"
+_SAFE_KEY = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def cache_key(id_alat=None):
+    """Nama direktori cache untuk `id_alat` (None = semua alat) yang aman dipakai sebagai path."""
+    if id_alat is None:
+        return ALL_DEVICES_KEY
+    id_alat = str(id_alat)
+    if _SAFE_KEY.fullmatch(id_alat) and id_alat != ALL_DEVICES_KEY:
+        return id_alat
+    return "alat-" + hashlib.sha256(id_alat.encode("utf-8")).hexdigest()[:16]
+
+
+def parse_range(data_range):
+    """Mengubah rentang relatif Flux (misal "-30d", "-3h") menjadi Timedelta positif."""
+    return pd.Timedelta(data_range.strip().lstrip('-'))
+
+
+class FeatureStore:
+    def __init__(self, query_api, bucket, cache_dir="feature_cache", source="raw", chunk="1d", workers=4):
+        self.reader = InfluxStreamReader(query_api, bucket, source=source, chunk=chunk, workers=workers)
+        self.cache_dir = cache_dir
+        self.source = source
+
+    # --- Penyimpanan ---
+
+    def _path(self, key, name):
+        return os.path.join(self.cache_dir, key, name)
+
+    def _read(self, key):
+        try:
+            with open(self._path(key, "meta.json")) as f:
+                meta = json.load(f)
+            times = np.load(self._path(key, "times.npy"), mmap_mode='r')
+            values = np.load(self._path(key, "values.npy"), mmap_mode='r')
+        except (FileNotFoundError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.warning(f"Cache fitur '{key}' rusak ({e}), akan dibangun ulang.")
+            return None, None, None
+        if len(times) != len(values):
+            logging.warning(f"Cache fitur '{key}' tidak konsisten, akan dibangun ulang.")
+            return None, None, None
+        return meta, times, values
+
+    def _write(self, key, meta, times, values):
+        os.makedirs(os.path.join(self.cache_dir, key), exist_ok=True)
+        # Tulis ke file sementara lalu ganti secara atomik; meta.json terakhir sebagai penanda commit
+        for name, arr in (("times.npy", times), ("values.npy", values)):
+            tmp = self._path(key, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, self._path(key, name))
+        tmp = self._path(key, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(key, "meta.json"))
+
+    # --- API ---
+
+    def refresh(self, data_range, id_alat=None):
+        """Mengambil delta sejak bucket terakhir di cache dan menambahkannya. Mengembalikan kunci cache."""
+        key = cache_key(id_alat)
+        now = pd.Timestamp.now(tz='UTC')
+        wanted = parse_range(data_range)
+        wanted_start = now - wanted
+        meta, times, values = self._read(key)
+
+        if (meta is None or pd.Timestamp(meta["start"]) > wanted_start or len(times) == 0
+                or meta.get("source", "raw") != self.source):
+            # Cache belum ada, tidak mencakup rentang yang diminta, atau dari sumber lain: ambil ulang seluruh rentang
+            logging.info(f"Cache fitur '{key}' dibangun dari InfluxDB untuk rentang {data_range}...")
+            fetch_start = wanted_start
+            times = np.empty(0, dtype=np.int64)
+            values = np.empty((0, len(NUMERIC_COLS)), dtype=np.float32)
+            meta = {"start": wanted_start.isoformat(), "source": self.source, "horizon": wanted.isoformat()}
+        else:
+            # Bucket terakhir diambil ulang karena bisa saja belum lengkap saat cache ditulis
+            last_bucket = pd.Timestamp(int(times[-1]), tz='UTC')
+            fetch_start = last_bucket
+            logging.info(f"Cache fitur '{key}' diperbarui dengan data sejak {fetch_start.isoformat()}...")
+
+        new_times, new_values, n_rows = self.reader.read(fetch_start, now, id_alat)
+        if len(new_times) == 0:
+            logging.info(f"Tidak ada data baru untuk cache fitur '{key}'.")
+            if "last_time" not in meta:
+                self._write(key, meta, times, values)
+            return key
+
+        # Simpan hanya rentang terpanjang yang pernah diminta (training dan prediksi berbagi cache)
+        horizon = max(wanted, pd.Timedelta(meta.get("horizon", wanted)))
+        horizon_start = (now - horizon).floor(BUCKET)
+        keep = (times >= horizon_start.value) & (times < new_times[0])
+        times = np.concatenate([times[keep], new_times])
+        values = np.concatenate([values[keep], new_values])
+        meta["horizon"] = horizon.isoformat()
+        meta["start"] = max(pd.Timestamp(meta["start"]), horizon_start).isoformat()
+        meta["last_time"] = pd.Timestamp(int(new_times[-1]), tz='UTC').isoformat()
+        self._write(key, meta, times, values)
+        logging.info(f"Cache fitur '{key}': {len(new_times)} bucket baru dari {n_rows} data point, total {len(times)} bucket.")
+        return key
+
+    def load(self, data_range, id_alat=None, refresh=True):
+        """
+        Mengembalikan DataFrame 5 menit float32 yang siap dipakai model (sama seperti preprocess_data):
+        kolom numerik hasil resample + interpolasi waktu, ditambah fitur waktu siklikal.
+        """
+        key = self.refresh(data_range, id_alat) if refresh else cache_key(id_alat)
+        meta, times, values = self._read(key)
+        if meta is None or len(times) == 0:
+            return None
+
+        start = (pd.Timestamp.now(tz='UTC') - parse_range(data_range)).floor(BUCKET)
+        first = int(np.searchsorted(times, start.value))
+        # Bucket yang tidak ada di cache (misal jeda antar-pembaruan) diinterpolasi langsung dari memmap
+        return feature_pipeline.build_frame(times[first:], values[first:])
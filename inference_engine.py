@@ -0,0 +1,246 @@
+# inference_engine.py
+"""
+Mesin inferensi ringan untuk model LSTM prediksi gas.
+
+- Backend "keras"  : tensorflow.keras load_model (paling berat, baseline).
+- Backend "tflite" : interpreter TFLite (ai_edge_litert / tflite_runtime jika ada, fallback ke tf.lite).
+- Backend "numpy"  : forward pass LSTM murni NumPy dari bobot yang diekspor ke .npz,
+                     tanpa import TensorFlow sama sekali.
+
+`InferenceEngine` mengumpulkan window yang menunggu dari banyak alat dan menjalankan
+satu panggilan model per tick untuk semuanya (micro-batching).
+"""
+import json
+import logging
+import threading
+import numpy as np
+
+
+# --- Ekspor dari model Keras (dipanggil dari train_model.py) ---
+
+def export_numpy_weights(model, path):
+    """Menyimpan bobot LSTM/Dense model Sequential ke .npz untuk backend NumPy."""
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "Dropout":
+            continue  # Dropout tidak aktif saat inferensi
+        if kind not in ("LSTM", "Dense"):
+            raise ValueError(f"Layer '{kind}' tidak didukung backend NumPy.")
+        cfg = layer.get_config()
+        idx = len(layers)
+        spec = {"type": kind, "activation": cfg.get("activation", "linear")}
+        if kind == "LSTM":
+            spec["recurrent_activation"] = cfg.get("recurrent_activation", "sigmoid")
+            spec["return_sequences"] = bool(cfg.get("return_sequences", False))
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            arrays[f"{idx}_recurrent_kernel"] = recurrent_kernel.astype(np.float32)
+        else:
+            kernel, bias = layer.get_weights()
+        arrays[f"{idx}_kernel"] = kernel.astype(np.float32)
+        arrays[f"{idx}_bias"] = bias.astype(np.float32)
+        layers.append(spec)
+    np.savez(path, layers=np.array(json.dumps(layers)), **arrays)
+
+
+def export_tflite(model, path):
+    """
+    Mengonversi model Keras ke TFLite.
+
+    LSTM di-unroll terlebih dahulu (panjang sekuens sudah tetap = n_steps) dan semua layer
+    dibangun ulang sebagai float32, sehingga hasil konversi hanya memakai op bawaan TFLite,
+    tanpa Flex delegate.
+    """
+    import tensorflow as tf
+
+    model_config = model.get_config()
+    for layer in model_config["layers"]:
+        if layer["class_name"] == "LSTM":
+            layer["config"]["unroll"] = True
+        if "dtype" in layer["config"]:
+            # Model mixed precision (train_model.py --mixed-precision) dikonversi sebagai float32;
+            # op float16 di LSTM butuh Flex delegate
+            layer["config"]["dtype"] = "float32"
+    unrolled = model.__class__.from_config(model_config)
+    unrolled.set_weights(model.get_weights())
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(unrolled)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+# --- Backend ---
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "hard_sigmoid": lambda x: np.clip(0.2 * x + 0.5, 0.0, 1.0),
+}
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, model_path):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(model_path)
+
+    def predict(self, batch):
+        return np.asarray(self.model(batch, training=False)).reshape(len(batch), -1)[:, 0]
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, model_path):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = None
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self._batch != len(batch):
+            self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch = len(batch)
+        self.interpreter.set_tensor(self._input["index"], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output["index"]).reshape(len(batch), -1)[:, 0]
+
+
+class NumpyBackend:
+    """Forward pass LSTM bertumpuk + Dense murni NumPy (gate Keras: i, f, c, o)."""
+    name = "numpy"
+
+    def __init__(self, weights_path):
+        with np.load(weights_path) as data:
+            self.layers = json.loads(str(data["layers"]))
+            self.weights = {key: data[key] for key in data.files if key != "layers"}
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32)
+        for idx, spec in enumerate(self.layers):
+            kernel = self.weights[f"{idx}_kernel"]
+            bias = self.weights[f"{idx}_bias"]
+            if spec["type"] == "LSTM":
+                x = self._lstm(x, kernel, self.weights[f"{idx}_recurrent_kernel"], bias, spec)
+            else:
+                x = _ACTIVATIONS[spec["activation"]](x @ kernel + bias)
+        return x.reshape(len(batch), -1)[:, 0]
+
+    @staticmethod
+    def _lstm(x, kernel, recurrent_kernel, bias, spec):
+        batch, steps, _ = x.shape
+        units = recurrent_kernel.shape[0]
+        act = _ACTIVATIONS[spec["activation"]]
+        rec_act = _ACTIVATIONS[spec["recurrent_activation"]]
+        # Proyeksi input untuk semua langkah sekaligus: (batch, steps, 4 * units)
+        xw = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        outputs = np.empty((batch, steps, units), dtype=np.float32) if spec["return_sequences"] else None
+        for t in range(steps):
+            z = xw[:, t] + h @ recurrent_kernel
+            i = rec_act(z[:, :units])
+            f = rec_act(z[:, units:2 * units])
+            g = act(z[:, 2 * units:3 * units])
+            o = rec_act(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * act(c)
+            if outputs is not None:
+                outputs[:, t] = h
+        return outputs if outputs is not None else h
+
+
+BACKENDS = {"keras": KerasBackend, "tflite": TFLiteBackend, "numpy": NumpyBackend}
+
+
+def load_backend(kind, path):
+    if kind not in BACKENDS:
+        raise ValueError(f"Backend inferensi tidak dikenal: '{kind}' (pilihan: {', '.join(BACKENDS)}).")
+    logging.info(f"🧠 Memuat backend inferensi '{kind}' dari {path}...")
+    return BACKENDS[kind](path)
+
+
+# --- Micro-batching ---
+
+class InferenceEngine:
+    """
+    Mengumpulkan window dari banyak alat dan memprediksinya dalam satu batch per tick.
+
+    `submit(key, window, context)` menyimpan window per (key, context) — untuk prediksi online
+    context adalah bucket yang ditutup, jadi beberapa bucket satu alat yang tiba sebelum tick
+    berikutnya (misal backlog setelah reconnect) semuanya tetap diprediksi. Hanya window dengan
+    key dan context yang sama yang ditimpa. `tick()` menjalankan backend sekali untuk semua
+    window yang menunggu lalu memanggil `on_result(key, prediksi_scaled, context)` untuk
+    masing-masing, berurutan sesuai submit.
+    """
+
+    def __init__(self, backend, on_result, interval=1.0, max_batch=1024):
+        self.backend = backend
+        self.on_result = on_result
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, key, window, context=None):
+        """`context` harus hashable (misal awal bucket dalam ns)."""
+        with self._lock:
+            self._pending[(key, context)] = window
+
+    def clear(self):
+        """Membuang semua window yang menunggu (misal bentuk input model berubah)."""
+        with self._lock:
+            self._pending = {}
+
+    def tick(self):
+        """Memprediksi semua window yang menunggu. Mengembalikan jumlah window yang diproses."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        items = list(pending.items())
+        backend = self.backend  # satu backend untuk seluruh tick meskipun model ditukar di tengah jalan
+        for start in range(0, len(items), self.max_batch):
+            chunk = items[start:start + self.max_batch]
+            batch = np.stack([window for _, window in chunk])
+            predictions = backend.predict(batch)
+            for ((key, context), _), pred in zip(chunk, predictions):
+                try:
+                    self.on_result(key, float(pred), context)
+                except Exception as e:
+                    logging.error(f"⚠️ Gagal memproses hasil prediksi untuk '{key}': {e}", exc_info=True)
+        return len(items)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="inference-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.tick()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"⚠️ Error di mesin inferensi: {e}", exc_info=True)
@@ -1,13 +1,119 @@
 import logging
-from datetime import datetime, timezone
-from influxdb_client import InfluxDBClient, Point
+import queue
+import random
+import threading
+import time
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 from influxdb_client.client.exceptions import InfluxDBError
-from dateutil import parser  # Untuk parsing timestamp string
 import config
+import metrics
+import payload_codec
+from spool import Spool, SpoolReplayer, is_retryable_error
+
+
+class BatchWriter:
+    """
+    Penulis batch asinkron untuk InfluxDB.
+
+    Record dimasukkan ke antrean berukuran terbatas lalu ditulis oleh satu thread
+    latar belakang per batch (maksimal `batch_size` record, atau setiap
+    `flush_interval_ms` + jitter acak). Jika antrean penuh, `submit` menunggu
+    hingga `put_timeout` detik sehingga produsen ikut melambat (backpressure).
+    """
+
+    _STOP = object()
+
+    def __init__(self, write_api, bucket, org, batch_size=500, flush_interval_ms=1000,
+                 jitter_ms=0, max_queue=10000, put_timeout=5.0,
+                 on_success=None, on_error=None):
+        self.write_api = write_api
+        self.bucket = bucket
+        self.org = org
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.put_timeout = put_timeout
+        self.on_success = on_success
+        self.on_error = on_error
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_requested = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="influx-batch-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Memasukkan satu record ke antrean. Mengembalikan False jika antrean tetap penuh."""
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Meminta thread penulis untuk segera menulis isi antrean."""
+        self._flush_requested.set()
+
+    def close(self, timeout=30.0):
+        """Menulis sisa antrean lalu menghentikan thread penulis."""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _next_deadline(self):
+        jitter = random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+        return time.monotonic() + self.flush_interval + jitter
+
+    def _run(self):
+        batch = []
+        deadline = self._next_deadline()
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=min(timeout, 0.1))
+                if item is self._STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            due = time.monotonic() >= deadline or self._flush_requested.is_set()
+            if batch and (len(batch) >= self.batch_size or due or stopping):
+                self._flush_requested.clear()
+                self._write_batch(batch)
+                batch = []
+                deadline = self._next_deadline()
+            elif due:
+                self._flush_requested.clear()
+                deadline = self._next_deadline()
+
+    def _write_batch(self, batch):
+        metrics.BATCH_SIZE.observe(len(batch))
+        start = time.perf_counter()
+        try:
+            self.write_api.write(bucket=self.bucket, org=self.org, record=batch)
+        except Exception as e:
+            metrics.POINTS_FAILED.inc(len(batch))
+            if self.on_error:
+                self.on_error(batch, e)
+            return
+        elapsed = time.perf_counter() - start
+        metrics.WRITE_LATENCY.observe(elapsed, mode="batch")
+        metrics.POINTS_WRITTEN.inc(len(batch))
+        if self.on_success:
+            self.on_success(batch, elapsed)
+
 
 class InfluxDBHandler:
-    def __init__(self):
+    def __init__(self, write_mode=None, on_batch_success=None, on_batch_error=None):
+        self.write_mode = (write_mode or config.INFLUX_WRITE_MODE).lower()
+        if self.write_mode not in ("sync", "batch"):
+            raise ValueError(f"INFLUX_WRITE_MODE tidak dikenal: '{self.write_mode}' (gunakan 'sync' atau 'batch').")
+
         try:
             self.client = InfluxDBClient(
                 url=config.INFLUX_URL,
@@ -21,40 +127,85 @@ class InfluxDBHandler:
             logging.critical(f"❌ Gagal menginisialisasi klien InfluxDB. Periksa URL, token, atau org. Detail: {e}")
             raise  # Program dihentikan jika tidak bisa konek ke InfluxDB
 
+        # Spool disk untuk data yang gagal ditulis, beserta thread replay-nya
+        self.spool = None
+        self.replayer = None
+        if config.INFLUX_SPOOL_DIR:
+            self.spool = Spool(
+                config.INFLUX_SPOOL_DIR,
+                segment_bytes=config.INFLUX_SPOOL_SEGMENT_MB * 1024 * 1024,
+                max_bytes=config.INFLUX_SPOOL_MAX_MB * 1024 * 1024,
+            )
+            self.replayer = SpoolReplayer(
+                self.spool,
+                self.write_api,
+                bucket=config.INFLUX_BUCKET,
+                org=config.INFLUX_ORG,
+                batch_size=config.INFLUX_SPOOL_REPLAY_BATCH,
+                interval=config.INFLUX_SPOOL_REPLAY_INTERVAL,
+            )
+            self.replayer.start()
+            metrics.SPOOL_BYTES.set_function(self.spool.size_bytes)
+            logging.info(f"💾 Spool disk aktif di '{config.INFLUX_SPOOL_DIR}' (maks {config.INFLUX_SPOOL_MAX_MB} MB).")
+
+        self.batch_writer = None
+        if self.write_mode == "batch":
+            self.batch_writer = BatchWriter(
+                self.write_api,
+                bucket=config.INFLUX_BUCKET,
+                org=config.INFLUX_ORG,
+                batch_size=config.INFLUX_BATCH_SIZE,
+                flush_interval_ms=config.INFLUX_FLUSH_INTERVAL_MS,
+                jitter_ms=config.INFLUX_JITTER_MS,
+                max_queue=config.INFLUX_QUEUE_MAXSIZE,
+                put_timeout=config.INFLUX_QUEUE_PUT_TIMEOUT,
+                on_success=on_batch_success or self._on_batch_success,
+                on_error=on_batch_error or self._on_batch_error,
+            )
+            metrics.QUEUE_DEPTH.set_function(self.batch_writer.qsize, queue="influx_batch")
+            logging.info(
+                f"📦 Mode penulisan batch aktif (batch={config.INFLUX_BATCH_SIZE}, "
+                f"interval={config.INFLUX_FLUSH_INTERVAL_MS}ms, jitter={config.INFLUX_JITTER_MS}ms, "
+                f"antrean={config.INFLUX_QUEUE_MAXSIZE})."
+            )
+
+    @staticmethod
+    def _on_batch_success(batch, elapsed):
+        logging.info(f"✅ Batch {len(batch)} data point berhasil ditulis ke InfluxDB ({elapsed * 1000:.1f} ms).")
+
+    def _on_batch_error(self, batch, error):
+        logging.error(f"❌ Gagal menulis batch {len(batch)} data point ke InfluxDB. Detail: {error}")
+        if is_retryable_error(error):
+            self.spool_records(batch)
+
+    def spool_records(self, records):
+        """Menyimpan record ke spool disk agar dikirim ulang nanti. Mengembalikan False jika spool nonaktif."""
+        if self.spool is None:
+            return False
+        try:
+            self.spool.append(records)
+        except OSError as e:
+            logging.error(f"❌ Gagal menyimpan {len(records)} data point ke spool. Detail: {e}")
+            return False
+        metrics.POINTS_SPOOLED.inc(len(records))
+        logging.warning(f"💾 {len(records)} data point disimpan ke spool untuk dikirim ulang.")
+        return True
+
     def write_data(self, data: dict):
         """Memformat dan menulis data yang diterima ke InfluxDB."""
         try:
-            # Log data mentah (raw)
-            logging.info(f"📦 Data mentah diterima: {data}")
-
-            # Validasi dan parsing timestamp
-            raw_timestamp = data.get("timestamp")
-            if raw_timestamp is None:
-                raise ValueError("Field 'timestamp' tidak ditemukan dalam data.")
-
-            if isinstance(raw_timestamp, str):
-                device_timestamp = parser.parse(raw_timestamp).astimezone(timezone.utc)
-                logging.debug(f"🕒 Timestamp (string) berhasil di-parse: {device_timestamp.isoformat()}")
-            else:
-                device_timestamp = datetime.fromtimestamp(int(raw_timestamp), tz=timezone.utc)
-                logging.debug(f"🕒 Timestamp (integer) berhasil diubah: {device_timestamp.isoformat()}")
-
-            # Ambil ID alat
-            id_alat = data.get("id_alat", "ALAT_01")
-
-            # Buat data point
-            point = Point("pengukuran_udara") \
-                .tag("id_alat", id_alat) \
-                .field("suhu", float(data.get("suhu", 0.0))) \
-                .field("kelembaban", float(data.get("kelembaban", 0.0))) \
-                .field("tekanan", float(data.get("tekanan", 0.0))) \
-                .field("gas_ppm", float(data.get("gas_ppm", 0.0))) \
-                .time(device_timestamp)
-
-            # Tulis ke InfluxDB
-            self.write_api.write(bucket=config.INFLUX_BUCKET, org=config.INFLUX_ORG, record=point)
-
-            logging.info(f"✅ Data berhasil ditulis ke InfluxDB untuk id_alat '{id_alat}' @ {device_timestamp.isoformat()}")
+            # Log data mentah (raw); format string hanya dibangun jika level DEBUG aktif
+            logging.debug("📦 Data mentah diterima: %s", data)
+
+            # Validasi timestamp dan serialisasi langsung ke line protocol
+            line = payload_codec.encode_line(data)
+            id_alat = data.get("id_alat", payload_codec.DEFAULT_ID_ALAT)
+
+            if not self._write_line(line):
+                logging.error("❌ Data id_alat '%s' @ %s tidak tertulis.", id_alat, data.get("timestamp"))
+                return False
+
+            logging.debug("✅ Data berhasil ditulis ke InfluxDB untuk id_alat '%s' @ %s", id_alat, data.get("timestamp"))
             return True
 
         except KeyError as e:
@@ -69,3 +220,51 @@ class InfluxDBHandler:
             logging.error(f"❌ Exception tak terduga saat memproses data: {e}")
 
         return False
+
+    def write_line(self, line):
+        """Menulis satu baris line protocol (bytes) apa adanya, misal hasil prediksi atau rollup."""
+        try:
+            return self._write_line(line)
+        except Exception as e:
+            logging.error(f"❌ Gagal menulis ke InfluxDB. Detail: {e}")
+            return False
+
+    def _write_line(self, line):
+        """
+        Jalur tulis bersama: antrean batch atau tulis sinkron, dengan spool sebagai cadangan.
+        Mengembalikan False jika data tidak tertulis maupun tersimpan di spool.
+        """
+        # Mode batch: masukkan ke antrean, hasil tulis dilaporkan per batch lewat callback
+        if self.batch_writer is not None:
+            if self.batch_writer.submit(line):
+                return True
+            if self.spool_records([line]):
+                return True
+            metrics.MESSAGES_DROPPED.inc(reason="influx_queue_full")
+            logging.error("❌ Antrean batch InfluxDB penuh dan spool tidak tersedia.")
+            return False
+
+        # Tulis ke InfluxDB; jika server tidak bisa dihubungi, simpan ke spool
+        write_start = time.perf_counter()
+        try:
+            self.write_api.write(bucket=config.INFLUX_BUCKET, org=config.INFLUX_ORG, record=line)
+        except Exception as e:
+            metrics.POINTS_FAILED.inc()
+            if is_retryable_error(e) and self.spool_records([line]):
+                logging.error(f"❌ Gagal menulis ke InfluxDB, data disimpan ke spool. Detail: {e}")
+                return True
+            raise
+        metrics.WRITE_LATENCY.observe(time.perf_counter() - write_start, mode="sync")
+        metrics.POINTS_WRITTEN.inc()
+        return True
+
+    def close(self):
+        """Menulis sisa data di antrean (jika mode batch) lalu menutup klien InfluxDB."""
+        if self.batch_writer is not None:
+            logging.info(f"⏳ Menulis sisa {self.batch_writer.qsize()} data point di antrean batch...")
+            self.batch_writer.close()
+        if self.replayer is not None:
+            self.replayer.stop()
+            self.spool.close()
+        self.client.close()
+        logging.info("🔌 Klien InfluxDB ditutup.")
@@ -0,0 +1,176 @@
+# influx_stream.py
+"""
+Pembacaan data InfluxDB secara streaming per potongan waktu (chunk).
+
+Rentang query dipecah menjadi potongan waktu yang sejajar dengan bucket 5 menit.
+Setiap potongan diambil lewat API CSV (respons dibaca baris demi baris, tidak
+dimuat utuh), di-parse langsung ke array float32, lalu di-resample menjadi
+rata-rata per bucket 5 menit. Karena batas potongan sejajar bucket, hasilnya sama
+dengan resample seluruh data sekaligus, tetapi memori puncak hanya sebesar
+beberapa potongan yang sedang diproses. Beberapa potongan diambil paralel.
+
+`source="rollup"` membaca measurement rollup 5 menit (lihat rollup.py) alih-alih
+pembacaan mentah: satu baris per alat per bucket, digabung dengan rata-rata berbobot
+field `n` jika ada beberapa rollup parsial untuk bucket yang sama.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from influxdb_client import Dialect
+from rollup import RAW_MEASUREMENT, ROLLUP_MEASUREMENT, WEIGHT_FIELD
+
+NUMERIC_COLS = ['suhu', 'kelembaban', 'tekanan', 'gas_ppm']
+BUCKET = pd.Timedelta('5min')
+BUCKET_NS = BUCKET.value
+# Sumber data model: measurement dan field bobot (None = setiap baris berbobot 1)
+SOURCES = {
+    "raw": (RAW_MEASUREMENT, None),
+    "rollup": (ROLLUP_MEASUREMENT, WEIGHT_FIELD),
+}
+
+# Tanpa anotasi: hanya baris header per tabel lalu baris data
+_DIALECT = Dialect(header=True, annotations=[])
+
+
+def time_chunks(start, stop, chunk):
+    """Memecah [start, stop) menjadi potongan (awal_bucket, awal_query, akhir) yang sejajar bucket 5 menit."""
+    chunk_ns = max(BUCKET_NS, chunk.value - chunk.value % BUCKET_NS)
+    bucket_start = start.floor(BUCKET)
+    while bucket_start < stop:
+        chunk_stop = min(bucket_start + pd.Timedelta(chunk_ns, 'ns'), stop)
+        yield bucket_start, max(bucket_start, start), chunk_stop
+        bucket_start = chunk_stop
+
+
+def _to_ns(times):
+    # '2025-01-01T00:00:00.123Z' -> datetime64[ns]; akhiran 'Z' dibuang karena semua waktu InfluxDB dalam UTC
+    return np.array([t[:-1] if t.endswith('Z') else t for t in times], dtype='datetime64[ns]').view(np.int64)
+
+
+class InfluxStreamReader:
+    def __init__(self, query_api, bucket, source="raw", chunk="1d", workers=4, batch_rows=50_000):
+        if source not in SOURCES:
+            raise ValueError(f"Sumber data tidak dikenal: '{source}' (pilihan: {', '.join(SOURCES)}).")
+        self.query_api = query_api
+        self.bucket = bucket
+        self.measurement, self.weight_field = SOURCES[source]
+        self.chunk = pd.Timedelta(chunk)
+        self.workers = max(1, int(workers))
+        self.batch_rows = batch_rows
+
+    def _query(self, start, stop, id_alat):
+        device_filter = f'\n      |> filter(fn: (r) => r["id_alat"] == "{id_alat}")' if id_alat else ''
+        columns = ', '.join(f'"{col}"' for col in ['_time'] + NUMERIC_COLS + ([self.weight_field] if self.weight_field else []))
+        return f'''
+    from(bucket: "{self.bucket}")
+      |> range(start: {start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}, stop: {stop.strftime('%Y-%m-%dT%H:%M:%S.%fZ')})
+      |> filter(fn: (r) => r["_measurement"] == "{self.measurement}"){device_filter}
+      |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
+      |> keep(columns: [{columns}])
+    '''
+
+    def list_devices(self, start):
+        """Daftar id_alat yang memiliki data di measurement sumber sejak `start`."""
+        query = f'''
+    import "influxdata/influxdb/schema"
+    schema.tagValues(
+      bucket: "{self.bucket}",
+      tag: "id_alat",
+      predicate: (r) => r["_measurement"] == "{self.measurement}",
+      start: {start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}
+    )
+    '''
+        tables = self.query_api.query(query)
+        return sorted(record.get_value() for table in tables for record in table.records)
+
+    def fetch_chunk(self, bucket_start, query_start, stop, id_alat=None):
+        """
+        Mengambil satu potongan dan me-resample-nya ke bucket 5 menit.
+        Mengembalikan (times int64 ns, values float32 n x 4, jumlah_baris) hanya untuk bucket yang berisi data.
+        """
+        n_buckets = -(-(stop - bucket_start).value // BUCKET_NS)
+        sums = np.zeros((n_buckets, len(NUMERIC_COLS)))
+        counts = np.zeros((n_buckets, len(NUMERIC_COLS)), dtype=np.int64)
+        n_rows = 0
+        origin = bucket_start.value
+
+        def accumulate(rows, positions, weight_pos):
+            idx = (_to_ns([row[positions[0]] for row in rows]) - origin) // BUCKET_NS
+            inside = (idx >= 0) & (idx < n_buckets)
+            weights = None
+            if weight_pos is not None:
+                # Rollup: setiap baris mewakili `n` pembacaan mentah
+                weights = np.array([row[weight_pos] or '0' for row in rows], dtype=np.int64)
+            for c, pos in enumerate(positions[1:]):
+                if pos is None:
+                    continue
+                values = np.array([row[pos] or 'nan' for row in rows], dtype=np.float32)
+                valid = inside & ~np.isnan(values)
+                if weights is None:
+                    sums[:, c] += np.bincount(idx[valid], weights=values[valid], minlength=n_buckets)
+                    counts[:, c] += np.bincount(idx[valid], minlength=n_buckets)
+                else:
+                    w = weights[valid]
+                    sums[:, c] += np.bincount(idx[valid], weights=values[valid] * w, minlength=n_buckets)
+                    counts[:, c] += np.bincount(idx[valid], weights=w, minlength=n_buckets).astype(np.int64)
+
+        rows = []
+        positions = weight_pos = None
+        for row in self.query_api.query_csv(self._query(query_start, stop, id_alat), dialect=_DIALECT):
+            if '_time' in row:
+                # Header tabel baru (satu tabel per id_alat); posisi kolom bisa berbeda
+                if rows:
+                    accumulate(rows, positions, weight_pos)
+                    rows = []
+                positions = [row.index('_time')] + [row.index(col) if col in row else None for col in NUMERIC_COLS]
+                weight_pos = row.index(self.weight_field) if self.weight_field in row else None
+                continue
+            rows.append(row)
+            n_rows += 1
+            if len(rows) >= self.batch_rows:
+                accumulate(rows, positions, weight_pos)
+                rows = []
+        if rows:
+            accumulate(rows, positions, weight_pos)
+
+        filled = counts.any(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums[filled] / counts[filled]).astype(np.float32)
+        times = origin + np.flatnonzero(filled).astype(np.int64) * BUCKET_NS
+        return times, means, n_rows
+
+    def iter_buckets(self, start, stop=None, id_alat=None):
+        """
+        Generator (times, values, jumlah_baris) per potongan, berurutan secara waktu.
+        Paling banyak `workers` potongan diambil bersamaan agar memori tetap terbatas.
+        """
+        stop = stop if stop is not None else pd.Timestamp.now(tz='UTC')
+        chunks = time_chunks(start, stop, self.chunk)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="influx-stream") as pool:
+            pending = deque()
+            for bounds in chunks:
+                pending.append(pool.submit(self.fetch_chunk, *bounds, id_alat))
+                if len(pending) >= self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def read(self, start, stop=None, id_alat=None):
+        """Menggabungkan semua potongan menjadi (times, values, jumlah_baris)."""
+        times, values, n_rows = [], [], 0
+        for chunk_times, chunk_values, chunk_rows in self.iter_buckets(start, stop, id_alat):
+            times.append(chunk_times)
+            values.append(chunk_values)
+            n_rows += chunk_rows
+        if not times:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(NUMERIC_COLS)), dtype=np.float32), 0
+        logging.debug("Streaming InfluxDB: %d baris mentah menjadi %d bucket.", n_rows, sum(len(t) for t in times))
+        return np.concatenate(times), np.concatenate(values), n_rows
+
+    def read_frame(self, start, stop=None, id_alat=None):
+        """DataFrame rata-rata 5 menit (float32, index `_time` UTC) hanya untuk bucket yang berisi data."""
+        times, values, _ = self.read(start, stop, id_alat)
+        index = pd.DatetimeIndex(pd.to_datetime(times, utc=True), name='_time')
+        return pd.DataFrame(values, index=index, columns=NUMERIC_COLS)
@@ -0,0 +1,171 @@
+# ingest_filter.py
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+import metrics
+import payload_codec
+
+
+class _DeviceState:
+    __slots__ = ("lock", "seen", "newest", "held", "last_emitted", "seq")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen = OrderedDict()   # timestamp_ns -> None, urut waktu kedatangan (LRU)
+        self.newest = None          # timestamp terbesar yang pernah diterima
+        self.held = []              # heap (timestamp_ns, seq, waktu_tiba, data)
+        self.last_emitted = None    # timestamp terakhir yang sudah diteruskan
+        self.seq = 0
+
+
+class IngestFilter:
+    """
+    Deduplikasi dan pengurutan ulang pembacaan per `id_alat` sebelum ditulis.
+
+    - Dedup: pembacaan dengan (id_alat, timestamp) yang sudah pernah diterima dalam
+      `dedup_window` detik terakhir (relatif terhadap timestamp terbaru alat) dibuang.
+      Cache per alat dibatasi `dedup_max` entri (LRU), jadi memori tetap terbatas.
+    - Reorder: pembacaan ditahan hingga `tolerance` detik, lalu diteruskan berurutan
+      secara waktu. Pembacaan dilepas saat timestamp alat sudah `tolerance` detik di
+      depannya, atau saat sudah ditahan `tolerance` detik (alat berhenti mengirim).
+      Pembacaan yang tiba setelah pembacaan lebih baru sudah diteruskan tetap ditulis,
+      tetapi dihitung sebagai terlambat.
+
+    `push` dan `flush_due` mengembalikan daftar pembacaan yang siap diteruskan, sehingga
+    pemanggil (mode thread maupun asyncio) yang menentukan cara menulisnya. Pemanggil
+    multi-thread memberikan `sink` agar urutan per alat tetap terjaga sampai ke listener.
+    """
+
+    def __init__(self, dedup_window=600.0, dedup_max=1024, tolerance=2.0):
+        self.dedup_window_ns = int(dedup_window * 1_000_000_000)
+        self.dedup_max = max(0, int(dedup_max))
+        self.tolerance_ns = int(tolerance * 1_000_000_000)
+        self.tolerance = tolerance
+        self._devices = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        metrics.QUEUE_DEPTH.set_function(self.held_count, queue="reorder")
+
+    def held_count(self):
+        with self._lock:
+            states = list(self._devices.values())
+        return sum(len(state.held) for state in states)
+
+    def _state(self, id_alat):
+        state = self._devices.get(id_alat)
+        if state is None:
+            with self._lock:
+                state = self._devices.setdefault(id_alat, _DeviceState())
+        return state
+
+    def push(self, data, sink=None):
+        """
+        Menerima satu pembacaan valid. Mengembalikan daftar pembacaan yang siap diteruskan (berurutan).
+        Jika `sink` diberikan, pembacaan tersebut juga diteruskan ke `sink` selagi lock alat dipegang,
+        sehingga thread lain (misal thread pelepasan berkala) tidak bisa menyelipkan pembacaan alat
+        yang sama di antaranya.
+        """
+        ts = payload_codec.timestamp_ns(data.get("timestamp"))
+        state = self._state(data.get("id_alat", payload_codec.DEFAULT_ID_ALAT))
+        with state.lock:
+            ready = self._accept(state, ts, data)
+            if sink is not None:
+                self._deliver(ready, sink)
+        return ready
+
+    def _accept(self, state, ts, data):
+        if self.dedup_window_ns and self._is_duplicate(state, ts):
+            metrics.DUPLICATES_DROPPED.inc()
+            return []
+        out_of_order = state.newest is not None and ts < state.newest
+        if not out_of_order:
+            state.newest = ts
+
+        if not self.tolerance_ns:
+            return [data]
+        if state.last_emitted is not None and ts < state.last_emitted:
+            # Pembacaan lebih baru sudah diteruskan; tidak bisa diurutkan lagi
+            metrics.POINTS_LATE.inc()
+            return [data]
+        if out_of_order:
+            # Tiba tidak berurutan, tetapi masih disisipkan di urutan yang benar
+            metrics.POINTS_REORDERED.inc()
+        state.seq += 1
+        heapq.heappush(state.held, (ts, state.seq, time.monotonic(), data))
+        return self._release(state, time.monotonic())
+
+    @staticmethod
+    def _deliver(ready, sink):
+        for data in ready:
+            try:
+                sink(data)
+            except Exception as e:
+                logging.error(f"⚠️ Error saat meneruskan pembacaan: {e}", exc_info=True)
+
+    def _is_duplicate(self, state, ts):
+        seen = state.seen
+        if ts in seen:
+            seen.move_to_end(ts)
+            return True
+        seen[ts] = None
+        # Buang entri di luar jendela waktu, lalu batasi ukuran (LRU)
+        horizon = max(ts, state.newest or ts) - self.dedup_window_ns
+        while seen:
+            oldest = next(iter(seen))
+            if oldest >= horizon and len(seen) <= self.dedup_max:
+                break
+            seen.popitem(last=False)
+        return False
+
+    def _release(self, state, now, force=False):
+        ready = []
+        held = state.held
+        while held:
+            ts, _, arrived, data = held[0]
+            if not (force or ts <= state.newest - self.tolerance_ns or now - arrived >= self.tolerance):
+                break
+            heapq.heappop(held)
+            ready.append(data)
+            state.last_emitted = ts
+        return ready
+
+    def flush_due(self, force=False, sink=None):
+        """
+        Pembacaan yang sudah ditahan cukup lama (atau semua jika `force`), per alat berurutan.
+        Dengan `sink`, pembacaan diteruskan selagi lock alat dipegang (lihat `push`).
+        """
+        with self._lock:
+            states = list(self._devices.values())
+        now = time.monotonic()
+        ready = []
+        for state in states:
+            if state.held:
+                with state.lock:
+                    released = self._release(state, now, force)
+                    if sink is not None:
+                        self._deliver(released, sink)
+                ready.extend(released)
+        return ready
+
+    # --- Mode thread: pelepasan berkala ke `sink` ---
+
+    def start(self, sink):
+        if not self.tolerance_ns:
+            return
+        self._thread = threading.Thread(target=self._run, args=(sink,), name="reorder-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, sink):
+        """Menghentikan thread pelepasan lalu meneruskan semua pembacaan yang masih ditahan."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.tolerance + 5)
+        self.flush_due(force=True, sink=sink)
+
+    def _run(self, sink):
+        interval = min(max(self.tolerance / 4, 0.05), 1.0)
+        while not self._stop.wait(interval):
+            self.flush_due(sink=sink)
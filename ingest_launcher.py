@@ -0,0 +1,138 @@
+# ingest_launcher.py
+"""
+Menjalankan beberapa worker ingest (logger_main.py) sebagai proses terpisah.
+
+Semua worker subscribe lewat shared subscription MQTT ($share/<grup>/<topik>), jadi
+broker membagi pesan ke worker-worker tersebut dan throughput ingest naik seiring
+jumlah core. Instance launcher di mesin lain dengan grup yang sama ikut berbagi beban.
+
+Setiap worker mendapat lingkungan sendiri:
+- INGEST_WORKER_ID  : nomor worker (client ID MQTT unik, prefix log [wN])
+- METRICS_PORT      : port dasar + nomor worker (metrik per worker)
+- INFLUX_SPOOL_DIR / INGEST_SPILL_PATH : path terpisah per worker, karena spool
+  tidak aman ditulis dua proses sekaligus
+
+Prediksi online dimatikan di worker karena tiap worker hanya melihat sebagian pesan
+dari setiap alat; jalankan prediksi di proses tersendiri jika dibutuhkan. Dengan alasan
+yang sama, deteksi anomali di worker hanya memakai ambang absolut (z-score dan laju
+perubahan butuh semua pembacaan alat secara berurutan).
+
+Worker yang mati tanpa diminta dijalankan ulang dengan backoff. Ctrl+C / SIGTERM
+diteruskan ke semua worker sebagai SIGINT agar sisa antrean sempat ditulis.
+
+Contoh:
+    python ingest_launcher.py --workers 4 --share-group nultra-logger
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+import config
+
+LOGGER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logger_main.py")
+
+
+def worker_env(worker_id, share_group, metrics_port):
+    env = dict(os.environ)
+    env["INGEST_WORKER_ID"] = str(worker_id)
+    env["MQTT_SHARE_GROUP"] = share_group
+    env["METRICS_PORT"] = str(metrics_port + worker_id if metrics_port else 0)
+    if config.INFLUX_SPOOL_DIR:
+        env["INFLUX_SPOOL_DIR"] = os.path.join(config.INFLUX_SPOOL_DIR, f"worker-{worker_id}")
+    root, ext = os.path.splitext(config.INGEST_SPILL_PATH)
+    env["INGEST_SPILL_PATH"] = f"{root}-w{worker_id}{ext}"
+    env["ONLINE_PREDICTION"] = "0"
+    env["ANOMALY_Z"] = "0"
+    env["ANOMALY_ROC_PPM_PER_MIN"] = "0"
+    return env
+
+
+class Worker:
+    def __init__(self, worker_id, env):
+        self.worker_id = worker_id
+        self.env = env
+        self.process = None
+        self.restarts = 0
+        self.started_at = 0.0
+        self.next_start = 0.0
+
+    def start(self):
+        # Sesi baru: Ctrl+C di terminal hanya sampai ke launcher, yang meneruskannya sekali
+        self.process = subprocess.Popen([sys.executable, LOGGER_SCRIPT], env=self.env, start_new_session=True)
+        self.started_at = time.monotonic()
+        logging.info(f"🚀 Worker {self.worker_id} berjalan (PID {self.process.pid}).")
+
+    def poll(self):
+        return None if self.process is None else self.process.poll()
+
+
+class Launcher:
+    def __init__(self, workers, share_group, metrics_port, restart_max=60.0):
+        self.workers = [Worker(i, worker_env(i, share_group, metrics_port)) for i in range(workers)]
+        self.restart_max = restart_max
+        self._stopping = False
+
+    def request_stop(self, signum=None, frame=None):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        for worker in self.workers:
+            worker.start()
+        while not self._stopping:
+            now = time.monotonic()
+            for worker in self.workers:
+                code = worker.poll()
+                if code is None:
+                    continue
+                if worker.next_start == 0.0:
+                    # Worker baru saja berhenti: jadwalkan restart dengan backoff eksponensial
+                    if now - worker.started_at > self.restart_max:
+                        worker.restarts = 0  # Sempat berjalan lama, anggap kegagalan baru
+                    delay = min(2 ** worker.restarts, self.restart_max)
+                    worker.next_start = now + delay
+                    logging.warning(f"⚠️ Worker {worker.worker_id} berhenti (kode {code}), dijalankan ulang dalam {delay:.0f} detik.")
+                elif now >= worker.next_start:
+                    worker.restarts += 1
+                    worker.next_start = 0.0
+                    worker.start()
+            time.sleep(0.5)
+        self.stop()
+
+    def stop(self, timeout=30.0):
+        running = [w for w in self.workers if w.poll() is None]
+        logging.info(f"⏳ Menghentikan {len(running)} worker...")
+        for worker in running:
+            worker.process.send_signal(signal.SIGINT)
+        deadline = time.monotonic() + timeout
+        for worker in running:
+            try:
+                worker.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logging.error(f"❌ Worker {worker.worker_id} tidak berhenti dalam {timeout:.0f} detik, dipaksa berhenti.")
+                worker.process.kill()
+                worker.process.wait()
+        logging.info("🔌 Semua worker berhenti.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Menjalankan beberapa worker ingest dengan MQTT shared subscription.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Jumlah proses worker (default: jumlah core)")
+    parser.add_argument("--share-group", default=config.MQTT_SHARE_GROUP or "nultra-logger",
+                        help="Nama grup shared subscription; samakan di semua mesin")
+    parser.add_argument("--metrics-port", type=int, default=config.METRICS_PORT,
+                        help="Port metrik worker 0; worker N memakai port + N (0 = nonaktif)")
+    args = parser.parse_args()
+
+    if config.ONLINE_PREDICTION:
+        logging.warning("⚠️ ONLINE_PREDICTION diabaikan di worker launcher (setiap worker hanya menerima sebagian pesan).")
+    logging.info(f"Memulai {args.workers} worker ingest dengan grup '{args.share_group}' di topik {config.MQTT_TOPIC_DATA}...")
+    Launcher(args.workers, args.share_group, args.metrics_port).run()
+
+
+if __name__ == "__main__":
+    main()
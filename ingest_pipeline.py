@@ -0,0 +1,222 @@
+# ingest_pipeline.py
+import logging
+import os
+import queue
+import struct
+import threading
+import zlib
+import metrics
+
+
+class IngestPipeline:
+    """
+    Tahap antrean antara callback MQTT dan penyimpanan.
+
+    Callback paho hanya memanggil `submit(payload)`; sekumpulan worker thread
+    kemudian menjalankan `process_fn(payload)` (parse, validasi, tulis).
+
+    Jika `key_fn` diberikan (misal payload_codec.device_key), setiap worker punya antrean
+    sendiri dan payload dengan kunci yang sama (satu alat) selalu diproses worker yang sama,
+    sehingga pembacaan satu alat diproses berurutan sesuai kedatangan. Tanpa `key_fn`, semua
+    worker berbagi satu antrean dan pembacaan satu alat bisa diproses bersamaan.
+
+    Kebijakan saat antrean penuh (`overflow_policy`):
+      - "block"       : pemanggil menunggu hingga `put_timeout` detik, lalu pesan dibuang.
+                        Pemanggilnya adalah thread jaringan paho, jadi selama menunggu tidak ada
+                        pesan yang dibaca dan keepalive MQTT ikut tertahan.
+      - "drop_oldest" : pesan tertua di antrean dibuang untuk memberi tempat pesan baru.
+      - "spill"       : pesan ditulis ke file spill di disk dan dimasukkan kembali ke antrean
+                        worker-nya (sesuai `key_fn`) saat antrean kosong, jadi tetap tidak diproses
+                        bersamaan dengan pesan lain alat yang sama (tetapi setelah pesan yang lebih baru).
+    """
+
+    POLICIES = ("block", "drop_oldest", "spill")
+    _STOP = object()
+    _LEN = struct.Struct("<I")
+
+    def __init__(self, process_fn, workers=4, max_queue=10000, overflow_policy="block",
+                 put_timeout=5.0, spill_path="ingest_spill.bin", key_fn=None):
+        if overflow_policy not in self.POLICIES:
+            raise ValueError(f"Overflow policy tidak dikenal: '{overflow_policy}' (pilihan: {', '.join(self.POLICIES)}).")
+        self.process_fn = process_fn
+        self.workers = max(1, workers)
+        self.overflow_policy = overflow_policy
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path
+        self.key_fn = key_fn
+
+        self.dropped = 0
+        self.spilled = 0
+        if key_fn is not None and self.workers > 1:
+            # Satu antrean per worker; kapasitas total tetap `max_queue`
+            per_worker = max(1, max_queue // self.workers)
+            self._queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        else:
+            self._queues = [queue.Queue(maxsize=max_queue)]
+        self._spill_lock = threading.Lock()
+        self._dropped_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            q = self._queues[i % len(self._queues)]
+            t = threading.Thread(target=self._worker, args=(q,), name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        routing = "per alat" if len(self._queues) > 1 else "antrean bersama"
+        logging.info(f"⚙️ Ingest pipeline aktif: {self.workers} worker ({routing}), antrean maks "
+                     f"{sum(q.maxsize for q in self._queues)}, policy '{self.overflow_policy}'.")
+
+    def qsize(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def _queue_for(self, payload):
+        if len(self._queues) == 1:
+            return self._queues[0]
+        try:
+            key = self.key_fn(payload)
+        except Exception:
+            key = b""
+        return self._queues[zlib.crc32(key) % len(self._queues)]
+
+    def submit(self, payload):
+        """Memasukkan payload mentah ke antrean sesuai overflow policy. Mengembalikan False jika pesan dibuang."""
+        target = self._queue_for(payload)
+        if self.overflow_policy == "block":
+            try:
+                target.put(payload, timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                self._count_drop("ingest_queue_full")
+                logging.error("❌ Antrean ingest penuh. Pesan MQTT dibuang.")
+                return False
+
+        try:
+            target.put_nowait(payload)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow_policy == "drop_oldest":
+            while True:
+                try:
+                    target.get_nowait()
+                    target.task_done()
+                    self._count_drop("ingest_drop_oldest")
+                except queue.Empty:
+                    pass
+                try:
+                    target.put_nowait(payload)
+                    return True
+                except queue.Full:
+                    continue
+
+        self._spill(payload)
+        return True
+
+    def _count_drop(self, reason):
+        with self._dropped_lock:
+            self.dropped += 1
+        metrics.MESSAGES_DROPPED.inc(reason=reason)
+
+    def stop(self, drain=True, timeout=30.0):
+        """Menghentikan worker. Jika `drain`, semua pesan di antrean (dan file spill) diproses terlebih dahulu."""
+        if drain and self._threads:
+            logging.info(f"⏳ Memproses sisa {self.qsize()} pesan di antrean ingest...")
+            # Pesan dari spill masuk lagi ke antrean worker, jadi ulangi sampai spill habis
+            while True:
+                for q in self._queues:
+                    q.join()
+                if not self._drain_spill(blocking=True):
+                    break
+        for i in range(len(self._threads)):
+            self._queues[i % len(self._queues)].put(self._STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        if self.dropped or self.spilled:
+            logging.warning(f"⚠️ Ingest pipeline berhenti. Dibuang: {self.dropped}, di-spill ke disk: {self.spilled}.")
+
+    def _worker(self, q):
+        while True:
+            try:
+                payload = q.get(timeout=1.0)
+            except queue.Empty:
+                self._drain_spill()
+                continue
+            if payload is self._STOP:
+                q.task_done()
+                return
+            try:
+                self.process_fn(payload)
+            except Exception as e:
+                logging.error(f"⚠️ Error di worker ingest: {e}", exc_info=True)
+            finally:
+                q.task_done()
+
+    # --- Spill ke disk ---
+
+    def _spill(self, payload):
+        with self._spill_lock:
+            with open(self.spill_path, "ab") as f:
+                f.write(self._LEN.pack(len(payload)))
+                f.write(payload)
+            self.spilled += 1
+
+    def _drain_spill(self, blocking=False):
+        """
+        Memasukkan kembali pesan dari file spill ke antrean worker masing-masing (hanya satu
+        thread dalam satu waktu). Jika antrean tujuan penuh, sisanya tetap di file .draining dan
+        dilanjutkan pada pemanggilan berikutnya. Mengembalikan jumlah pesan yang dimasukkan.
+        """
+        draining_path = self.spill_path + ".draining"
+        if not self._drain_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            with self._spill_lock:
+                # File .draining yang tersisa (misal setelah crash atau antrean penuh) diproses lebih dulu
+                if not os.path.exists(draining_path):
+                    if not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+                        return 0
+                    os.replace(self.spill_path, draining_path)
+
+            count = 0
+            with open(draining_path, "rb") as f:
+                while True:
+                    offset = f.tell()
+                    header = f.read(self._LEN.size)
+                    if len(header) < self._LEN.size:
+                        break
+                    (length,) = self._LEN.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        logging.warning("⚠️ Record terakhir di file spill terpotong, diabaikan.")
+                        break
+                    # Tidak menunggu: pemanggilnya bisa jadi worker pemilik antrean tujuan
+                    try:
+                        self._queue_for(payload).put_nowait(payload)
+                    except queue.Full:
+                        f.seek(offset)
+                        self._keep_remaining(f, draining_path)
+                        logging.info(f"♻️ {count} pesan dari file spill dimasukkan ulang, sisanya menunggu antrean kosong.")
+                        return count
+                    count += 1
+            os.remove(draining_path)
+            if count:
+                logging.info(f"♻️ {count} pesan dari file spill dimasukkan ulang ke antrean ingest.")
+            return count
+        finally:
+            self._drain_lock.release()
+
+    @staticmethod
+    def _keep_remaining(f, draining_path):
+        """Menulis sisa file .draining (mulai posisi `f`) ke file baru lalu menggantinya secara atomik."""
+        tmp = draining_path + ".tmp"
+        with open(tmp, "wb") as out:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                out.write(chunk)
+        os.replace(tmp, draining_path)
@@ -1,6 +1,9 @@
 # main.py
 import logging
+import signal
+import sys
 import config
+import metrics
 from influx_handler import InfluxDBHandler
 from mqtt_handler import MQTTHandler
 
@@ -12,6 +15,20 @@ def run_service():
         logging.critical("Program berhenti karena konfigurasi tidak lengkap.")
         return
 
+    # Endpoint metrik Prometheus (opsional)
+    if config.METRICS_PORT:
+        try:
+            metrics.start_http_server(config.METRICS_PORT, config.METRICS_ADDR)
+        except OSError as e:
+            logging.error(f"❌ Gagal membuka endpoint metrik di port {config.METRICS_PORT}: {e}")
+    metrics.WORKER_INFO.set(1, worker=config.INGEST_WORKER_ID or "0", client_id=config.MQTT_CLIENT_ID_LOGGER)
+    metrics.DEVICE_LAST_SEEN.max_series = config.METRICS_MAX_DEVICES
+
+    # Mode asyncio: satu event loop untuk MQTT dan InfluxDB (lihat async_ingest.py)
+    if config.INGEST_MODE == "asyncio":
+        run_async_service()
+        return
+
     # 2. Inisialisasi handler InfluxDB
     try:
         influx_db = InfluxDBHandler()
@@ -19,12 +36,150 @@ def run_service():
         logging.critical("Gagal menginisialisasi InfluxDB Handler. Program berhenti.")
         return
 
+    rollup = start_rollup(influx_db)
+    predictor = start_predictor(influx_db)
+    detector = start_detector(influx_db, predictor)
+    listeners = [l.on_reading for l in (rollup, predictor, detector) if l is not None]
+
     # 3. Inisialisasi handler MQTT dan berikan handler InfluxDB
     # Ini disebut Dependency Injection, sebuah praktik yang sangat baik.
-    mqtt_service = MQTTHandler(influx_handler=influx_db)
+    mqtt_service = MQTTHandler(influx_handler=influx_db, listeners=listeners)
+    if detector is not None:
+        detector.publish = mqtt_service.publish
     
+    # SIGTERM (systemctl stop/restart) menghentikan loop MQTT seperti Ctrl+C, sehingga blok
+    # finally tetap menulis sisa antrean, pembacaan yang ditahan reorder, dan bucket rollup
+    def handle_sigterm(signum, frame):
+        logging.info("Sinyal SIGTERM diterima, menghentikan service...")
+        mqtt_service.request_stop()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
     # 4. Jalankan service MQTT
-    mqtt_service.start()
+    try:
+        mqtt_service.start()
+    except KeyboardInterrupt:
+        logging.info("Service dihentikan oleh pengguna.")
+    finally:
+        # Proses sisa pesan di antrean ingest, lalu pastikan antrean batch tertulis sebelum keluar
+        mqtt_service.stop()
+        if rollup is not None:
+            rollup.stop()
+        if predictor is not None:
+            predictor.stop()
+        influx_db.close()
+
+
+def start_rollup(writer):
+    """Rollup 5 menit di jalur ingest (ROLLUP_MODE=ingest), ditulis lewat `writer.write_line`."""
+    if config.ROLLUP_MODE not in ("ingest", "task", "off"):
+        raise ValueError(f"ROLLUP_MODE tidak dikenal: '{config.ROLLUP_MODE}' (pilihan: ingest, task, off).")
+    if not config.ROLLUP_INGEST:
+        return None
+    from rollup import RollupAggregator, TASK_NAME, find_active_task
+    try:
+        from influxdb_client import InfluxDBClient
+        with InfluxDBClient(url=config.INFLUX_URL, token=config.INFLUX_TOKEN, org=config.INFLUX_ORG, timeout=10_000) as client:
+            task = find_active_task(client)
+    except Exception as e:
+        logging.warning(f"⚠️ Tidak bisa memeriksa task rollup di server ({e}), rollup ingest tetap dijalankan.")
+        task = None
+    if task is not None:
+        # Task Flux sudah menulis bucket yang sama; rollup ingest akan menghitungnya dua kali
+        logging.error(f"❌ Task Flux '{TASK_NAME}' aktif di server, rollup ingest tidak dijalankan. "
+                      f"Set ROLLUP_MODE=task, atau hapus task dengan: python rollup.py --delete-task")
+        return None
+    rollup = RollupAggregator(
+        writer.write_line,
+        grace=config.ROLLUP_GRACE,
+        lateness=config.ROLLUP_LATENESS,
+        flush_interval=config.ROLLUP_FLUSH_INTERVAL,
+        worker=config.INGEST_WORKER_ID or None,
+    )
+    rollup.start()
+    return rollup
+
+
+def start_predictor(writer):
+    """
+    Prediksi online (opsional): bundle model dimuat sekali di sini, versi baru di-hot-reload.
+    `writer` adalah objek dengan `write_line` (InfluxDBHandler atau AsyncIngestService).
+    """
+    if not config.ONLINE_PREDICTION:
+        return None
+    try:
+        from model_registry import get_registry
+        from online_predictor import OnlinePredictor
+        predictor = OnlinePredictor(
+            influx_handler=writer,
+            registry=get_registry(config.PREDICT_MODEL_DIR),
+            backend=config.PREDICT_BACKEND,
+            measurement=config.PREDICTION_MEASUREMENT,
+            batch_interval=config.PREDICT_BATCH_INTERVAL,
+            reload_interval=config.PREDICT_RELOAD_INTERVAL,
+        )
+        predictor.start()
+        return predictor
+    except Exception as e:
+        logging.error(f"❌ Gagal mengaktifkan prediksi online, logger tetap berjalan tanpa prediksi: {e}")
+        return None
+
+
+def start_detector(writer, predictor=None):
+    """
+    Deteksi anomali streaming (opsional). Kejadian ditulis lewat `writer.write_line`; jika prediksi
+    online aktif, residual terhadap prediksi terbaru ikut diperiksa.
+    """
+    if not config.ANOMALY_DETECTION:
+        return None
+    from anomaly_detector import AnomalyDetector
+    detector = AnomalyDetector(
+        writer.write_line,
+        publish=getattr(writer, "publish", None),
+        measurement=config.ANOMALY_MEASUREMENT,
+        alert_topic=config.MQTT_TOPIC_ALERT,
+        threshold=config.ANOMALY_THRESHOLD_PPM,
+        z_limit=config.ANOMALY_Z,
+        alpha=config.ANOMALY_EWMA_ALPHA,
+        warmup=config.ANOMALY_WARMUP,
+        roc_limit=config.ANOMALY_ROC_PPM_PER_MIN,
+        residual_limit=config.ANOMALY_RESIDUAL_PPM if predictor is not None else 0,
+        cooldown=config.ANOMALY_COOLDOWN,
+    )
+    if predictor is not None:
+        predictor.forecast_listeners.append(detector.on_forecast)
+    logging.info(f"✅ Deteksi anomali aktif (measurement '{config.ANOMALY_MEASUREMENT}', topik '{config.MQTT_TOPIC_ALERT}').")
+    return detector
+
+
+def run_async_service():
+    """Menjalankan ingest asyncio hingga dihentikan, lalu menulis sisa antrean."""
+    from async_ingest import AsyncIngestService
+
+    service = AsyncIngestService()
+    rollup = start_rollup(service)
+    if rollup is not None:
+        service.listeners.append(rollup.on_reading)
+        service.on_drain.append(rollup.stop)
+    predictor = start_predictor(service)
+    if predictor is not None:
+        service.listeners.append(predictor.on_reading)
+    detector = start_detector(service, predictor)
+    if detector is not None:
+        service.listeners.append(detector.on_reading)
+    failed = False
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass  # Sisa antrean sudah ditulis di dalam event loop sebelum keluar
+    except RuntimeError as e:
+        logging.critical(f"🔥 Ingest asyncio gagal: {e}")
+        failed = True
+    finally:
+        if predictor is not None:
+            predictor.stop()
+    if failed:
+        # Kode keluar bukan nol agar systemd / ingest_launcher.py menjalankan ulang service
+        sys.exit(1)
 
 
 if __name__ == "__main__":
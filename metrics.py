@@ -0,0 +1,231 @@
+# metrics.py
+"""
+Metrik service logger dalam format teks Prometheus, diekspos lewat HTTP lokal (/metrics).
+
+Implementasi sengaja minimal (tanpa dependency tambahan): Counter, Gauge, dan
+Histogram dengan label opsional, semuanya thread-safe dan murah dipanggil di hot path.
+"""
+import bisect
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Nilai label untuk seri di atas batas `max_series` (misal id_alat dari payload yang tidak terbatas)
+OVERFLOW_LABEL = "other"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Metrik '{self.name}' membutuhkan label {self.labelnames}, diberikan {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {} if labelnames else {(): 0.0}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels) if labels or self.labelnames else ()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    Gauge dengan label opsional. Jika `max_series` > 0, label baru setelah batas tersebut
+    digabung ke satu seri berlabel OVERFLOW_LABEL, sehingga label dari data luar (misal
+    id_alat di payload) tidak bisa membuat seri tanpa batas.
+    """
+    TYPE = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), max_series=0):
+        super().__init__(name, documentation, labelnames)
+        self.max_series = max_series
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if self.max_series and key not in self._values and len(self._values) >= self.max_series:
+                key = (OVERFLOW_LABEL,) * len(self.labelnames)
+            self._values[key] = value
+
+    def set_function(self, fn, **labels):
+        """Nilai gauge dibaca dari `fn()` saat /metrics di-scrape (misal kedalaman antrean)."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                items.append((key, fn()))
+            except Exception as e:
+                logging.debug("Gagal membaca gauge %s: %s", self.name, e)
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [counts per bucket..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels) if labels or self.labelnames else ()
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[idx] += 1
+            state[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames=labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), max_series=0):
+        return self._register(Gauge, name, documentation, labelnames=labelnames, max_series=max_series)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames=labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Metrik service logger ---
+MESSAGES_RECEIVED = REGISTRY.counter("nultra_messages_received_total", "Jumlah pesan MQTT yang diterima.")
+MESSAGES_INVALID = REGISTRY.counter("nultra_messages_invalid_total", "Jumlah pesan MQTT yang tidak valid (bukan JSON / field wajib hilang).")
+READINGS_DECODED = REGISTRY.counter("nultra_readings_decoded_total", "Jumlah pembacaan hasil decode payload MQTT.", ("format",))
+MESSAGES_DROPPED = REGISTRY.counter("nultra_messages_dropped_total", "Jumlah pesan yang dibuang.", ("reason",))
+POINTS_WRITTEN = REGISTRY.counter("nultra_points_written_total", "Jumlah data point yang berhasil ditulis ke InfluxDB.")
+POINTS_FAILED = REGISTRY.counter("nultra_points_failed_total", "Jumlah data point yang gagal ditulis ke InfluxDB.")
+POINTS_SPOOLED = REGISTRY.counter("nultra_points_spooled_total", "Jumlah data point yang disimpan ke spool disk.")
+POINTS_REPLAYED = REGISTRY.counter("nultra_points_replayed_total", "Jumlah data point dari spool yang berhasil ditulis ulang.")
+DECODE_SECONDS = REGISTRY.histogram("nultra_decode_seconds", "Waktu decode + validasi satu payload MQTT.",
+                                    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01))
+WRITE_LATENCY = REGISTRY.histogram("nultra_write_latency_seconds", "Latensi satu request tulis ke InfluxDB.", ("mode",))
+BATCH_SIZE = REGISTRY.histogram("nultra_batch_size", "Jumlah data point per batch tulis.",
+                                buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+QUEUE_DEPTH = REGISTRY.gauge("nultra_queue_depth", "Jumlah item di antrean.", ("queue",))
+SPOOL_BYTES = REGISTRY.gauge("nultra_spool_bytes", "Ukuran total segmen spool di disk.")
+DUPLICATES_DROPPED = REGISTRY.counter("nultra_duplicates_dropped_total", "Jumlah pembacaan duplikat (id_alat + timestamp sama) yang tidak ditulis.")
+POINTS_REORDERED = REGISTRY.counter("nultra_points_reordered_total", "Jumlah pembacaan yang tiba tidak berurutan dan diurutkan kembali oleh reorder buffer.")
+POINTS_LATE = REGISTRY.counter("nultra_points_late_total", "Jumlah pembacaan yang tiba setelah pembacaan lebih baru diteruskan (di luar toleransi reorder).")
+ROLLUP_POINTS = REGISTRY.counter("nultra_rollup_points_total", "Jumlah titik rollup 5 menit yang ditulis (termasuk tulis ulang).")
+ROLLUP_LATE = REGISTRY.counter("nultra_rollup_late_total", "Jumlah pembacaan yang terlalu terlambat untuk rollup dan diabaikan.")
+WORKER_INFO = REGISTRY.gauge("nultra_worker_info", "Identitas proses ingest (selalu 1); worker diisi ingest_launcher.py.", ("worker", "client_id"))
+ANOMALIES_DETECTED = REGISTRY.counter("nultra_anomalies_total", "Jumlah kejadian anomali gas_ppm yang terdeteksi di jalur ingest.", ("jenis",))
+# id_alat berasal dari payload: jumlah seri dibatasi (lihat config.METRICS_MAX_DEVICES), sisanya berlabel "other"
+DEVICE_LAST_SEEN = REGISTRY.gauge("nultra_device_last_seen_timestamp_seconds", "Waktu (epoch) pesan terakhir per alat.", ("id_alat",),
+                                  max_series=1000)
+
+
+def start_http_server(port, addr="127.0.0.1", registry=REGISTRY):
+    """Menjalankan endpoint /metrics di thread latar belakang. Mengembalikan objek server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"📊 Endpoint metrik tersedia di http://{addr}:{server.server_address[1]}/metrics")
+    return server
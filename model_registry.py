@@ -0,0 +1,255 @@
+# model_registry.py
+"""
+Registry artefak model berversi.
+
+Satu bundle = satu direktori berisi model (.keras, .tflite, bobot .npz), scaler,
+model_config.json, dan manifest.json. Manifest mencatat versi, n_steps, daftar fitur,
+parameter scaler, serta checksum SHA-256 setiap file. Manifest ditulis terakhir
+sehingga kehadirannya menandakan bundle sudah lengkap.
+
+    models/_global/<versi>/manifest.json     bundle global (train_model.py biasa)
+    models/_global/LATEST                    versi global yang aktif
+    models/<id_alat>/<versi>/manifest.json   bundle per alat (train_model.py --per-device)
+    models/<id_alat>/LATEST                  versi per alat yang aktif
+    ./manifest.json                          bundle global tata letak lama (dipakai jika
+                                             models/_global/LATEST belum ada)
+
+Training selalu menulis ke direktori versi baru dan LATEST baru diganti (atomik) setelah
+manifest selesai ditulis, jadi pembaca tidak pernah melihat bundle setengah jadi.
+
+Import berat (TensorFlow) hanya dilakukan saat backend benar-benar dipakai; scaler
+dibangun langsung dari parameter di manifest (tanpa sklearn/joblib).
+`get_registry()` mengembalikan satu instance per proses yang menyimpan bundle yang sudah
+dimuat, dan `HotReloader` memuat versi baru di thread latar lalu menukarnya secara atomik.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from scaling import AffineScaler
+
+MANIFEST_FILENAME = "manifest.json"
+LATEST_FILENAME = "LATEST"
+# Nama direktori versi model global di bawah models/
+GLOBAL_DIRNAME = "_global"
+# Artefak yang dipakai tiap backend inferensi (lihat inference_engine.BACKENDS)
+BACKEND_ARTIFACTS = {"keras": "model", "tflite": "tflite", "numpy": "numpy_weights"}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def device_dir(models_dir, id_alat=None):
+    """Direktori yang berisi versi-versi model untuk `id_alat` (None = model global) dan file LATEST."""
+    if id_alat is None:
+        return os.path.join(models_dir, GLOBAL_DIRNAME)
+    return os.path.join(models_dir, str(id_alat).replace(os.sep, "_"))
+
+
+def read_latest(directory):
+    """Versi aktif di `directory` (isi file LATEST)."""
+    with open(os.path.join(directory, LATEST_FILENAME), "r") as f:
+        return f.read().strip()
+
+
+def write_latest(directory, version):
+    """Mengganti versi aktif secara atomik; dipanggil setelah manifest versi tersebut ditulis."""
+    tmp = os.path.join(directory, LATEST_FILENAME + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(directory, LATEST_FILENAME))
+
+
+def write_manifest(paths, model_config, scaler, version=None):
+    """
+    Menulis manifest.json di direktori artefak `paths` (lihat train_model.artifact_paths).
+    Dipanggil setelah semua artefak lain selesai ditulis.
+    """
+    directory = os.path.dirname(paths["config"]) or "."
+    files = {}
+    for role, path in paths.items():
+        if os.path.exists(path):
+            files[role] = {"path": os.path.basename(path), "sha256": file_sha256(path)}
+    manifest = {
+        "version": version or model_config.get("version") or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()),
+        "id_alat": model_config.get("id_alat"),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "n_steps": model_config["n_steps"],
+        "features": model_config["features"],
+        "target": "gas_ppm",
+        "trained_until": model_config.get("trained_until"),
+        # x_scaled = x * scale + min (lihat scaling.AffineScaler)
+        "scaler": AffineScaler.from_minmax(scaler).to_dict(),
+        "files": files,
+    }
+    path = os.path.join(directory, MANIFEST_FILENAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp, path)
+    return manifest
+
+
+class ModelBundle:
+    """Satu versi model yang sudah diverifikasi; backend dimuat lazily lalu disimpan."""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.id_alat = manifest.get("id_alat")
+        self.n_steps = manifest["n_steps"]
+        self.features = manifest["features"]
+        self.target_idx = self.features.index(manifest.get("target", "gas_ppm"))
+        self.scaler = AffineScaler.from_dict(manifest["scaler"])
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory, verify=True):
+        with open(os.path.join(directory, MANIFEST_FILENAME), "r") as f:
+            manifest = json.load(f)
+        bundle = cls(directory, manifest)
+        if verify:
+            bundle.verify()
+        return bundle
+
+    def path(self, role):
+        try:
+            return os.path.join(self.directory, self.manifest["files"][role]["path"])
+        except KeyError:
+            raise FileNotFoundError(f"Artefak '{role}' tidak ada di bundle {self.directory} (versi {self.version}).")
+
+    def verify(self):
+        """Memastikan checksum semua file sama dengan manifest (bundle tidak setengah tertulis/rusak)."""
+        for role, entry in self.manifest["files"].items():
+            path = os.path.join(self.directory, entry["path"])
+            if file_sha256(path) != entry["sha256"]:
+                raise ValueError(f"Checksum '{entry['path']}' di {self.directory} tidak cocok dengan manifest.")
+
+    def backend(self, kind="keras"):
+        """Backend inferensi untuk bundle ini (dimuat sekali per jenis)."""
+        backend = self._backends.get(kind)
+        if backend is None:
+            with self._lock:
+                backend = self._backends.get(kind)
+                if backend is None:
+                    from inference_engine import BACKENDS, load_backend
+                    if kind not in BACKENDS:
+                        raise ValueError(f"Backend inferensi tidak dikenal: '{kind}' (pilihan: {', '.join(BACKENDS)}).")
+                    backend = self._backends[kind] = load_backend(kind, self.path(BACKEND_ARTIFACTS[kind]))
+        return backend
+
+    def warm_up(self, kind="keras"):
+        """Memuat backend dan menjalankan satu prediksi dummy agar permintaan pertama tidak membayar biaya load/trace."""
+        import numpy as np
+        self.backend(kind).predict(np.zeros((1, self.n_steps, len(self.features)), dtype=np.float32))
+        return self
+
+
+class ModelRegistry:
+    def __init__(self, root=".", models_dir="models"):
+        self.root = root
+        self.models_dir = os.path.join(root, models_dir)
+        self._bundles = {}
+        self._lock = threading.Lock()
+
+    def bundle_dir(self, id_alat=None):
+        """Direktori bundle aktif: versi LATEST milik `id_alat` (None = model global)."""
+        directory = device_dir(self.models_dir, id_alat)
+        if id_alat is None and not os.path.exists(os.path.join(directory, LATEST_FILENAME)):
+            return self.root  # Tata letak lama: bundle global langsung di root
+        return os.path.join(directory, read_latest(directory))
+
+    def current_version(self, id_alat=None):
+        """Versi aktif tanpa memuat model (murah, dipakai untuk polling hot reload)."""
+        with open(os.path.join(self.bundle_dir(id_alat), MANIFEST_FILENAME), "r") as f:
+            return json.load(f)["version"]
+
+    def load(self, id_alat=None):
+        """Bundle aktif untuk `id_alat` (None = global). Bundle yang sama dipakai bersama dalam satu proses."""
+        directory = self.bundle_dir(id_alat)
+        version = self.current_version(id_alat)
+        key = (os.path.abspath(directory), version)
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            with self._lock:
+                bundle = self._bundles.get(key)
+                if bundle is None:
+                    bundle = ModelBundle.open(directory)
+                    if bundle.version != version:
+                        raise ValueError(f"Bundle {directory} berubah saat dimuat, coba lagi.")
+                    # Versi lama untuk direktori yang sama tidak dipakai lagi
+                    for old in [k for k in self._bundles if k[0] == key[0]]:
+                        del self._bundles[old]
+                    self._bundles[key] = bundle
+                    logging.info(f"📦 Bundle model '{directory}' versi {version} dimuat.")
+        return bundle
+
+
+@lru_cache(maxsize=None)
+def get_registry(root=".", models_dir="models"):
+    """Registry bersama untuk satu proses."""
+    return ModelRegistry(root, models_dir)
+
+
+class HotReloader:
+    """
+    Memegang bundle aktif dan memeriksa versi baru secara berkala di thread latar.
+    Versi baru dimuat, diverifikasi, dan di-warm-up sebelum ditukar, sehingga
+    pemanggil `current` tidak pernah menunggu proses load.
+    """
+
+    def __init__(self, registry, id_alat=None, kind="keras", interval=60.0, on_swap=None):
+        self.registry = registry
+        self.id_alat = id_alat
+        self.kind = kind
+        self.interval = interval
+        self.on_swap = on_swap
+        self.current = registry.load(id_alat).warm_up(kind)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Menukar ke versi baru jika ada. Mengembalikan True jika bundle berganti."""
+        try:
+            version = self.registry.current_version(self.id_alat)
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            logging.warning(f"⚠️ Gagal membaca versi model: {e}")
+            return False
+        if version == self.current.version:
+            return False
+        try:
+            bundle = self.registry.load(self.id_alat).warm_up(self.kind)
+        except Exception as e:
+            # Bundle baru mungkin masih ditulis; versi lama tetap dipakai dan dicoba lagi nanti
+            logging.warning(f"⚠️ Versi model {version} belum bisa dimuat, tetap memakai {self.current.version}: {e}")
+            return False
+        if self.on_swap is not None:
+            self.on_swap(bundle)
+        old, self.current = self.current, bundle
+        logging.info(f"🔄 Model ditukar dari versi {old.version} ke {bundle.version}.")
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
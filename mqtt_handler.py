@@ -4,21 +4,99 @@
 
 import paho.mqtt.client as mqtt
 import logging
-import json
 import os
 import socket
+import time
 import config  # pastikan file config.py berisi info broker lokal, port, dan topik
+import metrics
+import payload_codec
+from ingest_filter import IngestFilter
+from ingest_pipeline import IngestPipeline
+
+# Nilai config.MQTT_PROTOCOL -> konstanta protokol paho
+PROTOCOLS = {"3.1.1": mqtt.MQTTv311, "5": mqtt.MQTTv5}
+
+
+def decode_readings(raw_payload):
+    """
+    Decode dan validasi satu payload MQTT (dipakai mode thread maupun asyncio).
+    Payload JSON berisi satu pembacaan, payload biner berisi satu atau lebih.
+    Mengembalikan list dict pembacaan, kosong jika payload tidak valid.
+    """
+    decode_start = time.perf_counter()
+    binary = payload_codec.is_binary(raw_payload)
+    try:
+        readings = payload_codec.decode_readings(raw_payload)
+    except ValueError as e:
+        # json.JSONDecodeError, payload non-object, dan payload biner rusak sama-sama turunan ValueError
+        metrics.MESSAGES_INVALID.inc()
+        if binary:
+            logging.error(f"❌ Payload biner tidak valid ({len(raw_payload)} byte): {e}")
+        else:
+            logging.error(f"❌ Payload bukan JSON valid: {raw_payload.decode('utf-8', errors='ignore')}")
+        return []
+
+    if not binary:
+        data = readings[0]
+        logging.debug("📦 Payload JSON: %s", data)
+        if 'gas_ppm' not in data or 'timestamp' not in data:
+            metrics.MESSAGES_INVALID.inc()
+            logging.warning("⚠️ Data tidak valid. Payload: %r", raw_payload)
+            return []
+    else:
+        logging.debug("📦 Payload biner: %d pembacaan", len(readings))
+    metrics.DECODE_SECONDS.observe(time.perf_counter() - decode_start)
+    metrics.READINGS_DECODED.inc(len(readings), format="binary" if binary else "json")
+    metrics.DEVICE_LAST_SEEN.set(time.time(), id_alat=readings[-1].get("id_alat", payload_codec.DEFAULT_ID_ALAT))
+    return readings
+
+
+def make_filter():
+    """IngestFilter sesuai config, atau None jika dedup dan reorder sama-sama nonaktif."""
+    if config.DEDUP_WINDOW <= 0 and config.REORDER_TOLERANCE <= 0:
+        return None
+    return IngestFilter(
+        dedup_window=max(0.0, config.DEDUP_WINDOW),
+        dedup_max=config.DEDUP_MAX_PER_DEVICE,
+        tolerance=max(0.0, config.REORDER_TOLERANCE),
+    )
+
 
 class MQTTHandler:
-    def __init__(self, influx_handler):
+    def __init__(self, influx_handler, ingest_workers=None, listeners=None):
         self.influx_handler = influx_handler
+        # Konsumen tambahan (misal prediksi online) yang menerima setiap pembacaan valid
+        self.listeners = list(listeners or [])
+
+        # Pipeline ingest: callback paho hanya mengantrekan payload, worker yang memproses
+        workers = config.INGEST_WORKERS if ingest_workers is None else ingest_workers
+        self.pipeline = None
+        if workers > 0:
+            self.pipeline = IngestPipeline(
+                process_fn=self.process_payload,
+                workers=workers,
+                max_queue=config.INGEST_QUEUE_MAXSIZE,
+                overflow_policy=config.INGEST_OVERFLOW_POLICY,
+                put_timeout=config.INGEST_PUT_TIMEOUT,
+                spill_path=config.INGEST_SPILL_PATH,
+                # Satu alat selalu ke worker yang sama agar pembacaannya tetap berurutan
+                key_fn=payload_codec.device_key,
+            )
+            metrics.QUEUE_DEPTH.set_function(self.pipeline.qsize, queue="ingest")
+
+        # Dedup kirim ulang dan pengurutan ulang per alat sebelum ditulis
+        self.filter = make_filter()
+        self._stop_requested = False
 
         # Koneksi MQTT ke broker lokal tanpa WebSocket
+        if config.MQTT_PROTOCOL not in PROTOCOLS:
+            raise ValueError(f"MQTT_PROTOCOL tidak dikenal: '{config.MQTT_PROTOCOL}' (pilihan: {', '.join(PROTOCOLS)}).")
+        self.protocol = PROTOCOLS[config.MQTT_PROTOCOL]
         self.client = mqtt.Client(
             client_id=config.MQTT_CLIENT_ID_LOGGER,
-            protocol=mqtt.MQTTv311  # MQTT versi standar untuk koneksi lokal
+            protocol=self.protocol
         )
-        logging.info("MQTT Client diinisialisasi dengan koneksi TCP biasa.")
+        logging.info(f"MQTT Client '{config.MQTT_CLIENT_ID_LOGGER}' diinisialisasi dengan koneksi TCP biasa (MQTT {config.MQTT_PROTOCOL}).")
 
         # Jika kamu tetap pakai username/password
         mqtt_user = os.getenv("MQTT_USER")
@@ -34,35 +112,69 @@ class MQTTHandler:
         self.client.on_message = self._on_message
         self.client.on_disconnect = self._on_disconnect
 
-    def _on_connect(self, client, userdata, flags, rc):
-        conn_str = mqtt.connack_string(rc)
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        # MQTTv5 memberi ReasonCodes (+ properties), MQTTv3.1.1 memberi kode int
+        conn_str = str(rc) if self.protocol == mqtt.MQTTv5 else mqtt.connack_string(rc)
         if rc == 0:
             logging.info(f"✅ Berhasil terhubung ke MQTT Broker! ({conn_str})")
-            client.subscribe(config.MQTT_TOPIC_DATA)
-            logging.info(f"📡 Berhasil subscribe ke topik: {config.MQTT_TOPIC_DATA}")
+            client.subscribe(config.MQTT_SUBSCRIBE_TOPIC)
+            logging.info(f"📡 Berhasil subscribe ke topik: {config.MQTT_SUBSCRIBE_TOPIC}")
         else:
             logging.error(f"❌ Gagal konek MQTT. Kode: {rc}, Pesan: {conn_str}")
 
     def _on_message(self, client, userdata, msg):
-        logging.info(f"📨 Pesan diterima dari topik: {msg.topic}")
+        metrics.MESSAGES_RECEIVED.inc()
+        logging.debug("📨 Pesan diterima dari topik: %s", msg.topic)
+        if self.pipeline is not None:
+            self.pipeline.submit(msg.payload)
+        else:
+            self.process_payload(msg.payload)
+
+    def process_payload(self, raw_payload):
+        """Decode, validasi, dan tulis satu payload MQTT ke InfluxDB."""
         try:
-            payload = msg.payload.decode('utf-8')
-            data = json.loads(payload)
-            logging.debug(f"📦 Payload JSON: {data}")
+            readings = decode_readings(raw_payload)
+        except Exception as e:
+            logging.error(f"⚠️ Error saat proses pesan MQTT: {e}", exc_info=True)
+            return
+        for data in readings:
+            if self.filter is None:
+                self._emit(data)
+                continue
+            # Pembacaan yang dilepas reorder buffer diteruskan satu per satu di bawah lock alat
+            # (urutan per alat terjaga), dan kegagalan satu pembacaan tidak menghilangkan sisanya
+            try:
+                self.filter.push(data, sink=self._emit)
+            except Exception as e:
+                logging.error(f"⚠️ Error saat dedup/reorder pembacaan: {e}", exc_info=True)
 
-            if 'gas_ppm' not in data or 'timestamp' not in data:
-                logging.warning(f"⚠️ Data tidak valid. Payload: {payload}")
-                return
+    def _emit(self, data):
+        """
+        Menulis satu pembacaan (sudah lolos dedup/reorder) dan meneruskannya ke listener hanya jika
+        write_data berhasil (tertulis, masuk antrean batch, atau tersimpan di spool).
+        """
+        try:
+            written = self.influx_handler.write_data(data)
+        except Exception as e:
+            logging.error(f"⚠️ Error saat menulis pembacaan: {e}", exc_info=True)
+            return
+        if not written:
+            return
+        logging.debug("✅ Data berhasil dikirim ke InfluxDB.")
 
-            self.influx_handler.write_data(data)
-            logging.info("✅ Data berhasil dikirim ke InfluxDB.")
+        for listener in self.listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logging.error(f"⚠️ Error di listener pembacaan: {e}", exc_info=True)
 
-        except json.JSONDecodeError:
-            logging.error(f"❌ Payload bukan JSON valid: {msg.payload.decode('utf-8', errors='ignore')}")
-        except Exception as e:
-            logging.error(f"⚠️ Error saat proses pesan MQTT: {e}", exc_info=True)
+    def publish(self, topic, payload):
+        """Mempublikasikan pesan (misal alert anomali); aman dipanggil dari thread mana pun."""
+        info = self.client.publish(topic, payload, qos=config.MQTT_ALERT_QOS)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            logging.warning(f"⚠️ Gagal mempublikasikan pesan ke '{topic}': {mqtt.error_string(info.rc)}")
 
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_disconnect(self, client, userdata, rc, properties=None):
         if rc != 0:
             logging.warning(f"🔌 Koneksi MQTT terputus secara tak terduga: {rc}")
         else:
@@ -70,12 +182,18 @@ class MQTTHandler:
 
     def start(self):
         try:
+            if self.pipeline is not None:
+                self.pipeline.start()
+            if self.filter is not None:
+                self.filter.start(self._emit)
             logging.info(f"🚀 Menghubungkan ke MQTT broker {config.MQTT_BROKER}:{config.MQTT_PORT}...")
             self.client.connect(
                 host=config.MQTT_BROKER,
                 port=config.MQTT_PORT,
                 keepalive=60
             )
+            if self._stop_requested:
+                return
             self.client.loop_forever()
 
         except socket.gaierror:
@@ -86,3 +204,16 @@ class MQTTHandler:
             logging.critical(f"🔥 Timeout koneksi ke broker MQTT.")
         except Exception as e:
             logging.critical(f"🔥 Error fatal saat koneksi MQTT: {e}", exc_info=True)
+
+    def request_stop(self):
+        """Membuat `start` (loop_forever) kembali; dipanggil dari handler sinyal (SIGTERM)."""
+        self._stop_requested = True
+        self.client.disconnect()
+
+    def stop(self):
+        """Memutus koneksi MQTT lalu memproses sisa pesan di antrean ingest."""
+        self.client.disconnect()
+        if self.pipeline is not None:
+            self.pipeline.stop(drain=True)
+        if self.filter is not None:
+            self.filter.stop(self._emit)
@@ -0,0 +1,162 @@
+# online_predictor.py
+"""
+Prediksi gas_ppm secara online, langsung dari jalur ingest MQTT.
+
+Setiap pembacaan yang valid diberikan ke `OnlinePredictor.on_reading`. Per `id_alat`
+pembacaan diakumulasi menjadi rata-rata bucket 5 menit (sama seperti resample di
+training). Saat bucket baru dimulai, bucket sebelumnya (nilai mentah + fitur waktu)
+dimasukkan ke ring buffer `n_steps` baris; jika buffer sudah penuh, window-nya diskalakan
+dengan scaler bundle aktif lalu diserahkan ke InferenceEngine yang memprediksi window
+semua alat dalam satu batch per tick. Karena ring buffer tidak diskalakan, window setelah
+hot reload langsung memakai scaler versi baru.
+Hasilnya (prediksi untuk bucket berikutnya) ditulis ke measurement terpisah.
+Bundle model diambil dari model_registry dan ditukar otomatis (hot reload) saat
+train_model.py menerbitkan versi baru, tanpa restart.
+"""
+import logging
+import threading
+import numpy as np
+import payload_codec
+from feature_pipeline import RAW_FEATURES, TIME_FEATURES, calendar_row
+from inference_engine import InferenceEngine
+from model_registry import HotReloader
+
+BUCKET_NS = 5 * 60 * 1_000_000_000
+
+
+class _DeviceState:
+    __slots__ = ("bucket", "sums", "count", "ring", "head", "filled", "last_bucket", "last_raw")
+
+    def __init__(self, n_steps, n_features):
+        self.bucket = None                  # awal bucket yang sedang diakumulasi (ns)
+        self.sums = np.zeros(len(RAW_FEATURES))
+        self.count = 0
+        self.ring = np.zeros((n_steps, n_features))  # baris fitur belum diskalakan
+        self.head = 0                       # posisi tulis berikutnya di ring buffer
+        self.filled = 0
+        self.last_bucket = None             # bucket terakhir yang masuk ring buffer
+        self.last_raw = None                # rata-rata mentah bucket tersebut (untuk interpolasi)
+
+    def window(self):
+        """Isi ring buffer dalam urutan waktu (terlama -> terbaru)."""
+        return np.concatenate((self.ring[self.head:], self.ring[:self.head]))
+
+
+class OnlinePredictor:
+    def __init__(self, influx_handler, registry, backend="keras", measurement="prediksi_gas", batch_interval=1.0, reload_interval=60.0):
+        self.influx_handler = influx_handler
+        self.measurement = measurement
+        self._devices = {}
+        self._lock = threading.Lock()
+        self.late_readings = 0
+        # Dipanggil dengan (id_alat, awal_bucket_ns, prediksi_ppm) setiap prediksi baru (misal detektor anomali)
+        self.forecast_listeners = []
+
+        # Bundle awal dimuat (dan di-warm-up) sekali di sini; versi berikutnya dimuat di thread reloader
+        self.reloader = HotReloader(registry, kind=backend, interval=reload_interval, on_swap=self._apply_bundle)
+        self.engine = InferenceEngine(None, on_result=self._write_forecast, interval=batch_interval)
+        self._apply_bundle(self.reloader.current)
+        logging.info(f"✅ Prediksi online aktif (backend={backend}, n_steps={self.n_steps}, measurement '{measurement}').")
+
+    def _apply_bundle(self, bundle):
+        """Memasang bundle model (saat startup maupun hot reload)."""
+        with self._lock:
+            if getattr(self, "features", None) != bundle.features or getattr(self, "n_steps", None) != bundle.n_steps:
+                # Bentuk window berubah: ring buffer lama tidak bisa dipakai model baru
+                self._devices = {}
+            # Window yang menunggu sudah diskalakan untuk model lama; ring buffer (mentah) tetap dipakai
+            self.engine.clear()
+            self.n_steps = bundle.n_steps
+            self.features = bundle.features
+            self.target_idx = bundle.target_idx
+            self.scaler = bundle.scaler
+            self._raw_idx = [self.features.index(name) for name in RAW_FEATURES]
+            self._time_idx = [self.features.index(name) for name in TIME_FEATURES]
+            self.engine.backend = bundle.backend(self.reloader.kind)
+
+    def start(self):
+        self.engine.start()
+        self.reloader.start()
+
+    def stop(self):
+        """Menghentikan mesin inferensi setelah memprediksi window yang masih menunggu."""
+        self.reloader.stop()
+        self.engine.stop()
+
+    def on_reading(self, data):
+        """Dipanggil oleh worker ingest untuk setiap pembacaan yang valid."""
+        ts = payload_codec.timestamp_ns(data.get("timestamp"))
+        id_alat = data.get("id_alat", payload_codec.DEFAULT_ID_ALAT)
+        bucket = ts - ts % BUCKET_NS
+        values = [float(data.get(name, 0.0)) for name in RAW_FEATURES]
+
+        ready = None
+        with self._lock:
+            state = self._devices.get(id_alat)
+            if state is None:
+                state = self._devices[id_alat] = _DeviceState(self.n_steps, len(self.features))
+            if state.bucket is None:
+                state.bucket = bucket
+            elif bucket < state.bucket:
+                # Pembacaan terlambat untuk bucket yang sudah ditutup diabaikan
+                self.late_readings += 1
+                return
+            elif bucket > state.bucket:
+                ready = self._close_bucket(state)
+                state.bucket = bucket
+            state.sums += values
+            state.count += 1
+
+        if ready is not None:
+            closed_bucket, window, scaler = ready
+            # Scaler ikut di context agar inverse memakai scaler yang sama dengan window-nya
+            self.engine.submit(id_alat, window, (closed_bucket, scaler))
+
+    def _close_bucket(self, state):
+        """
+        Memasukkan rata-rata bucket yang selesai ke ring buffer.
+        Mengembalikan (bucket, window terskala, scaler) jika siap diprediksi.
+        """
+        raw = state.sums / state.count
+        closed = state.bucket
+        # Bucket kosong di antara keduanya diisi interpolasi linear (setara interpolate(method='time'))
+        if state.last_bucket is not None:
+            gap = (closed - state.last_bucket) // BUCKET_NS
+            # Hanya n_steps bucket terakhir yang tersisa di ring buffer, sisanya tidak perlu dihitung
+            for step in range(max(1, gap - self.n_steps), gap):
+                frac = step / gap
+                self._push(state, state.last_bucket + step * BUCKET_NS, state.last_raw + (raw - state.last_raw) * frac)
+        self._push(state, closed, raw)
+        state.last_bucket, state.last_raw = closed, raw
+        state.sums = np.zeros(len(RAW_FEATURES))
+        state.count = 0
+        if state.filled < self.n_steps:
+            return None
+        return closed, self.scaler.transform(state.window()), self.scaler
+
+    def _push(self, state, bucket, raw):
+        row = np.empty(len(self.features))
+        row[self._raw_idx] = raw
+        row[self._time_idx] = calendar_row(bucket)
+        state.ring[state.head] = row
+        state.head = (state.head + 1) % self.n_steps
+        state.filled = min(state.filled + 1, self.n_steps)
+
+    def _write_forecast(self, id_alat, pred_scaled, context):
+        closed_bucket, scaler = context
+        # Inverse scaling hanya untuk kolom target
+        pred = float(scaler.inverse_column(pred_scaled, self.target_idx))
+        if not np.isfinite(pred):
+            logging.warning(f"⚠️ Prediksi id_alat '{id_alat}' tidak valid (NaN/Inf), tidak ditulis.")
+            return
+        forecast_ts = closed_bucket + BUCKET_NS
+        line = b"%s,id_alat=%s gas_ppm_prediksi=%s %d" % (
+            self.measurement.encode("utf-8"),
+            payload_codec.escape_tag(id_alat).encode("utf-8"),
+            repr(pred).encode("ascii"),
+            forecast_ts,
+        )
+        self.influx_handler.write_line(line)
+        for listener in self.forecast_listeners:
+            listener(id_alat, forecast_ts, pred)
+        logging.debug("🔮 Prediksi gas_ppm id_alat '%s' untuk bucket %d: %.2f", id_alat, forecast_ts, pred)
@@ -0,0 +1,163 @@
+# payload_codec.py
+import json
+import math
+import re
+import struct
+from datetime import datetime, timezone
+from functools import lru_cache
+from dateutil import parser  # Fallback untuk format timestamp yang tidak standar
+
+MEASUREMENT = "pengukuran_udara"
+DEFAULT_ID_ALAT = "ALAT_01"
+# Urutan field sama dengan Point (terurut alfabetis) agar line protocol identik
+FIELDS = ("gas_ppm", "kelembaban", "suhu", "tekanan")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ESCAPE_TAG = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\n": "\\n"})
+_MEASUREMENT_PREFIX = MEASUREMENT.encode("utf-8") + b",id_alat="
+
+# Payload biner (lihat Nultra_esp32.ino, PAYLOAD_BINARY=1), semua little-endian:
+#   header : magic "NQ", versi (u8), jumlah pembacaan N (u8), panjang id_alat (u8), id_alat UTF-8
+#   record : N x (timestamp epoch detik UTC u32, lalu float32 per field dengan urutan FIELDS)
+# id_alat kosong berarti DEFAULT_ID_ALAT. 20 byte per pembacaan, dibanding ~130 byte JSON.
+BINARY_MAGIC = b"NQ"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<2sBBB")
+BINARY_RECORD = struct.Struct("<I" + "f" * len(FIELDS))
+
+
+def is_binary(raw):
+    """True jika payload berformat biner (JSON selalu diawali '{' atau spasi)."""
+    return raw[:2] == BINARY_MAGIC
+
+
+def decode_payload(raw):
+    """Decode payload JSON dari ESP32 (bytes atau str) menjadi dict."""
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("Payload JSON harus berupa object.")
+    return data
+
+
+def decode_binary(raw):
+    """
+    Decode payload biner menjadi (id_alat, iterator tuple (timestamp, *FIELDS)).
+    Record dibaca langsung dari memoryview payload tanpa menyalin buffer.
+    """
+    view = memoryview(raw)
+    if len(view) < BINARY_HEADER.size:
+        raise ValueError("Payload biner terlalu pendek.")
+    magic, version, count, id_len = BINARY_HEADER.unpack_from(view)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Magic payload biner tidak dikenal.")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Versi payload biner tidak didukung: {version}")
+    start = BINARY_HEADER.size + id_len
+    if count == 0 or len(view) != start + count * BINARY_RECORD.size:
+        raise ValueError(f"Panjang payload biner tidak sesuai ({len(view)} byte untuk {count} pembacaan).")
+    id_alat = str(view[BINARY_HEADER.size:start], "utf-8") or DEFAULT_ID_ALAT
+    return id_alat, BINARY_RECORD.iter_unpack(view[start:])
+
+
+def device_id(data):
+    """id_alat pembacaan; kosong atau tidak ada berarti DEFAULT_ID_ALAT (tag kosong tidak valid di line protocol)."""
+    id_alat = data.get("id_alat")
+    return DEFAULT_ID_ALAT if id_alat is None or id_alat == "" else id_alat
+
+
+def decode_readings(raw):
+    """Decode payload JSON (satu pembacaan) atau biner (N pembacaan) menjadi list dict."""
+    if not is_binary(raw):
+        data = decode_payload(raw)
+        if data.get("id_alat") == "":
+            # Sama seperti payload biner: listener (rollup, prediksi, anomali) melihat id yang sama dengan yang ditulis
+            data["id_alat"] = DEFAULT_ID_ALAT
+        return [data]
+    id_alat, records = decode_binary(raw)
+    return [dict(zip(FIELDS, record[1:]), timestamp=record[0], id_alat=id_alat) for record in records]
+
+
+_ID_ALAT_JSON = re.compile(rb'"id_alat"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_DEFAULT_KEY = DEFAULT_ID_ALAT.encode("utf-8")
+
+
+def device_key(raw):
+    """
+    id_alat mentah (bytes) dari payload tanpa decode penuh, untuk membagi payload ke worker
+    (IngestPipeline key_fn). Hanya perlu konsisten per alat, bukan id_alat yang sudah di-unescape.
+    """
+    if is_binary(raw):
+        id_len = raw[BINARY_HEADER.size - 1]
+        return bytes(raw[BINARY_HEADER.size:BINARY_HEADER.size + id_len]) or _DEFAULT_KEY
+    match = _ID_ALAT_JSON.search(raw)
+    return match.group(1) if match else _DEFAULT_KEY
+
+
+def encode_binary(readings, id_alat=None):
+    """
+    Kebalikan decode_binary: list dict pembacaan (timestamp epoch detik) menjadi payload biner.
+    Dipakai simulator/benchmark; di alat payload dibangun oleh firmware.
+    """
+    if not 0 < len(readings) <= 255:
+        raise ValueError("Payload biner berisi 1 sampai 255 pembacaan.")
+    name = b"" if id_alat is None else str(id_alat).encode("utf-8")
+    out = bytearray(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(readings), len(name)))
+    out += name
+    for data in readings:
+        out += BINARY_RECORD.pack(int(data["timestamp"]), *(float(data.get(f, "nan")) for f in FIELDS))
+    return bytes(out)
+
+
+def _parse_timestamp_str(raw):
+    # Tanpa cache: timestamp alat hampir selalu unik, jadi cache tidak pernah kena dan hanya menambah biaya
+    try:
+        dt = datetime.fromisoformat(raw)
+    except ValueError:
+        dt = parser.parse(raw)
+    # Timestamp tanpa zona waktu dianggap waktu lokal mesin (sama seperti dateutil + astimezone)
+    dt = dt.astimezone(timezone.utc)
+    return (dt - _EPOCH) // datetime.resolution * 1000
+
+
+def timestamp_ns(raw):
+    """Mengubah timestamp ISO-8601 (string) atau epoch detik (angka) menjadi epoch nanodetik."""
+    if raw is None:
+        raise ValueError("Field 'timestamp' tidak ditemukan dalam data.")
+    if isinstance(raw, str):
+        return _parse_timestamp_str(raw)
+    return int(raw) * 1_000_000_000
+
+
+@lru_cache(maxsize=1024)
+def _tag_prefix(id_alat):
+    return _MEASUREMENT_PREFIX + str(id_alat).translate(_ESCAPE_TAG).encode("utf-8") + b" "
+
+
+def escape_tag(value):
+    """Escape nilai tag line protocol (koma, sama dengan, spasi)."""
+    return str(value).translate(_ESCAPE_TAG)
+
+
+def _format_float(value):
+    s = repr(value)
+    return s[:-2] if s.endswith(".0") else s
+
+
+def encode_line(data):
+    """
+    Mengubah dict payload ESP32 langsung menjadi satu baris line protocol (bytes),
+    setara dengan Point("pengukuran_udara").tag("id_alat", ...).field(...).time(...).
+    """
+    ts = timestamp_ns(data.get("timestamp"))
+    fields = []
+    for name in FIELDS:
+        value = float(data.get(name, 0.0))
+        if math.isfinite(value):
+            fields.append(f"{name}={_format_float(value)}")
+    if not fields:
+        raise ValueError("Tidak ada field numerik yang valid dalam data.")
+    return b"".join((
+        _tag_prefix(device_id(data)),
+        ",".join(fields).encode("ascii"),
+        b" %d" % ts,
+    ))
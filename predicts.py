@@ -1,13 +1,15 @@
 import pandas as pd
 import numpy as np
 from influxdb_client import InfluxDBClient
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import load_model
-import joblib
 import os
 from dotenv import load_dotenv
 import logging
-import json
+import windowing
+import decimate
+import model_registry
+import feature_pipeline
+from feature_store import FeatureStore, parse_range
+from influx_stream import InfluxStreamReader
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
@@ -16,15 +18,30 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 load_dotenv()
 
 # --- 2. Path Artefak dan Konfigurasi ---
-MODEL_PATH = 'model_prediksi_gas.h5' # Ganti ke .keras jika Anda sudah mengubahnya
-SCALER_PATH = 'scaler.pkl'
-CONFIG_PATH = 'model_config.json'
+# Bundle model dari model_registry: MODEL_DIR adalah direktori kerja train_model.py.
+# ID_ALAT = None memakai model global (models/_global/LATEST); isi dengan id_alat untuk model per alat (models/<id_alat>/LATEST).
+MODEL_DIR = '.'
+ID_ALAT = None
+BACKEND = 'keras'  # "keras", "tflite", atau "numpy" (tanpa TensorFlow)
 OUTPUT_PLOT_PATH = 'prediction_vs_actual.png'
+# Jumlah titik maksimum per deret di plot (LTTB, lihat decimate.py); rentang panjang tetap cepat digambar
+PLOT_MAX_POINTS = 3000
+DATA_RANGE = '-30d'
+# Direktori cache fitur 5 menit (dipakai bersama train_model.py). Kosongkan untuk selalu query penuh.
+FEATURE_CACHE_DIR = 'feature_cache'
+# Query InfluxDB dipecah per potongan waktu dan diambil paralel agar memori puncak tetap terbatas
+FETCH_CHUNK = '1d'
+FETCH_WORKERS = 4
+# Sumber data: 'raw' (default) membaca seluruh pembacaan mentah lalu merata-ratakannya di sini,
+# 'rollup' membaca rollup 5 menit yang dibuat ingest/task Flux (lihat rollup.py) dan jauh lebih
+# ringan. Measurement rollup hanya berisi data sejak rollup berjalan, jadi sebelum beralih ke
+# 'rollup' isi data historis sekali:  python rollup.py --backfill <DATA_RANGE, misal 30d>
+DATA_SOURCE = 'raw'
 
 # --- 3. Fungsi-fungsi Helper (Sama seperti di training) ---
 
-def fetch_data():
-    """Mengambil data dari InfluxDB."""
+def fetch_data(id_alat=None):
+    """Mengambil data dari InfluxDB secara streaming per potongan waktu (rata-rata 5 menit, float32)."""
     INFLUX_URL = os.getenv("INFLUX_URL")
     INFLUX_TOKEN = os.getenv("INFLUX_TOKEN")
     INFLUX_ORG = os.getenv("INFLUX_ORG")
@@ -32,119 +49,122 @@ def fetch_data():
     
     logging.info("Menghubungkan ke InfluxDB untuk mengambil data...")
     client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
-    query_api = client.query_api()
-    query = f'''
-    from(bucket: "{INFLUX_BUCKET}")
-      |> range(start: -30d)
-      |> filter(fn: (r) => r["_measurement"] == "pengukuran_udara")
-      |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
-      |> drop(columns: ["_start", "_stop", "id_alat", "_measurement"])
-    '''
+    reader = InfluxStreamReader(client.query_api(), INFLUX_BUCKET, source=DATA_SOURCE, chunk=FETCH_CHUNK, workers=FETCH_WORKERS)
     try:
-        df = query_api.query_dframe(query=query)
-        logging.info(f"Total {len(df)} data point berhasil diambil.")
+        df = reader.read_frame(pd.Timestamp.now(tz='UTC') - parse_range(DATA_RANGE), id_alat=id_alat)
+        logging.info(f"Total {len(df)} bucket 5 menit berhasil diambil.")
         return df
     except Exception as e:
         logging.error(f"Gagal mengambil data dari InfluxDB: {e}")
         return pd.DataFrame()
+    finally:
+        client.close()
 
 def preprocess_data(df):
     """Melakukan pra-pemrosesan pada DataFrame."""
     if df.empty: return None
     logging.info("Melakukan pra-pemrosesan data...")
-    df.set_index('_time', inplace=True)
-    df.index = pd.to_datetime(df.index)
-    
-    numeric_cols = ['suhu', 'kelembaban', 'tekanan', 'gas_ppm']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    df = df.resample('5T').mean()
-    df.interpolate(method='time', inplace=True)
-    df.dropna(inplace=True)
-
-    df['jam_sin'] = np.sin(2 * np.pi * df.index.hour/24.0)
-    df['jam_cos'] = np.cos(2 * np.pi * df.index.hour/24.0)
-    df['hari_minggu_sin'] = np.sin(2 * np.pi * df.index.dayofweek/7.0)
-    df['hari_minggu_cos'] = np.cos(2 * np.pi * df.index.dayofweek/7.0)
-    
-    return df
+    # Data sudah berupa rata-rata 5 menit; bucket kosong diinterpolasi dan fitur waktu
+    # siklikal ditambahkan dalam satu array float32 (lihat feature_pipeline.py)
+    return feature_pipeline.prepare_frame(df)
+
+def load_features(id_alat=None):
+    """Memuat frame 5 menit siap pakai dari cache fitur lokal (delta diambil dari InfluxDB)."""
+    client = InfluxDBClient(url=os.getenv("INFLUX_URL"), token=os.getenv("INFLUX_TOKEN"), org=os.getenv("INFLUX_ORG"))
+    store = FeatureStore(client.query_api(), os.getenv("INFLUX_BUCKET"), cache_dir=FEATURE_CACHE_DIR,
+                         source=DATA_SOURCE, chunk=FETCH_CHUNK, workers=FETCH_WORKERS)
+    try:
+        return store.load(DATA_RANGE, id_alat)
+    except Exception as e:
+        logging.error(f"Gagal memuat data dari cache fitur: {e}")
+        return None
+    finally:
+        client.close()
 
 def create_sequences(data, n_steps):
-    """Membuat sekuens HANYA untuk input (X)."""
-    X = []
-    for i in range(len(data) - n_steps):
-        X.append(data[i:(i + n_steps), :])
-    return np.array(X)
+    """Membuat sekuens HANYA untuk input (X), sebagai view tanpa salinan (lihat windowing.py)."""
+    return windowing.create_sequences(data, n_steps)
 
 # --- 4. Fungsi Utama Prediksi & Visualisasi ---
 
-def predict_and_plot():
+def predict_frame(bundle, model, df_processed):
+    """
+    Prediksi gas_ppm untuk setiap window pada frame fitur 5 menit.
+    Mengembalikan (timestamps, aktual, prediksi) dalam skala PPM asli, atau None jika data kurang.
+    """
+    n_steps = bundle.n_steps
+    scaler = bundle.scaler
+    # Pastikan urutan kolom sama persis seperti saat training
+    df_ordered = df_processed[bundle.features]
+
+    # Gunakan parameter scaler dari bundle (sama seperti saat training), langsung ke float32
+    scaled_data = scaler.transform(df_ordered.to_numpy())
+
+    # Buat sekuens dari seluruh data (view, hanya untuk mengecek jumlah window)
+    X_full = create_sequences(scaled_data, n_steps)
+    if len(X_full) == 0:
+        logging.error(f"Data tidak cukup ({len(scaled_data)} baris) untuk membuat sekuens {n_steps} langkah.")
+        return None
+
+    # --- Membuat Prediksi ---
+    # Window disalin per batch saja sehingga tensor 3-D penuh tidak dimaterialisasi
+    predictions_scaled = np.concatenate([model.predict(batch) for batch in windowing.iter_batches(scaled_data, n_steps, batch_size=256)])
+
+    # --- Mengembalikan Hasil ke Skala Asli (Inverse Transform) ---
+    # Inverse transform langsung pada kolom target 'gas_ppm' (tanpa matriks dummy N x fitur)
+    predictions_unscaled = scaler.inverse_column(predictions_scaled.ravel(), bundle.target_idx)
+
+    # Prediksi dimulai dari indeks ke-n_steps
+    actual_values = df_ordered['gas_ppm'].to_numpy()[n_steps:]
+    timestamps = df_ordered.index[n_steps:]
+    return timestamps, actual_values, predictions_unscaled
+
+def predict_and_plot(show=True):
     """Fungsi utama untuk memuat model, membuat prediksi, dan memvisualisasikan hasilnya."""
     
     # --- Memuat Artefak ---
     try:
-        logging.info(f"Memuat model dari {MODEL_PATH}...")
-        model = load_model(MODEL_PATH)
-        
-        logging.info(f"Memuat scaler dari {SCALER_PATH}...")
-        scaler = joblib.load(SCALER_PATH)
-        
-        logging.info(f"Memuat konfigurasi dari {CONFIG_PATH}...")
-        with open(CONFIG_PATH, 'r') as f:
-            config = json.load(f)
-        n_steps = config['n_steps']
-        features = config['features']
+        logging.info(f"Memuat bundle model dari {MODEL_DIR}...")
+        bundle = model_registry.get_registry(MODEL_DIR).load(ID_ALAT)
+        model = bundle.backend(BACKEND)
     except FileNotFoundError as e:
         logging.critical(f"Error: File artefak tidak ditemukan - {e}. Pastikan Anda sudah menjalankan skrip training.")
         return
+    except ValueError as e:
+        # Manifest/checksum bundle tidak cocok, atau BACKEND tidak dikenal
+        logging.critical(f"Error: Bundle model tidak valid - {e}.")
+        return
 
     # --- Ambil dan Proses Data ---
-    df_raw = fetch_data()
-    df_processed = preprocess_data(df_raw)
+    if FEATURE_CACHE_DIR:
+        df_processed = load_features(ID_ALAT)
+    else:
+        df_raw = fetch_data(ID_ALAT)
+        df_processed = preprocess_data(df_raw)
     
     if df_processed is None or df_processed.empty:
         logging.error("Tidak ada data untuk diprediksi.")
         return
 
-    # --- Persiapan Data untuk Prediksi ---
-    # Pastikan urutan kolom sama persis seperti saat training
-    df_ordered = df_processed[features]
-    
-    # Gunakan scaler yang SUDAH di-fit untuk mentransformasi data
-    scaled_data = scaler.transform(df_ordered)
-    
-    # Buat sekuens dari seluruh data
-    X_full = create_sequences(scaled_data, n_steps)
-    
-    # --- Membuat Prediksi ---
-    logging.info("Membuat prediksi dengan model...")
-    predictions_scaled = model.predict(X_full)
-    
-    # --- Mengembalikan Hasil ke Skala Asli (Inverse Transform) ---
-    logging.info("Mengembalikan hasil prediksi ke skala PPM asli...")
-    # Buat array dummy untuk inverse transform, karena scaler dilatih pada banyak fitur
-    dummy_array = np.zeros((len(predictions_scaled), len(features)))
-    # Masukkan prediksi ke kolom yang sesuai (kolom target 'gas_ppm')
-    target_idx = features.index('gas_ppm')
-    dummy_array[:, target_idx] = predictions_scaled.ravel()
-    
-    # Lakukan inverse transform
-    predictions_unscaled = scaler.inverse_transform(dummy_array)[:, target_idx]
-    
-    # --- Menyiapkan Data untuk Plot ---
-    # Kita perlu data aktual untuk dibandingkan. Kita ambil dari DataFrame asli.
-    # Prediksi dimulai dari indeks ke-n_steps
-    actual_values = df_ordered['gas_ppm'].values[n_steps:]
-    timestamps = df_ordered.index[n_steps:]
+    logging.info(f"Membuat prediksi dengan model versi {bundle.version} (backend {BACKEND})...")
+    result = predict_frame(bundle, model, df_processed)
+    if result is None:
+        return
+    timestamps, actual_values, predictions_unscaled = result
     
     # --- Membuat dan Menyimpan Plot ---
+    # Setiap deret di-decimate (LTTB) ke PLOT_MAX_POINTS titik: bentuk kurva tetap, jumlah titik tidak
+    # lagi sebanding dengan panjang rentang. Untuk laporan banyak alat tanpa layar, gunakan report.py.
     logging.info(f"Membuat plot perbandingan dan menyimpannya ke {OUTPUT_PLOT_PATH}...")
+    x = feature_pipeline.index_ns(timestamps)
+    times = timestamps.tz_convert(None).to_numpy()
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(15, 7))
     
-    ax.plot(timestamps, actual_values, label='Data Aktual (PPM)', color='darkorange', marker='.', linestyle='-')
-    ax.plot(timestamps, predictions_unscaled, label='Prediksi Model (PPM)', color='dodgerblue', linestyle='--')
+    idx = decimate.lttb(x, actual_values, PLOT_MAX_POINTS)
+    ax.plot(times[idx], actual_values[idx], label='Data Aktual (PPM)', color='darkorange', linestyle='-')
+    idx = decimate.lttb(x, predictions_unscaled, PLOT_MAX_POINTS)
+    ax.plot(times[idx], predictions_unscaled[idx], label='Prediksi Model (PPM)', color='dodgerblue', linestyle='--')
     
     ax.set_title('Perbandingan Data Gas PPM Aktual vs Prediksi Model', fontsize=16)
     ax.set_xlabel('Waktu', fontsize=12)
@@ -159,7 +179,9 @@ def predict_and_plot():
     plt.tight_layout()
     plt.savefig(OUTPUT_PLOT_PATH)
     logging.info("Plot berhasil disimpan.")
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
 # --- 5. Titik Masuk Program ---
 if __name__ == "__main__":
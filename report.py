@@ -0,0 +1,256 @@
+# report.py
+"""
+Laporan prediksi vs aktual untuk rentang panjang dan banyak alat, tanpa layar.
+
+- Gambar dirender dengan backend Agg (tanpa display), satu file PNG per alat.
+- Sebelum digambar, setiap deret di-decimate (LTTB atau min/max per piksel, lihat
+  decimate.py) sehingga biaya render tidak lagi sebanding dengan panjang rentang.
+- Galat harian (MAE/RMSE per hari) dihitung sekaligus dengan np.add.reduceat, tanpa loop
+  per hari, lalu ikut digambar dan disimpan ke CSV.
+- Prediksi berjalan berurutan di proses utama (model dimuat sekali per bundle),
+  sementara render gambar dikerjakan paralel di process pool begitu prediksi satu
+  alat selesai.
+
+Output di --out-dir:
+    <id_alat>.png       deret aktual vs prediksi + MAE/RMSE harian
+    galat_harian.csv    id_alat, tanggal, mae, rmse, n
+    ringkasan.csv       id_alat, versi model, jumlah titik, MAE, RMSE, rentang waktu
+
+Contoh:
+    python report.py --all --range -365d --out-dir laporan
+    python report.py --devices ALAT_01 ALAT_02 --method minmax
+"""
+import matplotlib
+matplotlib.use("Agg")  # Harus sebelum pyplot diimpor (predicts.py mengimpor pyplot)
+
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import decimate
+from inference_engine import BACKENDS
+
+DAY_NS = 86400 * 1_000_000_000
+HOUR_NS = 3600 * 1_000_000_000
+# Zona waktu tampilan dan batas hari: WIB (UTC+7), sama seperti jam NTP di Nultra_esp32.ino
+DEFAULT_UTC_OFFSET = 7
+GLOBAL_LABEL = "global"
+
+
+def daily_errors(times_ns, actual, predicted, utc_offset_hours=DEFAULT_UTC_OFFSET):
+    """
+    MAE dan RMSE per hari kalender (zona UTC+`utc_offset_hours`) untuk `times_ns` terurut,
+    tervektorisasi: batas hari dicari sekali, lalu jumlah per hari dengan np.add.reduceat.
+    Mengembalikan (awal_hari epoch ns, mae, rmse, jumlah_titik) sebagai array per hari.
+    """
+    error = np.asarray(predicted, dtype=np.float64) - np.asarray(actual, dtype=np.float64)
+    shift = utc_offset_hours * HOUR_NS
+    day = (np.asarray(times_ns, dtype=np.int64) + shift) // DAY_NS
+    if len(day) == 0:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), empty, empty, np.empty(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(day)) + 1))
+    counts = np.diff(np.append(starts, len(day)))
+    mae = np.add.reduceat(np.abs(error), starts) / counts
+    rmse = np.sqrt(np.add.reduceat(error * error, starts) / counts)
+    return day[starts] * DAY_NS - shift, mae, rmse, counts
+
+
+def _local_times(times_ns, utc_offset_hours):
+    # Waktu lokal naive (datetime64) agar sumbu x menampilkan jam WIB
+    return (np.asarray(times_ns, dtype=np.int64) + utc_offset_hours * HOUR_NS).astype("datetime64[ns]")
+
+
+def render_device(label, times_ns, actual, predicted, daily, path, max_points=3000, method="lttb",
+                  utc_offset_hours=DEFAULT_UTC_OFFSET, title_suffix=""):
+    """Menggambar satu alat ke `path` (dipanggil di proses worker). Mengembalikan (label, path, detik)."""
+    # Figure langsung (tanpa pyplot): tidak ada state global, aman di proses worker
+    from matplotlib.figure import Figure
+    import matplotlib.dates as mdates
+    import matplotlib.style
+
+    start = time.perf_counter()
+    times = _local_times(times_ns, utc_offset_hours)
+    idx_actual = decimate.decimate(times_ns, actual, max_points, method)
+    idx_pred = decimate.decimate(times_ns, predicted, max_points, method)
+    day_start, mae, rmse, _ = daily
+    days = _local_times(day_start, utc_offset_hours)
+
+    with matplotlib.style.context('seaborn-v0_8-whitegrid'):
+        fig = Figure(figsize=(15, 9))
+        ax, ax_err = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": (3, 1)})
+        ax.plot(times[idx_actual], actual[idx_actual], label='Data Aktual (PPM)', color='darkorange', linewidth=0.8)
+        ax.plot(times[idx_pred], predicted[idx_pred], label='Prediksi Model (PPM)', color='dodgerblue',
+                linestyle='--', linewidth=0.8)
+        ax.set_title(f'Gas PPM Aktual vs Prediksi — {label}{title_suffix}', fontsize=16)
+        ax.set_ylabel('Konsentrasi Gas (PPM)', fontsize=12)
+        ax.legend(fontsize=10, loc='upper left')
+
+        ax_err.step(days, mae, where='post', label='MAE harian', color='seagreen')
+        ax_err.step(days, rmse, where='post', label='RMSE harian', color='firebrick')
+        ax_err.set_ylabel('Galat (PPM)', fontsize=12)
+        ax_err.set_xlabel(f'Waktu (UTC{utc_offset_hours:+d})', fontsize=12)
+        ax_err.legend(fontsize=10, loc='upper left')
+
+        locator = mdates.AutoDateLocator()
+        ax_err.xaxis.set_major_locator(locator)
+        ax_err.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        fig.tight_layout()
+        fig.savefig(path, dpi=100)
+    return label, path, time.perf_counter() - start
+
+
+def _file_label(label):
+    return str(label).replace(os.sep, "_")
+
+
+def load_device(predicts, registry, id_alat, backend):
+    """Frame fitur dan prediksi satu alat. Mengembalikan (versi model, timestamps, aktual, prediksi) atau None."""
+    try:
+        bundle = registry.load(id_alat)
+    except FileNotFoundError:
+        if id_alat is None:
+            raise
+        # Belum ada model per alat: pakai model global
+        bundle = registry.load(None)
+
+    if predicts.FEATURE_CACHE_DIR:
+        frame = predicts.load_features(id_alat)
+    else:
+        frame = predicts.preprocess_data(predicts.fetch_data(id_alat))
+    if frame is None or frame.empty:
+        return None
+    result = predicts.predict_frame(bundle, bundle.backend(backend), frame)
+    if result is None:
+        return None
+    timestamps, actual, predicted = result
+    return bundle.version, timestamps, np.asarray(actual, dtype=np.float32), np.asarray(predicted, dtype=np.float32)
+
+
+def build_report(devices, out_dir, workers=None, max_points=3000, method="lttb", backend=None,
+                 utc_offset_hours=DEFAULT_UTC_OFFSET):
+    """Membuat laporan untuk `devices` (None di dalam daftar = model & data global). Mengembalikan jumlah gambar."""
+    import predicts
+    import model_registry
+    from feature_pipeline import index_ns
+
+    os.makedirs(out_dir, exist_ok=True)
+    registry = model_registry.get_registry(predicts.MODEL_DIR)
+    backend = backend or predicts.BACKEND
+    if backend not in BACKENDS:
+        logging.critical(f"Error: Backend inferensi tidak dikenal: '{backend}' (pilihan: {', '.join(BACKENDS)}).")
+        return 0
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    summary = []
+    daily_rows = []
+    start = time.perf_counter()
+    predict_seconds = 0.0
+
+    # "spawn": proses utama mungkin sudah memuat TensorFlow, yang tidak aman di-fork
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) if workers > 0 else None
+    futures = []
+    rendered = 0
+    try:
+        for id_alat in devices:
+            label = GLOBAL_LABEL if id_alat is None else id_alat
+            t0 = time.perf_counter()
+            try:
+                loaded = load_device(predicts, registry, id_alat, backend)
+            except FileNotFoundError as e:
+                logging.critical(f"Error: File artefak tidak ditemukan - {e}. Pastikan Anda sudah menjalankan skrip training.")
+                break
+            except ValueError as e:
+                # Manifest/checksum bundle tidak cocok: alat lain (bundle lain) tetap dibuatkan laporan
+                logging.critical(f"[{label}] Error: Bundle model tidak valid - {e}.")
+                continue
+            predict_seconds += time.perf_counter() - t0
+            if loaded is None:
+                logging.warning(f"[{label}] Tidak ada data yang cukup untuk diprediksi, dilewati.")
+                continue
+            version, timestamps, actual, predicted = loaded
+            times_ns = index_ns(timestamps)
+            daily = daily_errors(times_ns, actual, predicted, utc_offset_hours)
+
+            error = predicted.astype(np.float64) - actual
+            summary.append([label, version, len(actual), round(float(np.mean(np.abs(error))), 4),
+                            round(float(np.sqrt(np.mean(error * error))), 4),
+                            timestamps[0].isoformat(), timestamps[-1].isoformat()])
+            day_start, mae, rmse, counts = daily
+            day_labels = np.datetime_as_string(_local_times(day_start, utc_offset_hours), unit="D")
+            daily_rows.extend(zip([label] * len(day_labels), day_labels, mae.round(4), rmse.round(4), counts))
+
+            args = (label, times_ns, actual, predicted, daily, os.path.join(out_dir, f"{_file_label(label)}.png"),
+                    max_points, method, utc_offset_hours, f" (model {version})")
+            if pool is not None:
+                futures.append(pool.submit(render_device, *args))
+                continue
+            _, path, seconds = render_device(*args)
+            rendered += 1
+            logging.info(f"[{label}] 🖼️ {path} ({seconds:.2f} s)")
+    finally:
+        for future in futures:
+            try:
+                label, path, seconds = future.result()
+                rendered += 1
+                logging.info(f"[{label}] 🖼️ {path} ({seconds:.2f} s)")
+            except Exception as e:
+                logging.error(f"⚠️ Gagal merender gambar: {e}")
+        if pool is not None:
+            pool.shutdown()
+
+    with open(os.path.join(out_dir, "galat_harian.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id_alat", "tanggal", "mae", "rmse", "n"])
+        writer.writerows(daily_rows)
+    with open(os.path.join(out_dir, "ringkasan.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id_alat", "versi_model", "n", "mae", "rmse", "mulai", "selesai"])
+        writer.writerows(summary)
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"📊 Laporan {rendered} alat selesai dalam {elapsed:.1f} s "
+                 f"(data + prediksi {predict_seconds:.1f} s), tersimpan di '{out_dir}/'.")
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laporan prediksi vs aktual per alat (headless, backend Agg).")
+    parser.add_argument("--devices", nargs="*", help="id_alat yang dilaporkan (default: data & model global)")
+    parser.add_argument("--all", action="store_true", help="Laporkan semua id_alat yang punya data dalam rentang")
+    parser.add_argument("--range", help="Rentang data, misal -365d (default: DATA_RANGE di predicts.py)")
+    parser.add_argument("--out-dir", default="laporan", help="Direktori output")
+    parser.add_argument("--workers", type=int, default=None, help="Proses render paralel (default: jumlah core, 0 = tanpa pool)")
+    parser.add_argument("--max-points", type=int, default=3000, help="Titik maksimum per deret setelah decimation")
+    parser.add_argument("--method", choices=decimate.METHODS, default="lttb", help="Metode decimation")
+    parser.add_argument("--backend", choices=tuple(BACKENDS), help="Backend inferensi (default: BACKEND di predicts.py)")
+    parser.add_argument("--utc-offset", type=int, default=DEFAULT_UTC_OFFSET, help="Zona waktu tampilan & batas hari (jam)")
+    args = parser.parse_args()
+
+    import predicts
+    if args.range:
+        predicts.DATA_RANGE = args.range
+
+    devices = args.devices or [None]
+    if args.all:
+        import pandas as pd
+        from influxdb_client import InfluxDBClient
+        from feature_store import parse_range
+        from influx_stream import InfluxStreamReader
+
+        with InfluxDBClient(url=os.getenv("INFLUX_URL"), token=os.getenv("INFLUX_TOKEN"), org=os.getenv("INFLUX_ORG")) as client:
+            reader = InfluxStreamReader(client.query_api(), os.getenv("INFLUX_BUCKET"), source=predicts.DATA_SOURCE)
+            devices = reader.list_devices(pd.Timestamp.now(tz="UTC") - parse_range(predicts.DATA_RANGE))
+        if not devices:
+            logging.error("Tidak ada id_alat yang ditemukan dalam rentang data. Proses dihentikan.")
+            return 1
+    logging.info(f"Membuat laporan {len(devices)} alat untuk rentang {predicts.DATA_RANGE}...")
+    return 0 if build_report(devices, args.out_dir, args.workers, args.max_points, args.method,
+                             args.backend, args.utc_offset) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,287 @@
+# rollup.py
+"""
+Rollup 5 menit per `id_alat` untuk input model.
+
+Training dan prediksi membaca measurement rollup (satu baris per alat per 5 menit)
+alih-alih seluruh pembacaan mentah, sehingga jumlah baris yang ditransfer turun
+sekitar 5x (atau lebih, tergantung frekuensi kirim alat).
+
+Setiap titik rollup berisi rata-rata suhu, kelembaban, tekanan, gas_ppm pada awal
+bucket ditambah field `n` (jumlah pembacaan). Pembaca (influx_stream.py) menggabungkan
+beberapa titik untuk bucket yang sama dengan rata-rata berbobot `n`, sehingga rollup
+parsial dari beberapa worker ingest (tag `worker`) tetap menghasilkan rata-rata yang benar.
+
+Rollup dibuat dengan salah satu dari dua cara, dipilih lewat ROLLUP_MODE (keduanya
+tidak boleh aktif bersamaan karena bucket yang sama akan terhitung dua kali):
+
+- ROLLUP_MODE=ingest: `RollupAggregator` menerima setiap pembacaan valid dan
+  menulis bucket setelah lewat ROLLUP_GRACE detik. Pembacaan yang terlambat hingga
+  ROLLUP_LATENESS detik menulis ulang bucket dengan total terbaru. Bucket hanya ada di
+  memori, jadi setelah restart bucket yang dimulai sebelum proses berjalan tidak ditulis
+  (titik di server berisi rata-rata lengkap dari proses sebelumnya dan akan tertimpa rata-rata
+  parsial); bucket yang terlewat diisi dengan --backfill. Logger menolak menjalankan rollup
+  ingest jika task Flux rollup aktif di server.
+- ROLLUP_MODE=task: task Flux di server, dibuat dengan  python rollup.py --apply-task
+  (task menghitung ulang bucket satu jam terakhir setiap 5 menit). Perintah ini ditolak
+  jika ROLLUP_MODE bukan "task". Kembali ke mode ingest:  python rollup.py --delete-task
+- ROLLUP_MODE=off (default): tidak ada rollup.
+
+Measurement rollup hanya berisi data sejak rollup mulai berjalan. Sebelum training/prediksi
+memakai DATA_SOURCE = "rollup", isi data historis sekali untuk rentang DATA_RANGE:
+
+    python rollup.py --backfill 30d
+"""
+import argparse
+import logging
+import math
+import os
+import threading
+import time
+import metrics
+import payload_codec
+
+RAW_MEASUREMENT = payload_codec.MEASUREMENT
+ROLLUP_MEASUREMENT = "pengukuran_udara_5m"
+WEIGHT_FIELD = "n"
+TASK_NAME = "nultra-rollup-5m"
+BUCKET_NS = 5 * 60 * 1_000_000_000
+# Urutan field sama dengan payload_codec.FIELDS (terurut alfabetis)
+FIELDS = payload_codec.FIELDS
+
+
+class _Bucket:
+    __slots__ = ("sums", "counts", "n", "dirty")
+
+    def __init__(self):
+        self.sums = [0.0] * len(FIELDS)
+        self.counts = [0] * len(FIELDS)
+        self.n = 0
+        self.dirty = False
+
+
+class RollupAggregator:
+    """
+    Mengakumulasi pembacaan menjadi rata-rata 5 menit per alat dan menulisnya lewat
+    `write_line` (InfluxDBHandler.write_line atau AsyncIngestService.write_line).
+    """
+
+    def __init__(self, write_line, measurement=ROLLUP_MEASUREMENT, grace=60.0, lateness=3600.0,
+                 flush_interval=10.0, worker=None):
+        self.write_line = write_line
+        self.grace_ns = int(grace * 1_000_000_000)
+        self.lateness_ns = int(lateness * 1_000_000_000)
+        self.flush_interval = flush_interval
+        # Tag worker membedakan rollup parsial tiap proses ingest (lihat ingest_launcher.py)
+        self._prefix = measurement.encode("utf-8") + b",id_alat="
+        self._suffix = b",worker=" + payload_codec.escape_tag(worker).encode("utf-8") if worker else b""
+        self._buckets = {}  # (id_alat, awal_bucket_ns) -> _Bucket
+        # Bucket pertama yang dimulai setelah proses berjalan; bucket sebelumnya mungkin sudah
+        # ditulis lengkap oleh proses sebelum restart dan tidak boleh ditimpa rata-rata parsial
+        now = time.time_ns()
+        self.start_bucket_ns = now - now % BUCKET_NS + BUCKET_NS
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_reading(self, data):
+        """Listener ingest: dipanggil untuk setiap pembacaan yang valid."""
+        ts = payload_codec.timestamp_ns(data.get("timestamp"))
+        bucket_ns = ts - ts % BUCKET_NS
+        if bucket_ns + BUCKET_NS + self.lateness_ns < time.time_ns():
+            metrics.ROLLUP_LATE.inc()
+            return
+        key = (data.get("id_alat", payload_codec.DEFAULT_ID_ALAT), bucket_ns)
+        with self._lock:
+            if bucket_ns < self.start_bucket_ns:
+                self.skipped += 1
+                return
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            for i, name in enumerate(FIELDS):
+                value = data.get(name)
+                if value is None:
+                    continue
+                value = float(value)
+                if math.isfinite(value):
+                    bucket.sums[i] += value
+                    bucket.counts[i] += 1
+            bucket.n += 1
+            bucket.dirty = True
+
+    def _encode(self, id_alat, bucket_ns, bucket):
+        fields = [f"{name}={bucket.sums[i] / bucket.counts[i]!r}" for i, name in enumerate(FIELDS) if bucket.counts[i]]
+        fields.append(f"{WEIGHT_FIELD}={bucket.n}i")
+        return b"".join((
+            self._prefix, payload_codec.escape_tag(id_alat).encode("utf-8"), self._suffix, b" ",
+            ",".join(fields).encode("ascii"), b" %d" % bucket_ns,
+        ))
+
+    def flush(self, force=False):
+        """
+        Menulis bucket yang berubah dan sudah lewat masa tenggang (atau semua jika `force`),
+        lalu membuang bucket yang sudah melewati batas keterlambatan. Mengembalikan jumlah titik.
+        """
+        now = time.time_ns()
+        lines = []
+        with self._lock:
+            for key, bucket in list(self._buckets.items()):
+                end = key[1] + BUCKET_NS
+                if bucket.dirty and (force or end + self.grace_ns <= now):
+                    lines.append(self._encode(key[0], key[1], bucket))
+                    bucket.dirty = False
+                if not bucket.dirty and end + self.lateness_ns < now:
+                    del self._buckets[key]
+        for line in lines:
+            self.write_line(line)
+        metrics.ROLLUP_POINTS.inc(len(lines))
+        if lines:
+            logging.debug("📉 %d titik rollup 5 menit ditulis.", len(lines))
+        return len(lines)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rollup-flush", daemon=True)
+        self._thread.start()
+        logging.info(f"📉 Rollup 5 menit aktif mulai bucket {time.strftime('%H:%M', time.gmtime(self.start_bucket_ns // 1_000_000_000))} UTC "
+                     f"(tenggang {self.grace_ns / 1e9:.0f} detik, keterlambatan maks {self.lateness_ns / 1e9:.0f} detik).")
+
+    def stop(self):
+        """Menghentikan thread flush lalu menulis semua bucket yang belum tertulis."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+        self.flush(force=True)
+        if self.skipped:
+            logging.info(f"📉 {self.skipped} pembacaan untuk bucket sebelum startup tidak dimasukkan ke rollup (isi dengan --backfill).")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"⚠️ Gagal menulis rollup: {e}", exc_info=True)
+
+
+# --- Task Flux (alternatif rollup di server) ---
+
+def flux_rollup(bucket, start, stop, raw_measurement=RAW_MEASUREMENT, measurement=ROLLUP_MEASUREMENT):
+    """Script Flux yang menghitung rollup 5 menit untuk rentang [start, stop) dan menulisnya ke `bucket`."""
+    field_filter = " or ".join(f'r["_field"] == "{name}"' for name in FIELDS)
+    return f'''
+raw = from(bucket: "{bucket}")
+  |> range(start: {start}, stop: {stop})
+  |> filter(fn: (r) => r["_measurement"] == "{raw_measurement}")
+  |> filter(fn: (r) => {field_filter})
+means = raw
+  |> aggregateWindow(every: 5m, fn: mean, createEmpty: false, timeSrc: "_start")
+counts = raw
+  |> filter(fn: (r) => r["_field"] == "gas_ppm")
+  |> aggregateWindow(every: 5m, fn: count, createEmpty: false, timeSrc: "_start")
+  |> set(key: "_field", value: "{WEIGHT_FIELD}")
+union(tables: [means, counts])
+  |> set(key: "_measurement", value: "{measurement}")
+  |> to(bucket: "{bucket}")
+'''
+
+
+def flux_task(bucket, every="5m", lookback="1h"):
+    """Definisi task Flux: setiap `every`, hitung ulang bucket lengkap dalam `lookback` terakhir."""
+    return f'''import "date"
+
+option task = {{name: "{TASK_NAME}", every: {every}, offset: 30s}}
+
+stop = date.truncate(t: now(), unit: 5m)
+start = date.sub(d: {lookback}, from: stop)
+''' + flux_rollup(bucket, "start", "stop")
+
+
+def find_active_task(client):
+    """Task rollup yang aktif di server, atau None."""
+    for task in client.tasks_api().find_tasks(name=TASK_NAME):
+        if task.status == "active":
+            return task
+    return None
+
+
+def delete_task(client):
+    """Menghapus task rollup (sebelum kembali ke ROLLUP_MODE=ingest)."""
+    tasks_api = client.tasks_api()
+    tasks = tasks_api.find_tasks(name=TASK_NAME)
+    for task in tasks:
+        tasks_api.delete_task(task.id)
+        logging.info(f"🗑️ Task '{TASK_NAME}' (id {task.id}) dihapus.")
+    return len(tasks)
+
+
+def apply_task(client, org, bucket):
+    """Membuat task rollup di InfluxDB, atau memperbarui script-nya jika task sudah ada."""
+    tasks_api = client.tasks_api()
+    flux = flux_task(bucket)
+    existing = tasks_api.find_tasks(name=TASK_NAME)
+    if existing:
+        task = existing[0]
+        task.flux = flux
+        tasks_api.update_task(task)
+        logging.info(f"✅ Task '{TASK_NAME}' diperbarui.")
+        return task
+    from influxdb_client import TaskCreateRequest
+    task = tasks_api.create_task(task_create_request=TaskCreateRequest(
+        flux=flux, org=org, status="active", description="Rollup 5 menit untuk input model (rollup.py)"))
+    logging.info(f"✅ Task '{TASK_NAME}' dibuat (id {task.id}).")
+    return task
+
+
+def backfill(client, bucket, data_range, chunk="1d"):
+    """Mengisi rollup untuk data historis, per potongan waktu agar beban query server tetap kecil."""
+    import pandas as pd
+    from feature_store import parse_range
+
+    stop = pd.Timestamp.now(tz="UTC").floor("5min")
+    start = (stop - parse_range(data_range)).floor("5min")
+    step = pd.Timedelta(chunk)
+    query_api = client.query_api()
+    while start < stop:
+        chunk_stop = min(start + step, stop)
+        query_api.query(flux_rollup(bucket, start.strftime("%Y-%m-%dT%H:%M:%SZ"), chunk_stop.strftime("%Y-%m-%dT%H:%M:%SZ")))
+        logging.info(f"📉 Rollup {start.isoformat()} s.d. {chunk_stop.isoformat()} selesai.")
+        start = chunk_stop
+
+
+def main():
+    from dotenv import load_dotenv
+    from influxdb_client import InfluxDBClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Mengelola rollup 5 menit di InfluxDB.")
+    parser.add_argument("--apply-task", action="store_true", help="Buat/perbarui task Flux rollup di server")
+    parser.add_argument("--print-task", action="store_true", help="Tampilkan script task Flux tanpa mengirimnya")
+    parser.add_argument("--delete-task", action="store_true", help="Hapus task Flux rollup (kembali ke ROLLUP_MODE=ingest)")
+    parser.add_argument("--backfill", metavar="RENTANG", help="Isi rollup untuk data historis, misal 30d")
+    args = parser.parse_args()
+
+    bucket = os.getenv("INFLUX_BUCKET")
+    if args.print_task:
+        print(flux_task(bucket))
+        return
+    if not (args.apply_task or args.backfill or args.delete_task):
+        parser.error("pilih --apply-task, --delete-task, --print-task, atau --backfill")
+    if args.apply_task and args.delete_task:
+        parser.error("--apply-task dan --delete-task tidak bisa dipakai bersamaan")
+    if args.apply_task and os.getenv("ROLLUP_MODE", "").lower() != "task":
+        # Rollup ingest (default) dan task Flux menulis bucket yang sama
+        parser.error("--apply-task membutuhkan ROLLUP_MODE=task; set juga ROLLUP_MODE=task di semua proses ingest "
+                     "agar rollup tidak ditulis dua kali")
+    with InfluxDBClient(url=os.getenv("INFLUX_URL"), token=os.getenv("INFLUX_TOKEN"), org=os.getenv("INFLUX_ORG"),
+                        timeout=600_000) as client:
+        if args.backfill:
+            backfill(client, bucket, args.backfill)
+        if args.apply_task:
+            apply_task(client, os.getenv("INFLUX_ORG"), bucket)
+        if args.delete_task:
+            delete_task(client)
+
+
+if __name__ == "__main__":
+    main()
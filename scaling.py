@@ -0,0 +1,38 @@
+# scaling.py
+"""
+Scaler min-max ringkas tanpa sklearn/joblib.
+
+Parameter disimpan di manifest bundle (lihat model_registry.py) sebagai dua vektor
+`min` dan `scale`, sama seperti atribut `min_` dan `scale_` MinMaxScaler:
+
+    x_scaled = x * scale + min        x = (x_scaled - min) / scale
+"""
+import numpy as np
+
+
+class AffineScaler:
+    def __init__(self, min_, scale):
+        self.min = np.asarray(min_, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(params["min"], params["scale"])
+
+    @classmethod
+    def from_minmax(cls, scaler):
+        """Dari MinMaxScaler sklearn yang sudah di-fit."""
+        return cls(scaler.min_, scaler.scale_)
+
+    def to_dict(self):
+        return {"min": self.min.tolist(), "scale": self.scale.tolist()}
+
+    def transform(self, x, dtype=np.float32):
+        """Skala semua kolom: satu alokasi output, lalu penjumlahan in-place."""
+        out = np.multiply(x, self.scale, dtype=dtype)
+        out += self.min.astype(dtype)
+        return out
+
+    def inverse_column(self, values, idx):
+        """Inverse transform satu kolom (misal target gas_ppm) tanpa matriks dummy."""
+        return (np.asarray(values, dtype=np.float64) - self.min[idx]) / self.scale[idx]
@@ -0,0 +1,283 @@
+# spool.py
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from influxdb_client.client.exceptions import InfluxDBError
+import metrics
+
+
+def is_retryable_error(error):
+    """True jika kegagalan tulis bersifat sementara (server down, 5xx, 429) dan layak dicoba ulang."""
+    if isinstance(error, InfluxDBError):
+        status = getattr(error.response, "status", None)
+        return status is None or status == 429 or status >= 500
+    return True
+
+
+def to_line_protocol(record):
+    """Mengubah record (Point, str, atau bytes) menjadi line protocol dalam bentuk bytes."""
+    if isinstance(record, bytes):
+        return record
+    if isinstance(record, str):
+        return record.encode("utf-8")
+    return record.to_line_protocol().encode("utf-8")
+
+
+class Spool:
+    """
+    Spool append-only di disk untuk data yang gagal atau tidak muat ditulis ke InfluxDB.
+
+    Record disimpan sebagai `<panjang u32><crc32 u32><line protocol>` di file segmen
+    `segment-<n>.log` yang dirotasi setiap `segment_bytes`. Posisi baca yang sudah
+    berhasil di-replay disimpan di `offset.json` (ditulis atomik + fsync), sehingga
+    setelah crash replay dilanjutkan dari record terakhir yang belum terkirim.
+    Jika total ukuran melebihi `max_bytes`, segmen tertua dihapus.
+    """
+
+    _HEADER = struct.Struct("<II")
+    _OFFSET_FILE = "offset.json"
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._segments = self._list_segments()
+        self._read_segment, self._read_pos = self._load_offset()
+        if not self._segments:
+            self._segments = [max(1, self._read_segment)]
+        self._truncate_torn_tail(self._segments[-1])
+        self._file = open(self._segment_path(self._segments[-1]), "ab")
+
+    # --- Segmen & offset ---
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"segment-{seq:012d}.log")
+
+    def _list_segments(self):
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                seqs.append(int(name[len("segment-"):-len(".log")]))
+        return sorted(seqs)
+
+    def _valid_length(self, seq):
+        """Panjang awal segmen yang berisi record utuh (CRC cocok) secara berurutan."""
+        pos = 0
+        try:
+            with open(self._segment_path(seq), "rb") as f:
+                while True:
+                    header = f.read(self._HEADER.size)
+                    if len(header) < self._HEADER.size:
+                        return pos
+                    length, crc = self._HEADER.unpack(header)
+                    data = f.read(length)
+                    if len(data) < length or zlib.crc32(data) != crc:
+                        return pos
+                    pos += self._HEADER.size + length
+        except FileNotFoundError:
+            return 0
+
+    def _truncate_torn_tail(self, seq):
+        """
+        Record terakhir bisa terpotong jika proses crash saat menulis. Sisa byte rusak itu
+        dipotong sebelum segmen dibuka untuk append; jika tidak, record baru ditulis setelah
+        byte rusak dan tidak akan pernah terbaca oleh `read_batch`.
+        """
+        path = self._segment_path(seq)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        valid = self._valid_length(seq)
+        if valid == size:
+            return
+        with open(path, "r+b") as f:
+            f.truncate(valid)
+            f.flush()
+            os.fsync(f.fileno())
+        logging.warning(f"⚠️ Segmen spool {seq} berisi record terpotong ({size - valid} bytes), dipotong ke {valid} bytes.")
+
+    def _load_offset(self):
+        path = os.path.join(self.directory, self._OFFSET_FILE)
+        try:
+            with open(path, "r") as f:
+                offset = json.load(f)
+            return offset["segment"], offset["pos"]
+        except FileNotFoundError:
+            return (self._segments[0] if self._segments else 1), 0
+        except (ValueError, KeyError) as e:
+            logging.warning(f"⚠️ File offset spool rusak ({e}). Replay dimulai dari segmen tertua.")
+            return (self._segments[0] if self._segments else 1), 0
+
+    def _save_offset(self, segment, pos):
+        path = os.path.join(self.directory, self._OFFSET_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": segment, "pos": pos}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def size_bytes(self):
+        total = 0
+        for seq in self._segments:
+            try:
+                total += os.path.getsize(self._segment_path(seq))
+            except FileNotFoundError:
+                pass
+        return total
+
+    def is_empty(self):
+        with self._lock:
+            self._file.flush()
+            last = self._segments[-1]
+            return self._read_segment >= last and self._read_pos >= os.path.getsize(self._segment_path(last))
+
+    # --- Tulis ---
+
+    def append(self, records):
+        """Menambahkan record (Point/str/bytes) ke segmen aktif lalu fsync."""
+        if not records:
+            return
+        chunks = []
+        for record in records:
+            data = to_line_protocol(record)
+            chunks.append(self._HEADER.pack(len(data), zlib.crc32(data)))
+            chunks.append(data)
+        with self._lock:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            self._enforce_limit()
+
+    def _rotate(self):
+        self._file.close()
+        self._segments.append(self._segments[-1] + 1)
+        self._file = open(self._segment_path(self._segments[-1]), "ab")
+
+    def _enforce_limit(self):
+        while len(self._segments) > 1 and self.size_bytes() > self.max_bytes:
+            oldest = self._segments.pop(0)
+            os.remove(self._segment_path(oldest))
+            logging.error(f"❌ Spool melebihi batas {self.max_bytes} bytes. Segmen {oldest} dihapus (data hilang).")
+            if self._read_segment <= oldest:
+                self._read_segment, self._read_pos = self._segments[0], 0
+                self._save_offset(self._read_segment, self._read_pos)
+
+    # --- Baca & commit ---
+
+    def read_batch(self, max_records):
+        """
+        Membaca maksimal `max_records` record mulai dari offset yang sudah di-commit.
+        Mengembalikan (records, posisi_berikutnya); posisi diberikan ke `commit` setelah replay sukses.
+        """
+        with self._lock:
+            self._file.flush()
+            segments = list(self._segments)
+            segment, pos = self._read_segment, self._read_pos
+
+        records = []
+        while len(records) < max_records:
+            path = self._segment_path(segment)
+            try:
+                with open(path, "rb") as f:
+                    f.seek(pos)
+                    while len(records) < max_records:
+                        header = f.read(self._HEADER.size)
+                        if len(header) < self._HEADER.size:
+                            break
+                        length, crc = self._HEADER.unpack(header)
+                        data = f.read(length)
+                        if len(data) < length or zlib.crc32(data) != crc:
+                            break
+                        records.append(data)
+                        pos += self._HEADER.size + length
+            except FileNotFoundError:
+                pass
+
+            if len(records) >= max_records:
+                break
+            later = [s for s in segments if s > segment]
+            if not later:
+                break
+            # Sisa segmen lama yang tidak terbaca (record terpotong akibat crash) dilewati
+            segment, pos = later[0], 0
+
+        return records, (segment, pos)
+
+    def commit(self, position):
+        """Menyimpan offset baca dan menghapus segmen yang sudah selesai di-replay."""
+        segment, pos = position
+        with self._lock:
+            self._read_segment, self._read_pos = segment, pos
+            self._save_offset(segment, pos)
+            while len(self._segments) > 1 and self._segments[0] < segment:
+                os.remove(self._segment_path(self._segments.pop(0)))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SpoolReplayer:
+    """Thread latar belakang yang mengirim ulang isi spool ke InfluxDB dalam batch besar."""
+
+    def __init__(self, spool, write_api, bucket, org, batch_size=5000, interval=5.0, max_backoff=300.0):
+        self.spool = spool
+        self.write_api = write_api
+        self.bucket = bucket
+        self.org = org
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="influx-spool-replayer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=30.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        backoff = self.interval
+        while not self._stop.is_set():
+            if self.spool.is_empty():
+                self._stop.wait(self.interval)
+                continue
+
+            records, position = self.spool.read_batch(self.batch_size)
+            if not records:
+                # Tidak ada record utuh yang bisa dibaca, cukup majukan offset
+                self.spool.commit(position)
+                self._stop.wait(self.interval)
+                continue
+
+            start = time.perf_counter()
+            try:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=records)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    logging.error(f"❌ Batch spool ({len(records)} record) ditolak InfluxDB dan dibuang. Detail: {e}")
+                    self.spool.commit(position)
+                    continue
+                logging.warning(f"⚠️ Replay spool gagal, dicoba lagi dalam {backoff:.0f} detik. Detail: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            metrics.WRITE_LATENCY.observe(time.perf_counter() - start, mode="replay")
+            metrics.POINTS_REPLAYED.inc(len(records))
+            self.spool.commit(position)
+            backoff = self.interval
+            logging.info(f"♻️ {len(records)} data point dari spool berhasil ditulis ulang ke InfluxDB.")
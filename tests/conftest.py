@@ -0,0 +1,11 @@
+# conftest.py
+# Modul proyek berada di root repo (tanpa paket), jadi root ditambahkan ke sys.path.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py menghentikan program jika variabel wajib tidak ada; nilai dummy untuk modul yang mengimpornya
+for _name, _value in (("INFLUX_URL", "http://localhost:8086"), ("INFLUX_TOKEN", "test"), ("INFLUX_ORG", "test"),
+                      ("INFLUX_BUCKET", "test"), ("MQTT_BROKER", "localhost"), ("MQTT_TOPIC_DATA", "test/data")):
+    os.environ.setdefault(_name, _value)
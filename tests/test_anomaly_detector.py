@@ -0,0 +1,78 @@
+# test_anomaly_detector.py
+import json
+from anomaly_detector import BUCKET_NS, AnomalyDetector
+
+T0 = 1_735_689_600
+
+
+def _detector(**kwargs):
+    lines, alerts = [], []
+    options = dict(threshold=0, z_limit=0, roc_limit=0, residual_limit=0, warmup=5, cooldown=300)
+    options.update(kwargs)
+    detector = AnomalyDetector(lines.append, publish=lambda topic, payload: alerts.append((topic, payload)), **options)
+    return detector, lines, alerts
+
+
+def _feed(detector, values, start=0, step=60, id_alat="ALAT_01"):
+    for i, value in enumerate(values):
+        detector.on_reading({"id_alat": id_alat, "timestamp": T0 + start + i * step, "gas_ppm": value})
+
+
+def test_threshold_event_and_alert():
+    detector, lines, alerts = _detector(threshold=700)
+    _feed(detector, [300.0, 750.0])
+    assert lines == [b"anomali_gas,id_alat=ALAT_01,jenis=ambang gas_ppm=750.0,skor=750.0,batas=700.0 "
+                     + b"%d" % ((T0 + 60) * 1_000_000_000)]
+    topic, payload = alerts[0]
+    assert topic == "iot/kualitas_udara/ALAT_01/alert"
+    assert json.loads(payload)["jenis"] == "ambang"
+
+
+def test_cooldown_suppresses_repeats():
+    detector, lines, _ = _detector(threshold=700)
+    _feed(detector, [750.0, 760.0, 770.0])          # dalam 300 detik: satu kejadian
+    _feed(detector, [780.0], start=600)             # setelah cooldown: kejadian baru
+    assert len(lines) == 2
+
+
+def test_zscore_after_warmup_only():
+    detector, lines, _ = _detector(z_limit=4.0)
+    _feed(detector, [300.0, 1000.0])                # masih pemanasan
+    assert lines == []
+    _feed(detector, [300.0 + (i % 2) for i in range(200)], start=120)
+    assert lines == []
+    _feed(detector, [400.0], start=120 + 200 * 60)
+    assert len(lines) == 1 and b"jenis=zscore" in lines[0]
+
+
+def test_rate_of_change_ignores_late_reading():
+    detector, lines, _ = _detector(roc_limit=200)
+    _feed(detector, [300.0, 350.0])                 # 50 ppm/menit
+    assert lines == []
+    _feed(detector, [900.0], start=-60)             # terlambat: tidak dinilai sebagai laju
+    assert lines == []
+    _feed(detector, [700.0], start=120)             # 350 ppm/menit
+    assert len(lines) == 1 and b"jenis=laju" in lines[0]
+
+
+def test_residual_against_forecast_bucket():
+    detector, lines, _ = _detector(residual_limit=150)
+    bucket = (T0 * 1_000_000_000) - (T0 * 1_000_000_000) % BUCKET_NS
+    detector.on_forecast("ALAT_01", bucket, 300.0)
+    _feed(detector, [350.0])
+    assert lines == []
+    _feed(detector, [500.0], start=60)
+    assert len(lines) == 1 and b"jenis=residual" in lines[0]
+
+
+def test_state_is_per_device_and_publish_errors_are_contained():
+    lines = []
+
+    def publish(topic, payload):
+        raise OSError("broker putus")
+
+    detector = AnomalyDetector(lines.append, publish=publish, threshold=700, z_limit=0, roc_limit=0, residual_limit=0)
+    _feed(detector, [750.0], id_alat="A")
+    _feed(detector, [750.0], id_alat="B")
+    assert detector.device_count() == 2
+    assert len(lines) == 2
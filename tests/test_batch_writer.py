@@ -0,0 +1,86 @@
+# test_batch_writer.py
+import threading
+import time
+from influx_handler import BatchWriter
+
+
+class FakeWriteApi:
+    def __init__(self, block=None):
+        self.batches = []
+        self.block = block
+        self.called = threading.Event()
+
+    def write(self, bucket, org, record):
+        self.called.set()
+        if self.block is not None:
+            self.block.wait(5)
+        self.batches.append(list(record))
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_flush_at_batch_size():
+    api = FakeWriteApi()
+    writer = BatchWriter(api, "bucket", "org", batch_size=3, flush_interval_ms=60_000)
+    for i in range(7):
+        assert writer.submit(b"m v=%d" % i)
+    assert _wait_for(lambda: len(api.batches) == 2)
+    assert api.batches == [[b"m v=0", b"m v=1", b"m v=2"], [b"m v=3", b"m v=4", b"m v=5"]]
+    writer.close()
+    assert api.batches[-1] == [b"m v=6"]
+
+
+def test_flush_on_interval():
+    api = FakeWriteApi()
+    writer = BatchWriter(api, "bucket", "org", batch_size=100, flush_interval_ms=50)
+    writer.submit(b"m v=1")
+    assert _wait_for(lambda: api.batches == [[b"m v=1"]], timeout=2.0)
+    writer.close()
+
+
+def test_backpressure_when_queue_full():
+    release = threading.Event()
+    api = FakeWriteApi(block=release)
+    writer = BatchWriter(api, "bucket", "org", batch_size=1, flush_interval_ms=60_000, max_queue=2, put_timeout=0.05)
+    writer.submit(b"m v=0")
+    assert api.called.wait(2)  # thread penulis tertahan di write
+    assert writer.submit(b"m v=1") and writer.submit(b"m v=2")
+    start = time.monotonic()
+    assert not writer.submit(b"m v=3")
+    assert time.monotonic() - start >= 0.05
+    release.set()
+    writer.close()
+    assert [line for batch in api.batches for line in batch] == [b"m v=0", b"m v=1", b"m v=2"]
+
+
+def test_close_drains_pending_lines():
+    api = FakeWriteApi()
+    writer = BatchWriter(api, "bucket", "org", batch_size=1000, flush_interval_ms=60_000)
+    lines = [b"m v=%d" % i for i in range(25)]
+    for line in lines:
+        writer.submit(line)
+    writer.close()
+    assert [line for batch in api.batches for line in batch] == lines
+    assert not writer._thread.is_alive()
+
+
+def test_error_callback_receives_batch():
+    failures = []
+
+    class FailingApi:
+        def write(self, bucket, org, record):
+            raise ConnectionError("server mati")
+
+    writer = BatchWriter(FailingApi(), "bucket", "org", batch_size=2, flush_interval_ms=60_000,
+                         on_error=lambda batch, e: failures.append((list(batch), type(e))))
+    writer.submit(b"m v=1")
+    writer.submit(b"m v=2")
+    writer.close()
+    assert failures == [([b"m v=1", b"m v=2"], ConnectionError)]
@@ -0,0 +1,51 @@
+# test_decimate.py
+import numpy as np
+import pytest
+import decimate
+
+
+def _series(n=10_000):
+    x = np.arange(n, dtype=np.int64) * 300_000_000_000
+    y = np.sin(np.linspace(0, 20, n)) + np.random.default_rng(3).normal(0, 0.05, n)
+    if n > 4321:
+        y[4321] = 25.0  # puncak tunggal harus tetap terlihat
+    return x, y
+
+
+def test_lttb_size_endpoints_and_peak():
+    x, y = _series()
+    idx = decimate.lttb(x, y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 4321 in idx
+
+
+def test_lttb_short_series_unchanged():
+    x, y = _series(100)
+    np.testing.assert_array_equal(decimate.lttb(x, y, 200), np.arange(100))
+    np.testing.assert_array_equal(decimate.lttb(x, y, 2), np.arange(100))
+
+
+def test_minmax_keeps_extremes():
+    _, y = _series()
+    idx = decimate.minmax(y, 100)
+    assert len(idx) <= 2 * 100 + 2
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert int(np.argmax(y)) in idx and int(np.argmin(y)) in idx
+
+
+def test_minmax_handles_nan_bucket():
+    y = np.arange(1000, dtype=np.float64)
+    y[:100] = np.nan
+    idx = decimate.minmax(y, 10)
+    assert 100 in idx and 999 in idx
+
+
+def test_decimate_dispatch():
+    x, y = _series()
+    assert len(decimate.decimate(x, y, 300)) == 300
+    assert len(decimate.decimate(x, y, 300, method="minmax")) <= 302
+    with pytest.raises(ValueError):
+        decimate.decimate(x, y, 300, method="acak")
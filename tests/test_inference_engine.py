@@ -0,0 +1,90 @@
+# test_inference_engine.py
+import numpy as np
+import pytest
+from inference_engine import InferenceEngine, NumpyBackend, export_numpy_weights, load_backend
+
+
+@pytest.fixture(scope="module")
+def keras_model():
+    keras = pytest.importorskip("tensorflow").keras
+    keras.utils.set_random_seed(7)
+    # Arsitektur sama seperti train_model.py, diperkecil
+    model = keras.Sequential([
+        keras.Input(shape=(6, 3)),
+        keras.layers.LSTM(8, return_sequences=True),
+        keras.layers.Dropout(0.2),
+        keras.layers.LSTM(4),
+        keras.layers.Dense(1),
+    ])
+    # Bias acak agar urutan gate (i, f, c, o) ikut teruji
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if weights:
+            weights[-1] = np.random.default_rng(1).normal(0, 0.5, weights[-1].shape).astype(np.float32)
+            layer.set_weights(weights)
+    return model
+
+
+def test_numpy_backend_matches_keras(keras_model, tmp_path):
+    path = str(tmp_path / "model_weights.npz")
+    export_numpy_weights(keras_model, path)
+    backend = load_backend("numpy", path)
+    assert isinstance(backend, NumpyBackend)
+
+    batch = np.random.default_rng(2).normal(size=(16, 6, 3)).astype(np.float32)
+    expected = np.asarray(keras_model(batch, training=False))[:, 0]
+    np.testing.assert_allclose(backend.predict(batch), expected, rtol=1e-4, atol=1e-5)
+
+
+def test_export_rejects_unsupported_layer():
+    class Conv1D:
+        layers = [type("Conv1D", (), {})()]
+
+    with pytest.raises(ValueError):
+        export_numpy_weights(Conv1D, "tidak_dipakai.npz")
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend("onnx", "model.onnx")
+
+
+class _SumBackend:
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, batch):
+        self.batches.append(len(batch))
+        return batch.reshape(len(batch), -1).sum(axis=1)
+
+
+def test_engine_keeps_every_bucket_per_key():
+    backend = _SumBackend()
+    results = []
+    engine = InferenceEngine(backend, lambda key, pred, ctx: results.append((key, pred, ctx)), max_batch=2)
+    # Dua bucket alat "a" sebelum tick (misal backlog setelah reconnect) keduanya diprediksi
+    engine.submit("a", np.ones((2, 2), dtype=np.float32), 1)
+    engine.submit("a", np.full((2, 2), 2.0, dtype=np.float32), 2)
+    engine.submit("b", np.zeros((2, 2), dtype=np.float32), 1)
+    # Bucket yang sama dikirim ulang: hanya window terbaru yang dipakai
+    engine.submit("b", np.ones((2, 2), dtype=np.float32), 1)
+
+    assert engine.tick() == 3
+    assert backend.batches == [2, 1]
+    assert results == [("a", 4.0, 1), ("a", 8.0, 2), ("b", 4.0, 1)]
+    assert engine.tick() == 0
+
+
+def test_engine_result_error_does_not_stop_tick():
+    seen = []
+
+    def on_result(key, pred, ctx):
+        if key == "a":
+            raise RuntimeError("gagal")
+        seen.append(key)
+
+    engine = InferenceEngine(_SumBackend(), on_result)
+    engine.submit("a", np.ones((1, 1), dtype=np.float32))
+    engine.submit("b", np.ones((1, 1), dtype=np.float32))
+    assert engine.tick() == 2
+    assert seen == ["b"]
@@ -0,0 +1,81 @@
+# test_ingest_filter.py
+import time
+from ingest_filter import IngestFilter
+
+T0 = 1_735_689_600
+
+
+def _reading(offset, id_alat="ALAT_01", value=300.0):
+    return {"id_alat": id_alat, "timestamp": T0 + offset, "gas_ppm": value}
+
+
+def _offsets(readings):
+    return [data["timestamp"] - T0 for data in readings]
+
+
+def test_dedup_drops_resend():
+    f = IngestFilter(dedup_window=600, tolerance=0)
+    assert f.push(_reading(0)) == [_reading(0)]
+    assert f.push(_reading(0, value=999.0)) == []
+    # Alat lain dengan timestamp yang sama bukan duplikat
+    assert f.push(_reading(0, id_alat="ALAT_02")) == [_reading(0, id_alat="ALAT_02")]
+
+
+def test_dedup_window_expires():
+    f = IngestFilter(dedup_window=60, tolerance=0)
+    f.push(_reading(0))
+    f.push(_reading(120))
+    # Di luar jendela dedup: kirim ulang lama diterima lagi
+    assert f.push(_reading(0)) == [_reading(0)]
+
+
+def test_dedup_max_bounds_cache():
+    f = IngestFilter(dedup_window=3600, dedup_max=2, tolerance=0)
+    for offset in range(5):
+        f.push(_reading(offset))
+    assert len(f._devices["ALAT_01"].seen) <= 3
+    assert f.push(_reading(0)) == [_reading(0)]
+    assert f.push(_reading(4)) == []
+
+
+def test_reorder_within_tolerance():
+    f = IngestFilter(dedup_window=0, tolerance=10)
+    assert f.push(_reading(5)) == []
+    assert f.push(_reading(2)) == []
+    assert f.push(_reading(8)) == []
+    # Timestamp alat sudah 10 detik di depan: 2 dan 5 dilepas berurutan
+    assert _offsets(f.push(_reading(15))) == [2, 5]
+    assert _offsets(f.flush_due(force=True)) == [8, 15]
+
+
+def test_late_reading_still_emitted():
+    f = IngestFilter(dedup_window=0, tolerance=5)
+    f.push(_reading(0))
+    assert _offsets(f.push(_reading(20))) == [0]
+    assert _offsets(f.push(_reading(40))) == [20]
+    # Lebih lama dari pembacaan yang sudah diteruskan: tidak bisa diurutkan, langsung diteruskan
+    assert _offsets(f.push(_reading(10))) == [10]
+
+
+def test_flush_due_releases_after_hold_time():
+    f = IngestFilter(dedup_window=0, tolerance=0.05)
+    f.push(_reading(0))
+    assert f.flush_due() == []
+    time.sleep(0.1)
+    assert _offsets(f.flush_due()) == [0]
+    assert f.held_count() == 0
+
+
+def test_sink_receives_in_order_and_survives_errors():
+    f = IngestFilter(dedup_window=0, tolerance=10)
+    out = []
+
+    def sink(data):
+        if data["gas_ppm"] < 0:
+            raise RuntimeError("gagal tulis")
+        out.append(data["timestamp"] - T0)
+
+    for offset, value in ((3, 300.0), (1, -1.0), (2, 300.0), (30, 300.0)):
+        f.push(_reading(offset, value=value), sink=sink)
+    f.flush_due(force=True, sink=sink)
+    assert out == [2, 3, 30]
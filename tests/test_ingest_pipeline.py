@@ -0,0 +1,81 @@
+# test_ingest_pipeline.py
+import threading
+import time
+from ingest_pipeline import IngestPipeline
+
+
+def _key(payload):
+    return payload.split(b":", 1)[0]
+
+
+class Recorder:
+    """process_fn yang mencatat urutan per alat dan mendeteksi pemrosesan bersamaan satu alat."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.seen = {}
+        self.active = set()
+        self.overlap = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, payload):
+        key = _key(payload)
+        with self.lock:
+            if key in self.active:
+                self.overlap += 1
+            self.active.add(key)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active.discard(key)
+            self.seen.setdefault(key, []).append(int(payload.split(b":", 1)[1]))
+
+
+def test_key_routing_keeps_device_order():
+    recorder = Recorder()
+    pipeline = IngestPipeline(recorder, workers=4, max_queue=1000, key_fn=_key)
+    pipeline.start()
+    for i in range(200):
+        for device in (b"a", b"b", b"c"):
+            pipeline.submit(device + b":%d" % i)
+    pipeline.stop(drain=True)
+    assert recorder.seen == {device: list(range(200)) for device in (b"a", b"b", b"c")}
+    assert recorder.overlap == 0
+
+
+def test_spilled_payloads_go_back_to_their_worker(tmp_path):
+    recorder = Recorder(delay=0.01)
+    pipeline = IngestPipeline(recorder, workers=2, max_queue=4, overflow_policy="spill",
+                              spill_path=str(tmp_path / "spill.bin"), key_fn=_key)
+    pipeline.start()
+    # Alat "a" terus mengirim lebih cepat dari worker-nya selama > 1 detik, sehingga worker
+    # lain (menganggur) sempat mengosongkan spill selagi worker "a" masih sibuk
+    for i in range(250):
+        assert pipeline.submit(b"a:%d" % i)
+        time.sleep(0.005)
+    pipeline.stop(drain=True)
+    assert pipeline.spilled > 0
+    assert sorted(recorder.seen[b"a"]) == list(range(250))
+    # Pesan dari spill tidak pernah diproses bersamaan dengan pesan lain alat yang sama
+    assert recorder.overlap == 0
+    assert not (tmp_path / "spill.bin.draining").exists()
+
+
+def test_drop_count_is_thread_safe():
+    release = threading.Event()
+    pipeline = IngestPipeline(lambda payload: release.wait(5), workers=1, max_queue=1, overflow_policy="drop_oldest")
+    pipeline.start()
+    pipeline.submit(b"x")
+    time.sleep(0.1)  # worker tertahan di pesan pertama
+
+    def producer():
+        for _ in range(500):
+            pipeline.submit(b"y")
+
+    threads = [threading.Thread(target=producer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    release.set()
+    pipeline.stop(drain=True)
+    assert pipeline.dropped == 4 * 500 - 1
@@ -0,0 +1,14 @@
+# test_metrics.py
+from metrics import OVERFLOW_LABEL, Registry
+
+
+def test_gauge_folds_labels_over_limit():
+    gauge = Registry().gauge("last_seen", "Uji.", ("id_alat",), max_series=2)
+    for i in range(5):
+        gauge.set(i, id_alat=f"ALAT_{i}")
+    gauge.set(10, id_alat="ALAT_0")  # label yang sudah ada tetap diperbarui
+    text = gauge.render()
+    assert 'last_seen{id_alat="ALAT_0"} 10' in text
+    assert 'last_seen{id_alat="ALAT_1"} 1' in text
+    assert f'last_seen{{id_alat="{OVERFLOW_LABEL}"}} 4' in text
+    assert "ALAT_2" not in text and "ALAT_4" not in text
@@ -0,0 +1,101 @@
+# test_payload_codec.py
+import math
+import pytest
+import payload_codec
+from payload_codec import BINARY_HEADER, BINARY_RECORD, FIELDS
+
+READINGS = [
+    {"timestamp": 1_735_689_600, "gas_ppm": 312.5, "kelembaban": 61.0, "suhu": 27.25, "tekanan": 1008.5},
+    {"timestamp": 1_735_689_660, "gas_ppm": 318.0, "kelembaban": 60.5, "suhu": 27.5, "tekanan": 1008.0},
+]
+
+
+def test_decode_json():
+    raw = b'{"id_alat": "ALAT_07", "timestamp": 1735689600, "gas_ppm": 300.5}'
+    assert payload_codec.decode_readings(raw) == [{"id_alat": "ALAT_07", "timestamp": 1735689600, "gas_ppm": 300.5}]
+
+
+@pytest.mark.parametrize("raw", [b"[1, 2]", b"bukan json", b""])
+def test_decode_json_invalid(raw):
+    with pytest.raises(ValueError):
+        payload_codec.decode_readings(raw)
+
+
+def test_binary_round_trip():
+    raw = payload_codec.encode_binary(READINGS, id_alat="ALAT_07")
+    assert payload_codec.is_binary(raw)
+    assert len(raw) == BINARY_HEADER.size + len("ALAT_07") + len(READINGS) * BINARY_RECORD.size
+    decoded = payload_codec.decode_readings(raw)
+    # Semua nilai di atas tepat direpresentasikan float32
+    assert decoded == [dict(r, id_alat="ALAT_07") for r in READINGS]
+
+
+def test_binary_default_id_and_missing_field():
+    raw = payload_codec.encode_binary([{"timestamp": 1_735_689_600, "gas_ppm": 300.0}])
+    (data,) = payload_codec.decode_readings(raw)
+    assert data["id_alat"] == payload_codec.DEFAULT_ID_ALAT
+    assert math.isnan(data["suhu"])
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda raw: raw[:-1],                  # record terpotong
+    lambda raw: raw + b"\x00",             # byte berlebih
+    lambda raw: raw[:3],                   # header terpotong
+    lambda raw: raw[:2] + b"\x09" + raw[3:],  # versi tidak dikenal
+    lambda raw: raw[:3] + b"\x00" + raw[4:],  # jumlah pembacaan nol
+])
+def test_binary_invalid(mutate):
+    raw = payload_codec.encode_binary(READINGS, id_alat="ALAT_07")
+    with pytest.raises(ValueError):
+        payload_codec.decode_readings(mutate(raw))
+
+
+def test_encode_binary_limits():
+    with pytest.raises(ValueError):
+        payload_codec.encode_binary([])
+    with pytest.raises(ValueError):
+        payload_codec.encode_binary(READINGS * 128)
+
+
+def test_device_key():
+    assert payload_codec.device_key(b'{"timestamp": 1, "id_alat" : "ALAT_07"}') == b"ALAT_07"
+    assert payload_codec.device_key(b'{"timestamp": 1}') == payload_codec.DEFAULT_ID_ALAT.encode()
+    assert payload_codec.device_key(payload_codec.encode_binary(READINGS, id_alat="ALAT_07")) == b"ALAT_07"
+    assert payload_codec.device_key(payload_codec.encode_binary(READINGS)) == payload_codec.DEFAULT_ID_ALAT.encode()
+
+
+def test_timestamp_ns():
+    expected = 1_735_689_600 * 1_000_000_000
+    assert payload_codec.timestamp_ns(1_735_689_600) == expected
+    assert payload_codec.timestamp_ns("2025-01-01T00:00:00Z") == expected
+    assert payload_codec.timestamp_ns("2025-01-01T07:00:00+07:00") == expected
+    assert payload_codec.timestamp_ns("2025-01-01T00:00:00.5+00:00") == expected + 500_000_000
+    # Format tidak standar lewat fallback dateutil
+    assert payload_codec.timestamp_ns("1 Jan 2025 00:00:00 UTC") == expected
+    with pytest.raises(ValueError):
+        payload_codec.timestamp_ns(None)
+
+
+def test_encode_line():
+    data = {"id_alat": "alat 1,a=b", "timestamp": 1_735_689_600, "gas_ppm": 300.0,
+            "kelembaban": 61.5, "suhu": float("nan"), "tekanan": 1008.25}
+    assert payload_codec.encode_line(data) == (
+        b"pengukuran_udara,id_alat=alat\\ 1\\,a\\=b gas_ppm=300,kelembaban=61.5,tekanan=1008.25 "
+        b"1735689600000000000"
+    )
+
+
+def test_encode_line_without_fields():
+    with pytest.raises(ValueError):
+        payload_codec.encode_line({"timestamp": 1, **{name: float("nan") for name in FIELDS}})
+
+
+@pytest.mark.parametrize("id_alat", ["", None])
+def test_encode_line_empty_id_uses_default(id_alat):
+    line = payload_codec.encode_line({"id_alat": id_alat, "timestamp": 1_735_689_600, "gas_ppm": 300.0})
+    assert line.startswith(b"pengukuran_udara,id_alat=ALAT_01 gas_ppm=300,")
+
+
+def test_decode_json_empty_id_uses_default():
+    (data,) = payload_codec.decode_readings(b'{"id_alat": "", "timestamp": 1735689600, "gas_ppm": 300.5}')
+    assert data["id_alat"] == payload_codec.DEFAULT_ID_ALAT
@@ -0,0 +1,89 @@
+# test_spool.py
+import os
+import struct
+import zlib
+from spool import Spool
+
+
+def _drain(spool, max_records=100):
+    records, position = spool.read_batch(max_records)
+    spool.commit(position)
+    return records
+
+
+def test_append_read_commit(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append([b"a 1", "b 2"])
+    records, position = spool.read_batch(10)
+    assert records == [b"a 1", b"b 2"]
+    assert not spool.is_empty()
+    spool.commit(position)
+    assert spool.is_empty()
+    assert spool.read_batch(10)[0] == []
+    spool.close()
+
+
+def test_offset_survives_reopen(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append([b"a 1", b"b 2", b"c 3"])
+    records, position = spool.read_batch(2)
+    assert records == [b"a 1", b"b 2"]
+    spool.commit(position)
+    spool.close()
+
+    spool = Spool(str(tmp_path))
+    assert _drain(spool) == [b"c 3"]
+    assert spool.is_empty()
+    spool.close()
+
+
+def test_rotation_and_segment_cleanup(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=64)
+    lines = [f"m v={i}".encode() for i in range(20)]
+    for line in lines:
+        spool.append([line])
+    assert len(spool._segments) > 1
+    assert _drain(spool) == lines
+    assert spool.is_empty()
+    assert len(spool._segments) == 1
+    spool.close()
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append([b"a 1", b"b 2"])
+    spool.close()
+    path = spool._segment_path(spool._segments[-1])
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        # Header record berikutnya tertulis, isinya tidak (crash di tengah write)
+        f.write(struct.pack("<II", 100, zlib.crc32(b"x")))
+
+    spool = Spool(str(tmp_path))
+    assert os.path.getsize(path) == intact
+    spool.append([b"c 3"])
+    assert _drain(spool) == [b"a 1", b"b 2", b"c 3"]
+    assert spool.is_empty()
+    spool.close()
+
+
+def test_corrupt_record_in_old_segment_is_skipped(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=1)
+    spool.append([b"a 1"])
+    spool.append([b"b 2"])
+    first = spool._segment_path(spool._segments[0])
+    with open(first, "r+b") as f:
+        f.seek(8)
+        f.write(b"X")
+    assert _drain(spool) == [b"b 2"]
+    spool.close()
+
+
+def test_limit_drops_oldest_segment(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=16, max_bytes=64)
+    for i in range(20):
+        spool.append([f"m v={i}".encode()])
+    assert spool.size_bytes() <= 64 + 16 + 16
+    records = _drain(spool)
+    assert records and records[-1] == b"m v=19"
+    spool.close()
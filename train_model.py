@@ -2,14 +2,27 @@ import pandas as pd
 import numpy as np
 from influxdb_client import InfluxDBClient
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
+import tensorflow as tf
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping
+from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, Callback
+from tensorflow.keras.optimizers import Adam
 import joblib
 import os
+import argparse
+import shutil
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 import logging
 import json
+import windowing
+import feature_pipeline
+from feature_store import FeatureStore, parse_range
+from influx_stream import InfluxStreamReader
+from inference_engine import export_numpy_weights, export_tflite
+from model_registry import device_dir, read_latest, write_latest, write_manifest
 
 # --- 1. Konfigurasi Awal & Logging ---
 # Mengkonfigurasi format logging yang lebih informatif
@@ -29,6 +42,29 @@ DATA_RANGE = "-3h"  # Rentang waktu data yang akan diambil (contoh: "-30d", "-7d
 MODEL_FILENAME = "model_prediksi_gas_terbaik.keras"
 SCALER_FILENAME = "scaler.pkl"
 CONFIG_FILENAME = "model_config.json"
+# Ekspor untuk backend inferensi ringan (lihat inference_engine.py)
+NUMPY_WEIGHTS_FILENAME = "model_prediksi_gas_weights.npz"
+TFLITE_FILENAME = "model_prediksi_gas.tflite"
+# Direktori cache fitur 5 menit; hanya delta sejak run terakhir yang diambil dari InfluxDB.
+# Kosongkan ("") untuk selalu mengambil ulang seluruh rentang seperti sebelumnya.
+FEATURE_CACHE_DIR = "feature_cache"
+# Query InfluxDB dipecah per potongan waktu dan diambil paralel agar memori puncak tetap terbatas
+FETCH_CHUNK = "1d"
+FETCH_WORKERS = 4
+# Sumber data: "raw" (default) membaca seluruh pembacaan mentah lalu merata-ratakannya di sini,
+# "rollup" membaca rollup 5 menit yang dibuat ingest/task Flux (lihat rollup.py) dan jauh lebih
+# ringan. Measurement rollup hanya berisi data sejak rollup berjalan, jadi sebelum beralih ke
+# "rollup" isi data historis sekali:  python rollup.py --backfill <DATA_RANGE, misal 30d>
+DATA_SOURCE = "raw"
+# Artefak setiap run disimpan di direktori versi baru MODELS_DIR/<id_alat>/<versi>/ (model global:
+# MODELS_DIR/_global/<versi>/), dan LATEST di direktori induknya baru menunjuk ke versi itu setelah
+# manifest selesai ditulis. Bundle yang sedang dipakai tidak pernah ditimpa (lihat model_registry.py).
+MODELS_DIR = "models"
+# Mode inkremental (--incremental): model & scaler terakhir dilanjutkan (warm start) hanya pada
+# window baru sejak 'trained_until' ditambah sampel acak window lama (replay) agar tidak lupa pola lama.
+INCREMENTAL_EPOCHS = 10
+INCREMENTAL_LEARNING_RATE = 1e-4
+REPLAY_RATIO = 1.0  # jumlah window lama yang diputar ulang per window baru
 
 # Validasi variabel environment
 for var in ["INFLUX_TOKEN", "INFLUX_ORG", "INFLUX_BUCKET", "INFLUX_URL"]:
@@ -38,83 +74,145 @@ for var in ["INFLUX_TOKEN", "INFLUX_ORG", "INFLUX_BUCKET", "INFLUX_URL"]:
 
 # --- 3. Fungsi-fungsi Helper ---
 
-def fetch_data():
-    """Mengambil data dari InfluxDB dan mengembalikannya sebagai DataFrame."""
+def fetch_data(id_alat=None):
+    """
+    Mengambil data dari InfluxDB secara streaming per potongan waktu (lihat influx_stream.py)
+    dan mengembalikannya sebagai DataFrame rata-rata 5 menit (float32).
+    Jika `id_alat` diberikan, hanya data alat tersebut yang diambil.
+    """
     logging.info(f"Menghubungkan ke InfluxDB untuk mengambil data rentang {DATA_RANGE}...")
     client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
-    query_api = client.query_api()
-    
-    query = f'''
-    from(bucket: "{INFLUX_BUCKET}")
-      |> range(start: {DATA_RANGE})
-      |> filter(fn: (r) => r["_measurement"] == "pengukuran_udara")
-      |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
-      |> drop(columns: ["_start", "_stop", "id_alat", "_measurement"])
-    '''
+    reader = InfluxStreamReader(client.query_api(), INFLUX_BUCKET, source=DATA_SOURCE, chunk=FETCH_CHUNK, workers=FETCH_WORKERS)
     try:
-        df = query_api.query_data_frame(query=query)
-        logging.info(f"Total {len(df)} data point berhasil diambil.")
+        df = reader.read_frame(pd.Timestamp.now(tz='UTC') - parse_range(DATA_RANGE), id_alat=id_alat)
+        logging.info(f"Total {len(df)} bucket 5 menit berhasil diambil.")
         return df
     except Exception as e:
         logging.error(f"Gagal mengambil data dari InfluxDB: {e}")
         return pd.DataFrame()
+    finally:
+        client.close()
 
 def preprocess_data(df):
     """Melakukan pra-pemrosesan dan feature engineering."""
     if df.empty: return None
     logging.info("Melakukan pra-pemrosesan data...")
-    
-    # Hapus kolom 'result' yang terkadang muncul dari query pivot
-    if 'result' in df.columns:
-        df = df.drop(columns=['result'])
-        
-    df.set_index('_time', inplace=True)
-    df.index = pd.to_datetime(df.index)
-    
-    numeric_cols = ['suhu', 'kelembaban', 'tekanan', 'gas_ppm']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    # Resample data ke interval 5 menit dan hitung rata-rata HANYA untuk kolom numerik
-    df = df.resample('5min').mean(numeric_only=True) 
-    df.interpolate(method='time', inplace=True)
-    df.dropna(inplace=True)
-
-    # Encoding fitur waktu menjadi siklikal untuk pemahaman model yang lebih baik
-    df['jam_sin'] = np.sin(2 * np.pi * df.index.hour/24.0)
-    df['jam_cos'] = np.cos(2 * np.pi * df.index.hour/24.0)
-    df['hari_minggu_sin'] = np.sin(2 * np.pi * df.index.dayofweek/7.0)
-    df['hari_minggu_cos'] = np.cos(2 * np.pi * df.index.dayofweek/7.0)
-    
-    return df
+
+    # Data sudah berupa rata-rata 5 menit; bucket kosong diinterpolasi dan fitur waktu
+    # siklikal ditambahkan dalam satu array float32 (lihat feature_pipeline.py)
+    return feature_pipeline.prepare_frame(df)
+
+def load_features(id_alat=None):
+    """Memuat frame 5 menit siap pakai dari cache fitur lokal (delta diambil dari InfluxDB)."""
+    client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
+    store = FeatureStore(client.query_api(), INFLUX_BUCKET, cache_dir=FEATURE_CACHE_DIR,
+                         source=DATA_SOURCE, chunk=FETCH_CHUNK, workers=FETCH_WORKERS)
+    try:
+        return store.load(DATA_RANGE, id_alat)
+    except Exception as e:
+        logging.error(f"Gagal memuat data dari cache fitur: {e}")
+        return None
+    finally:
+        client.close()
 
 def create_sequences(data, n_steps, target_idx):
-    """Membuat sekuens data untuk model LSTM."""
-    X, y = [], []
-    for i in range(len(data) - n_steps):
-        X.append(data[i:(i + n_steps), :])
-        y.append(data[i + n_steps, target_idx])
-    return np.array(X), np.array(y)
+    """Membuat sekuens data untuk model LSTM (view tanpa salinan, lihat windowing.py)."""
+    return windowing.create_sequences(data, n_steps, target_idx)
 
-# --- 4. Fungsi Utama Pelatihan Model ---
+def load_training_frame(id_alat=None):
+    """Frame 5 menit siap latih, dari cache fitur atau langsung dari InfluxDB."""
+    if FEATURE_CACHE_DIR:
+        return load_features(id_alat)
+    return preprocess_data(fetch_data(id_alat))
+
+def list_devices():
+    """Daftar id_alat yang memiliki data dalam rentang DATA_RANGE di measurement DATA_SOURCE."""
+    with InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG) as client:
+        reader = InfluxStreamReader(client.query_api(), INFLUX_BUCKET, source=DATA_SOURCE)
+        return reader.list_devices(pd.Timestamp.now(tz='UTC') - parse_range(DATA_RANGE))
+
+def artifact_paths(directory=""):
+    """Path semua artefak model di `directory` (kosong = direktori kerja, mode global)."""
+    return {
+        'model': os.path.join(directory, MODEL_FILENAME),
+        'scaler': os.path.join(directory, SCALER_FILENAME),
+        'config': os.path.join(directory, CONFIG_FILENAME),
+        'numpy_weights': os.path.join(directory, NUMPY_WEIGHTS_FILENAME),
+        'tflite': os.path.join(directory, TFLITE_FILENAME),
+    }
 
-def train_and_save_model():
-    """Orkestrasi seluruh proses: fetch, preprocess, train, dan save."""
-    df_raw = fetch_data()
-    df = preprocess_data(df_raw)
+class EpochTimer(Callback):
+    """Mencatat wall time setiap epoch (detik) agar biaya retraining bisa dipantau."""
 
+    def on_train_begin(self, logs=None):
+        self.seconds = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.seconds.append(time.perf_counter() - self._start)
+        logging.info(f"Epoch {epoch + 1}: {self.seconds[-1]:.2f} s")
+
+    def summary(self, mode, windows):
+        return {
+            'mode': mode,
+            'windows': int(windows),
+            'epochs': len(self.seconds),
+            'epoch_seconds': [round(sec, 3) for sec in self.seconds],
+            'total_seconds': round(sum(self.seconds), 3),
+        }
+
+# --- 4. Fungsi Utama Pelatihan Model ---
+
+def train_and_save_model(incremental=False, jit=False, mixed_precision=False):
+    """Orkestrasi seluruh proses: fetch, preprocess, train, dan save (satu model untuk semua alat)."""
+    df = load_training_frame()
     if df is None or df.empty:
         logging.error("Tidak ada data untuk dilatih. Proses dihentikan.")
         return
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    train_version(None, version, df, incremental, jit=jit, mixed_precision=mixed_precision)
+
+def save_artifacts(model, scaler, model_config, paths, save_model=True):
+    """Menyimpan model (opsional), ekspor NumPy/TFLite, scaler, dan konfigurasi ke `paths`."""
+    if save_model:
+        # Simpan ke file sementara dulu agar model lama tidak rusak jika penyimpanan gagal
+        tmp = paths['model'] + ".tmp.keras"
+        model.save(tmp)
+        os.replace(tmp, paths['model'])
+
+    # Ekspor model untuk backend inferensi ringan (NumPy murni & TFLite)
+    logging.info("Mengekspor bobot model untuk backend NumPy dan TFLite...")
+    export_numpy_weights(model, paths['numpy_weights'])
+    try:
+        export_tflite(model, paths['tflite'])
+    except Exception as e:
+        logging.warning(f"Ekspor TFLite gagal, backend 'tflite' tidak tersedia: {e}")
+
+    # Menyimpan Artefak
+    logging.info("Menyimpan scaler dan konfigurasi model...")
+    joblib.dump(scaler, paths['scaler'])
+    with open(paths['config'], 'w') as f:
+        json.dump(model_config, f, indent=4)
+    # Manifest (versi, parameter scaler, checksum) ditulis terakhir sebagai penanda bundle lengkap
+    write_manifest(paths, model_config, scaler)
+
+    logging.info(f"Pelatihan selesai! Artefak ('{paths['model']}', '{paths['scaler']}', '{paths['config']}') telah dibuat.")
 
+def train_on_frame(df, paths, extra_config=None, verbose=1, jit=False):
+    """
+    Melatih model pada frame 5 menit `df` dan menyimpan semua artefak ke `paths`
+    (lihat artifact_paths). Mengembalikan val_loss terbaik, atau None jika data tidak cukup.
+    """
     # Persiapan Fitur & Target
-    features = ['suhu', 'kelembaban', 'tekanan', 'gas_ppm', 'jam_sin', 'jam_cos', 'hari_minggu_sin', 'hari_minggu_cos']
+    features = list(feature_pipeline.FEATURES)
     target_col = 'gas_ppm'
     
     if not all(col in df.columns for col in features):
         missing_cols = [col for col in features if col not in df.columns]
         logging.error(f"Satu atau lebih kolom fitur tidak ditemukan di data: {missing_cols}")
-        return
+        return None
 
     # Normalisasi & Pemisahan Data Kronologis
     scaler = MinMaxScaler(feature_range=(0, 1))
@@ -128,49 +226,226 @@ def train_and_save_model():
     
     if len(train_data) < n_steps + 1 or len(val_data) < n_steps + 1:
         logging.error(f"Data tidak cukup ({len(df)} baris) untuk membuat sekuens training/validasi. Coba ambil data dengan rentang waktu lebih lama.")
-        return
+        return None
     
     target_idx = features.index(target_col)
-    X_train, y_train = create_sequences(train_data, n_steps, target_idx)
-    X_val, y_val = create_sequences(val_data, n_steps, target_idx)
-    logging.info(f"Bentuk data training: X={X_train.shape}, y={y_train.shape}")
-    logging.info(f"Bentuk data validasi: X={X_val.shape}, y={y_val.shape}")
+    n_features = train_data.shape[1]
+    n_train = len(train_data) - n_steps
+    logging.info(f"Bentuk data training: X={(n_train, n_steps, n_features)}, y={(n_train,)}")
+    logging.info(f"Bentuk data validasi: X={(len(val_data) - n_steps, n_steps, n_features)}, y={(len(val_data) - n_steps,)}")
+
+    # Window dibentuk secara lazy per batch oleh tf.data, tensor 3-D penuh tidak pernah dibuat
+    train_ds = windowing.make_dataset(train_data, n_steps, target_idx, batch_size=32, shuffle=True)
+    val_ds = windowing.make_dataset(val_data, n_steps, target_idx, batch_size=32)
 
     # Membangun, Melatih & Validasi Model
     logging.info("Membangun dan melatih model AI...")
-    n_features = X_train.shape[2]
     
     model = Sequential([
         LSTM(50, activation='tanh', return_sequences=True, input_shape=(n_steps, n_features)),
         Dropout(0.2),
         LSTM(50, activation='tanh'),
         Dropout(0.2),
-        Dense(1)
+        # Output tetap float32 agar loss dan prediksi stabil saat mixed precision aktif
+        Dense(1, dtype='float32')
     ])
-    model.compile(optimizer='adam', loss='mean_squared_error')
-    model.summary()
+    model.compile(optimizer='adam', loss='mean_squared_error', jit_compile=jit)
+    if verbose == 1:
+        model.summary()
     
     # Menggunakan Callbacks untuk training yang lebih efisien
-    checkpoint_cb = ModelCheckpoint(MODEL_FILENAME, save_best_only=True, monitor='val_loss', mode='min')
+    checkpoint_cb = ModelCheckpoint(paths['model'], save_best_only=True, monitor='val_loss', mode='min')
     early_stopping_cb = EarlyStopping(patience=10, restore_best_weights=True, monitor='val_loss', mode='min')
+    timer_cb = EpochTimer()
     
-    model.fit(X_train, y_train, epochs=100, batch_size=32, verbose=1, 
-              validation_data=(X_val, y_val), 
-              callbacks=[checkpoint_cb, early_stopping_cb])
+    history = model.fit(train_ds, epochs=100, verbose=verbose,
+                        validation_data=val_ds,
+                        callbacks=[checkpoint_cb, early_stopping_cb, timer_cb])
 
-    # Menyimpan Artefak
-    logging.info("Menyimpan scaler dan konfigurasi model...")
-    joblib.dump(scaler, SCALER_FILENAME)
-    
     model_config = {
         'n_steps': n_steps,
-        'features': features
+        'features': features,
+        # Waktu bucket terakhir yang sudah dilihat model, titik awal mode inkremental berikutnya
+        'trained_until': df.index[-1].isoformat(),
+        'last_training': timer_cb.summary('full', n_train),
     }
-    with open(CONFIG_FILENAME, 'w') as f:
-        json.dump(model_config, f, indent=4)
+    model_config.update(extra_config or {})
+    # Model terbaik sudah ditulis oleh ModelCheckpoint
+    save_artifacts(model, scaler, model_config, paths, save_model=False)
+    return float(min(history.history['val_loss']))
+
+def fine_tune_on_frame(df, base_paths, paths, extra_config=None, verbose=1, jit=False):
+    """
+    Warm start: memuat model, scaler, dan konfigurasi dari `base_paths`, lalu melatihnya
+    beberapa epoch hanya pada window yang target-nya sejak 'trained_until' ditambah
+    sampel replay window lama. Scaler tidak di-fit ulang. Artefak ditulis ke `paths`.
+    Mengembalikan loss validasi terbaik, atau None jika tidak ada window baru.
+    """
+    try:
+        with open(base_paths['config'], 'r') as f:
+            base_config = json.load(f)
+        trained_until = pd.Timestamp(base_config['trained_until'])
+        scaler = joblib.load(base_paths['scaler'])
+        model = load_model(base_paths['model'])
+    except (OSError, KeyError, ValueError) as e:
+        # load_model memberi ValueError/OSError untuk file model yang hilang, rusak, atau tidak kompatibel
+        logging.warning(f"Artefak model sebelumnya tidak lengkap untuk mode inkremental ({e}), melatih dari awal...")
+        return train_on_frame(df, paths, extra_config, verbose, jit)
+
+    n_steps = base_config['n_steps']
+    features = base_config['features']
+    target_idx = features.index('gas_ppm')
+    scaled_data = scaler.transform(df[features])
+    X_all, y_all = create_sequences(scaled_data, n_steps, target_idx)
+    target_times = df.index[n_steps:]
+
+    # Bucket terakhir run sebelumnya mungkin belum lengkap, jadi ikut dilatih ulang
+    new_idx = np.flatnonzero(target_times >= trained_until)
+    if len(new_idx) == 0:
+        logging.info(f"Tidak ada window baru sejak {trained_until.isoformat()}, model tidak diubah.")
+        return None
+    old_idx = np.arange(new_idx[0])
+    n_replay = min(len(old_idx), int(len(new_idx) * REPLAY_RATIO))
+    replay_idx = np.random.default_rng().choice(old_idx, n_replay, replace=False)
+
+    # Validasi pada 20% window baru terakhir (kronologis) jika jumlahnya cukup
+    n_val = len(new_idx) // 5
+    train_idx = np.concatenate([new_idx[:len(new_idx) - n_val], replay_idx])
+    val_idx = new_idx[len(new_idx) - n_val:]
+    logging.info(f"Fine-tuning dari {base_paths['model']}: {len(new_idx)} window baru, {n_replay} window replay, {n_val} window validasi.")
+
+    # Hanya window terpilih yang disalin ke memori (jumlahnya kecil dibanding seluruh rentang)
+    X_train = X_all[train_idx].astype(np.float32)
+    y_train = y_all[train_idx].astype(np.float32)
+    train_ds = tf.data.Dataset.from_tensor_slices((X_train, y_train)).shuffle(len(X_train)).batch(32)
+    val_ds = None
+    if n_val:
+        val_ds = tf.data.Dataset.from_tensor_slices((X_all[val_idx].astype(np.float32), y_all[val_idx].astype(np.float32))).batch(32)
+    monitor = 'val_loss' if n_val else 'loss'
+
+    model.compile(optimizer=Adam(learning_rate=INCREMENTAL_LEARNING_RATE), loss='mean_squared_error', jit_compile=jit)
+    early_stopping_cb = EarlyStopping(patience=3, restore_best_weights=True, monitor=monitor, mode='min')
+    timer_cb = EpochTimer()
+    history = model.fit(train_ds, epochs=INCREMENTAL_EPOCHS, verbose=verbose,
+                        validation_data=val_ds,
+                        callbacks=[early_stopping_cb, timer_cb])
+    logging.info(f"Fine-tuning selesai dalam {sum(timer_cb.seconds):.1f} s ({len(timer_cb.seconds)} epoch).")
+
+    model_config = dict(base_config)
+    model_config['trained_until'] = df.index[-1].isoformat()
+    model_config['last_training'] = timer_cb.summary('incremental', len(X_train))
+    model_config.update(extra_config or {})
+    save_artifacts(model, scaler, model_config, paths)
+    return float(min(history.history[monitor]))
+
+# --- 5. Pelatihan Paralel per Alat ---
+
+def _init_worker(threads):
+    """Initializer proses worker: batasi thread TensorFlow agar worker tidak saling berebut core."""
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def set_precision(mixed_precision=False):
+    """
+    Policy dtype Keras untuk model yang dibangun setelahnya. mixed_float16 hanya mempercepat di
+    GPU dengan tensor core; di CPU justru lebih lambat. Model yang dilanjutkan (--incremental)
+    tetap memakai policy yang tersimpan bersamanya.
+    """
+    tf.keras.mixed_precision.set_global_policy("mixed_float16" if mixed_precision else "float32")
+
+def train_version(id_alat, version, df, incremental=False, jit=False, verbose=1, mixed_precision=False):
+    """
+    Melatih satu versi model (`id_alat` None = model global) ke MODELS_DIR/<id_alat>/<versi>/.
+    LATEST baru diganti setelah semua artefak dan manifest tertulis; jika training gagal atau
+    tidak menghasilkan model, versi aktif tidak berubah. Mengembalikan val_loss atau None.
+    """
+    set_precision(mixed_precision)
+    parent = device_dir(MODELS_DIR, id_alat)
+    version_dir = os.path.join(parent, version)
+    os.makedirs(version_dir, exist_ok=True)
+    label = id_alat or "global"
+    logging.info(f"[{label}] Melatih model dari {len(df)} baris ke {version_dir}...")
+    extra_config = {'id_alat': id_alat, 'version': version}
+    base_dir = None
+    if incremental:
+        if os.path.exists(os.path.join(parent, "LATEST")):
+            base_dir = os.path.join(parent, read_latest(parent))
+        elif id_alat is None and os.path.exists(CONFIG_FILENAME):
+            base_dir = ""  # Bundle global tata letak lama di direktori kerja
+    try:
+        if base_dir is not None:
+            val_loss = fine_tune_on_frame(df, artifact_paths(base_dir), artifact_paths(version_dir),
+                                          extra_config=extra_config, verbose=verbose, jit=jit)
+        else:
+            val_loss = train_on_frame(df, artifact_paths(version_dir), extra_config=extra_config, verbose=verbose, jit=jit)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    if val_loss is not None:
+        write_latest(parent, version)
+        logging.info(f"[{label}] Versi {version} aktif.")
+    else:
+        # Tidak ada versi baru (data kurang atau tidak ada window baru): jangan tinggalkan direktori setengah jadi
+        shutil.rmtree(version_dir, ignore_errors=True)
+    return val_loss
+
+def train_device(id_alat, version, incremental=False, jit=False, mixed_precision=False):
+    """Melatih model satu alat di proses worker. Mengembalikan (id_alat, val_loss, detik)."""
+    start = time.perf_counter()
+    df = load_training_frame(id_alat)
+    if df is None or df.empty:
+        logging.error(f"[{id_alat}] Tidak ada data untuk dilatih.")
+        return id_alat, None, time.perf_counter() - start
+    val_loss = train_version(id_alat, version, df, incremental, jit=jit, verbose=2, mixed_precision=mixed_precision)
+    return id_alat, val_loss, time.perf_counter() - start
+
+def train_per_device(devices=None, workers=None, incremental=False, jit=False, mixed_precision=False):
+    """Melatih satu model per id_alat secara paralel di process pool (satu proses per core)."""
+    devices = devices or list_devices()
+    if not devices:
+        logging.error("Tidak ada id_alat yang ditemukan dalam rentang data. Proses dihentikan.")
+        return {}
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(devices)))
+    threads = max(1, cores // workers)
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    logging.info(f"Melatih {len(devices)} model per alat dengan {workers} proses x {threads} thread (versi {version})...")
+
+    results = {}
+    # "spawn" karena TensorFlow tidak aman di-fork setelah diinisialisasi
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(train_device, id_alat, version, incremental, jit, mixed_precision): id_alat for id_alat in devices}
+        for future in as_completed(futures):
+            id_alat = futures[future]
+            try:
+                _, val_loss, seconds = future.result()
+            except Exception as e:
+                logging.error(f"[{id_alat}] Pelatihan gagal: {e}")
+                val_loss, seconds = None, None
+            results[id_alat] = val_loss
+            if val_loss is not None:
+                logging.info(f"[{id_alat}] Selesai dalam {seconds:.1f} s, val_loss={val_loss:.6f}")
 
-    logging.info(f"Pelatihan selesai! Artefak ('{MODEL_FILENAME}', '{SCALER_FILENAME}', '{CONFIG_FILENAME}') telah dibuat.")
+    trained = sum(1 for val_loss in results.values() if val_loss is not None)
+    logging.info(f"Pelatihan per alat selesai: {trained}/{len(devices)} model tersimpan di '{MODELS_DIR}/'.")
+    return results
 
-# --- 5. Titik Masuk Program ---
+# --- 6. Titik Masuk Program ---
 if __name__ == "__main__":
-    train_and_save_model()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Training model LSTM prediksi gas.")
+    arg_parser.add_argument("--per-device", action="store_true", help="latih satu model per id_alat secara paralel")
+    arg_parser.add_argument("--devices", nargs="*", help="id_alat yang dilatih (default: semua alat yang punya data)")
+    arg_parser.add_argument("--workers", type=int, default=None, help="jumlah proses (default: jumlah core)")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="lanjutkan model terakhir hanya pada data baru + replay (warm start)")
+    arg_parser.add_argument("--jit", action="store_true", help="kompilasi langkah training dengan XLA")
+    arg_parser.add_argument("--mixed-precision", action="store_true",
+                            help="latih dengan policy mixed_float16 (hanya bermanfaat di GPU; output tetap float32)")
+    args = arg_parser.parse_args()
+    if args.per_device:
+        train_per_device(args.devices, args.workers, args.incremental, args.jit, args.mixed_precision)
+    else:
+        train_and_save_model(args.incremental, args.jit, args.mixed_precision)
\ No newline at end of file
@@ -0,0 +1,63 @@
+# windowing.py
+"""
+Pembuatan sliding window untuk model LSTM tanpa menyalin data.
+
+Window ke-i adalah data[i : i + n_steps] dengan target data[i + n_steps, target_idx],
+untuk i = 0 .. len(data) - n_steps - 1 (sama persis dengan loop create_sequences lama).
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data, n_steps):
+    """
+    Mengembalikan view read-only berbentuk (len(data) - n_steps, n_steps, n_fitur)
+    di atas `data` (strided view, tanpa alokasi per window).
+    """
+    data = np.asarray(data)
+    n_windows = len(data) - n_steps
+    if n_windows <= 0:
+        return np.empty((0, n_steps, data.shape[1]), dtype=data.dtype)
+    # sliding_window_view menghasilkan (N, n_fitur, n_steps); transpose tetap berupa view
+    return sliding_window_view(data, n_steps, axis=0)[:n_windows].transpose(0, 2, 1)
+
+
+def create_sequences(data, n_steps, target_idx=None):
+    """Membuat sekuens (X, y) untuk model LSTM; jika `target_idx` None hanya X yang dikembalikan."""
+    X = sliding_windows(data, n_steps)
+    if target_idx is None:
+        return X
+    return X, np.asarray(data)[n_steps:, target_idx]
+
+
+def iter_batches(data, n_steps, target_idx=None, batch_size=32):
+    """Generator batch window berurutan; hanya satu batch yang disalin ke memori kontigu dalam satu waktu."""
+    X = sliding_windows(data, n_steps)
+    targets = np.asarray(data)[n_steps:, target_idx] if target_idx is not None else None
+    for start in range(0, len(X), batch_size):
+        batch = np.ascontiguousarray(X[start:start + batch_size])
+        if targets is None:
+            yield batch
+        else:
+            yield batch, targets[start:start + batch_size]
+
+
+def make_dataset(data, n_steps, target_idx=None, batch_size=32, shuffle=False, seed=None):
+    """
+    tf.data.Dataset yang membentuk window secara lazy dari array 2-D `data`,
+    sehingga tensor 3-D penuh tidak pernah dibuat. Bisa langsung diberikan ke
+    `model.fit` / `model.predict`.
+    """
+    from tensorflow.keras.utils import timeseries_dataset_from_array
+
+    data = np.asarray(data, dtype=np.float32)
+    targets = data[n_steps:, target_idx] if target_idx is not None else None
+    # data[:-1] membatasi jumlah window menjadi len(data) - n_steps, sesuai target
+    return timeseries_dataset_from_array(
+        data[:-1],
+        targets,
+        sequence_length=n_steps,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        seed=seed,
+    )